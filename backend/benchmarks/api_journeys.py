@@ -0,0 +1,318 @@
+"""
+API journey benchmark.
+
+Drives the real ASGI app in-process (httpx ASGI transport, one event loop,
+real Postgres) through scripted user journeys over the dataset from
+benchmarks.seed:
+
+- browse:   anonymous catalog, signed-in catalog, a world's lessons
+- open:     a world's lessons, then the next unlocked lesson
+- complete: open, then complete that lesson
+- submit:   submit a boss battle video
+- grade:    an admin pages the review queue and grades a submission from it
+
+Virtual users run journeys back to back, picked at random with the --mix
+weights, for --duration seconds. Each request is timed and its SQL
+statement count is read from the Server-Timing header. The report lists, per endpoint,
+requests per second, p50/p95/p99 latency, queries per request and non-2xx
+responses, and is written as JSON; --compare prints the change against a
+previous run (e.g. from another branch).
+
+Usage (from backend/, after `python -m benchmarks.seed`):
+    python -m benchmarks.api_journeys [--duration 30] [--concurrency 20] [--out results.json]
+    python -m benchmarks.api_journeys --compare main.json [--out branch.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import text
+
+from benchmarks.seed import EMAIL_DOMAIN
+from config import settings
+from main import app
+from models import get_engine
+from services.auth_service import create_access_token
+
+DEFAULT_MIX = {"browse": 50, "open": 25, "complete": 15, "submit": 5, "grade": 5}
+
+# Per-request statement count reported by request_monitoring
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    """Latency, status and query count samples per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client, method, endpoint, url, **kwargs):
+        """Send one request; `endpoint` is the route template it is reported under."""
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        match = SERVER_TIMING_QUERIES.search(response.headers.get("server-timing", ""))
+        name = f"{method} {endpoint}"
+        self.latencies[name].append(elapsed)
+        self.queries[name].append(int(match.group(1)) if match else 0)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, seconds):
+        endpoints = {}
+        for name in sorted(self.latencies):
+            latencies = self.latencies[name]
+            endpoints[name] = {
+                "requests": len(latencies),
+                "errors": self.errors[name],
+                "rps": round(len(latencies) / seconds, 2),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+                "mean_ms": round(sum(latencies) / len(latencies), 2),
+                "queries_per_request": round(sum(self.queries[name]) / len(latencies), 2),
+            }
+        all_latencies = [ms for samples in self.latencies.values() for ms in samples]
+        total = len(all_latencies)
+        return {
+            "endpoints": endpoints,
+            "total": {
+                "requests": total,
+                "errors": sum(self.errors.values()),
+                "rps": round(total / seconds, 2) if seconds else 0,
+                "p50_ms": round(percentile(all_latencies, 50), 2) if total else None,
+                "p95_ms": round(percentile(all_latencies, 95), 2) if total else None,
+                "p99_ms": round(percentile(all_latencies, 99), 2) if total else None,
+                "queries_per_request": round(
+                    sum(sum(samples) for samples in self.queries.values()) / total, 2
+                ) if total else None,
+            },
+        }
+
+
+def load_dataset():
+    """Bench users (with tokens), worlds and boss battle lessons."""
+    with get_engine().connect() as conn:
+        users = conn.execute(text(
+            "SELECT id, role FROM users WHERE email LIKE :email ORDER BY email"
+        ), {"email": f"%@{EMAIL_DOMAIN}"}).all()
+        worlds = conn.execute(text(
+            "SELECT id FROM worlds WHERE is_published ORDER BY order_index"
+        )).scalars().all()
+        bosses = conn.execute(text(
+            "SELECT l.id FROM lessons l JOIN levels v ON v.id = l.level_id "
+            "JOIN worlds w ON w.id = v.world_id WHERE w.is_published AND l.is_boss_battle"
+        )).scalars().all()
+    if not users or not worlds:
+        raise SystemExit("No benchmark data; run `python -m benchmarks.seed` first")
+
+    def headers(user_id):
+        return {"Authorization": f"Bearer {create_access_token(data={'sub': str(user_id)})}"}
+
+    students = [headers(user_id) for user_id, role in users if role == "STUDENT"]
+    admins = [headers(user_id) for user_id, role in users if role == "ADMIN"]
+    return {
+        "students": students,
+        "admins": admins,
+        "worlds": [str(world_id) for world_id in worlds],
+        "bosses": [str(lesson_id) for lesson_id in bosses],
+    }
+
+
+class Journeys:
+    def __init__(self, client, recorder, dataset, rng):
+        self.client = client
+        self.recorder = recorder
+        self.dataset = dataset
+        self.rng = rng
+
+    async def _get(self, endpoint, url, headers=None, **kwargs):
+        return await self.recorder.request(self.client, "GET", endpoint, url, headers=headers, **kwargs)
+
+    async def _post(self, endpoint, url, headers, **kwargs):
+        return await self.recorder.request(self.client, "POST", endpoint, url, headers=headers, **kwargs)
+
+    def _student(self):
+        return self.rng.choice(self.dataset["students"])
+
+    async def _world_lessons(self, headers):
+        world_id = self.rng.choice(self.dataset["worlds"])
+        response = await self._get(
+            "/api/courses/worlds/{world_id}/lessons", f"/api/courses/worlds/{world_id}/lessons", headers
+        )
+        return response.json() if response.status_code == 200 else []
+
+    async def browse(self):
+        await self._get("/api/courses/worlds (anonymous)", "/api/courses/worlds")
+        headers = self._student()
+        await self._get("/api/courses/worlds", "/api/courses/worlds", headers)
+        await self._world_lessons(headers)
+
+    async def open(self, headers=None):
+        headers = headers or self._student()
+        lessons = await self._world_lessons(headers)
+        candidates = [lesson for lesson in lessons if not lesson["is_locked"] and not lesson["is_completed"]]
+        if not candidates:
+            return None
+        lesson_id = candidates[0]["id"]
+        await self._get("/api/courses/lessons/{lesson_id}", f"/api/courses/lessons/{lesson_id}", headers)
+        return lesson_id
+
+    async def complete(self):
+        headers = self._student()
+        lesson_id = await self.open(headers)
+        if lesson_id is not None:
+            await self._post(
+                "/api/progress/lessons/{lesson_id}/complete", f"/api/progress/lessons/{lesson_id}/complete", headers
+            )
+
+    async def submit(self):
+        if not self.dataset["bosses"]:
+            return
+        await self._post("/api/submissions/submit", "/api/submissions/submit", self._student(), json={
+            "lesson_id": self.rng.choice(self.dataset["bosses"]),
+            "video_url": "boss-battles/bench/video.mp4",
+        })
+
+    async def grade(self):
+        if not self.dataset["admins"]:
+            return
+        headers = self.rng.choice(self.dataset["admins"])
+        response = await self._get("/api/admin/submissions", "/api/admin/submissions", headers, params={"limit": 20})
+        items = response.json()["items"] if response.status_code == 200 else []
+        if items:
+            submission_id = self.rng.choice(items)["id"]
+            await self._post(
+                "/api/admin/submissions/{submission_id}/grade", f"/api/admin/submissions/{submission_id}/grade",
+                headers, json={"status": self.rng.choice(["approved", "rejected"]), "feedback_text": "Nice"},
+            )
+
+
+async def virtual_user(journeys, mix, deadline):
+    names, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        name = journeys.rng.choices(names, weights)[0]
+        await getattr(journeys, name)()
+
+
+async def run(duration, concurrency, mix, seed):
+    dataset = load_dataset()
+    if not settings.AWS_ACCESS_KEY_ID:
+        # Lesson video URLs are presigned locally; the URLs are never fetched
+        settings.AWS_ACCESS_KEY_ID, settings.AWS_SECRET_ACCESS_KEY = "bench", "bench"
+    recorder = Recorder()
+    settings.SERVER_TIMING_ENABLED = True
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            # Warm caches and connections so the run measures the steady state
+            await Journeys(client, Recorder(), dataset, random.Random(seed)).browse()
+            start = time.perf_counter()
+            deadline = start + duration
+            await asyncio.gather(*(
+                virtual_user(Journeys(client, recorder, dataset, random.Random(seed + n)), mix, deadline)
+                for n in range(concurrency)
+            ))
+            seconds = time.perf_counter() - start
+
+    results = recorder.report(seconds)
+    results["meta"] = {
+        "git": _git("rev-parse", "--short", "HEAD"),
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "duration_s": round(seconds, 2),
+        "concurrency": concurrency,
+        "mix": mix,
+        "seed": seed,
+        "db_pool_size": settings.DB_POOL_SIZE,
+        "students": len(dataset["students"]),
+        "worlds": len(dataset["worlds"]),
+    }
+    return results
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results, baseline=None):
+    print(f"{'endpoint':<52} {'req':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6} {'err':>5}")
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for name, row in rows:
+        print(
+            f"{name:<52} {row['requests']:>6} {row['rps']:>8.1f} {row['p50_ms']:>8.2f} "
+            f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['queries_per_request']:>6.1f} {row['errors']:>5}"
+        )
+        before = (baseline or {}).get("endpoints", {}).get(name) if name != "TOTAL" else (baseline or {}).get("total")
+        if before:
+            print(
+                f"{'  vs ' + str(baseline['meta'].get('branch')) + '@' + str(baseline['meta'].get('git')):<52} "
+                f"{'':>6} {_change(before['rps'], row['rps']):>8} {_change(before['p50_ms'], row['p50_ms']):>8} "
+                f"{_change(before['p95_ms'], row['p95_ms']):>8} {_change(before['p99_ms'], row['p99_ms']):>8} "
+                f"{row['queries_per_request'] - before['queries_per_request']:>+6.1f}"
+            )
+
+
+def _change(before, after):
+    if not before:
+        return "-"
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument(
+        "--mix", nargs="+", metavar="JOURNEY=WEIGHT",
+        help=f"journey weights (default: {' '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())})",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="random seed for journey choices")
+    parser.add_argument("--out", default="benchmark-results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="results JSON of a previous run to compare against")
+    args = parser.parse_args()
+
+    mix = DEFAULT_MIX
+    if args.mix:
+        mix = {name: float(weight) for name, weight in (item.split("=") for item in args.mix)}
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            parser.error(f"unknown journeys: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args.duration, args.concurrency, mix, args.seed))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
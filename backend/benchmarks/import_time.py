@@ -0,0 +1,70 @@
+"""
+Cold import profile of the API (what a new worker pays before serving).
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+summarises its report: total time, the slowest top-level packages and the
+slowest of this repo's own modules, by cumulative microseconds. Exits
+non-zero when the import of main takes longer than --budget-ms.
+test_import_time.py enforces the same budget.
+
+Usage (from backend/):
+    python -m benchmarks.import_time [--top 15] [--budget-ms 2000] [--module main]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OWN_PACKAGES = {"main", "config", "models", "schemas", "routers", "services", "dependencies",
+                "db_monitoring", "request_monitoring", "metrics", "readiness"}
+
+
+def profile(module: str):
+    """[(name, self_us, cumulative_us)] in the order the imports finished."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():  # skip the header
+            rows.append((name, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    total_ms = next(cumulative for name, _, cumulative in rows if name == args.module) / 1000
+
+    # Self time summed per top-level package (third-party and our own)
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    own = [(cumulative, name) for name, _, cumulative in rows if name.split(".")[0] in OWN_PACKAGES]
+
+    print(f"import {args.module}: {total_ms:.0f}ms\n")
+    print("slowest packages (self time of all their modules):")
+    for package, us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {us / 1000:8.1f}ms  {package}")
+    print("\nslowest repo modules (cumulative, includes what they import first):")
+    for us, name in sorted(own, reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f}ms  {name}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nover budget: {total_ms:.0f}ms > {args.budget_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
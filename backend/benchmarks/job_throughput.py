@@ -0,0 +1,78 @@
+"""
+Job queue throughput benchmark.
+
+Enqueues a batch of no-op jobs and measures how fast a single worker
+drains them (claim with SKIP LOCKED, run, mark done), for a few worker
+concurrency settings. Enqueue throughput is reported too, since request
+handlers pay that cost. Past DB_POOL_SIZE concurrency, throughput drops
+sharply: overflow connections are closed on checkin and reopened per batch.
+
+Usage (from backend/, database initialised with `python database.py`):
+    python -m benchmarks.job_throughput [--jobs 5000] [--concurrency 1 4 8 16]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete
+
+from models import get_async_session_local
+from models.job import Job
+from services.jobs import JobWorker, enqueue, job_handler
+
+BENCH_KIND = "benchmark_noop"
+
+
+@job_handler(BENCH_KIND)
+async def noop(db, payload):
+    pass
+
+
+async def clear(session_factory):
+    async with session_factory() as db:
+        await db.execute(delete(Job).where(Job.kind == BENCH_KIND))
+        await db.commit()
+
+
+async def fill(session_factory, count, per_transaction):
+    start = time.perf_counter()
+    for offset in range(0, count, per_transaction):
+        async with session_factory() as db:
+            for n in range(offset, min(count, offset + per_transaction)):
+                await enqueue(db, BENCH_KIND, {"n": n})
+            await db.commit()
+    return time.perf_counter() - start
+
+
+async def run(count, concurrencies):
+    session_factory = get_async_session_local()
+    await clear(session_factory)
+
+    seconds = await fill(session_factory, count, 1)
+    print(f"enqueue (1 job/transaction)    {count / seconds:8.0f} jobs/s")
+    await clear(session_factory)
+
+    for concurrency in concurrencies:
+        await fill(session_factory, count, 500)
+        worker = JobWorker(session_factory, concurrency=concurrency, worker_id="bench")
+        start = time.perf_counter()
+        drained = await worker.drain()
+        seconds = time.perf_counter() - start
+        print(f"drain (concurrency={concurrency:<3})        {drained / seconds:8.0f} jobs/s  ({drained} jobs in {seconds:.2f}s)")
+        await clear(session_factory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+    asyncio.run(run(args.jobs, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
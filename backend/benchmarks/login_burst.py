@@ -0,0 +1,144 @@
+"""
+Login burst benchmark.
+
+Measures /health latency while a burst of logins runs against the app
+in-process (httpx ASGI transport, single event loop). With bcrypt on the
+hash thread pool /health p99 should stay flat; run with --inline to
+reproduce hashing on the event loop for comparison.
+
+Usage (from backend/, database initialised with `python database.py`):
+    python -m benchmarks.login_burst [--logins 200] [--inline]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from main import app
+from models import get_session_local
+from models.user import User, UserProfile, Subscription, UserRole, CurrentLevelTag, SubscriptionTier
+from services import auth_service
+import routers.auth
+
+BENCH_EMAIL = "login-burst-bench@example.com"
+BENCH_PASSWORD = "login-burst-password"
+
+
+def ensure_bench_user():
+    db = get_session_local()()
+    try:
+        if db.query(User).filter(User.email == BENCH_EMAIL).first():
+            return
+        user = User(
+            id=uuid.uuid4(),
+            email=BENCH_EMAIL,
+            hashed_password=auth_service.get_password_hash(BENCH_PASSWORD),
+            role=UserRole.STUDENT,
+        )
+        db.add(user)
+        db.flush()
+        db.add(UserProfile(
+            id=uuid.uuid4(), user_id=user.id, first_name="Bench", last_name="User",
+            current_level_tag=CurrentLevelTag.BEGINNER, xp=0, level=1, streak_count=0,
+        ))
+        db.add(Subscription(id=uuid.uuid4(), user_id=user.id, tier=SubscriptionTier.ROOKIE, status="incomplete"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, samples):
+    return (
+        f"{name:<22} n={len(samples):<5} p50={percentile(samples, 50):7.2f}ms "
+        f"p99={percentile(samples, 99):7.2f}ms max={max(samples):7.2f}ms"
+    )
+
+
+async def probe_health(client, stop, samples, interval):
+    """
+    Hit /health on a fixed schedule. Latency is measured from the scheduled
+    send time, so time the event loop spends blocked counts against it.
+    """
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        await client.get("/health")
+        samples.append((time.perf_counter() - scheduled) * 1000)
+        scheduled = max(scheduled + interval, time.perf_counter())
+
+
+async def run(logins: int, concurrency: int, interval: float):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Baseline /health latency with no load
+        baseline = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, stop, baseline, interval))
+        await asyncio.sleep(1.0)
+        stop.set()
+        await probe
+
+        # /health latency during the login burst
+        during = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, stop, during, interval))
+        semaphore = asyncio.Semaphore(concurrency)
+        login_latencies = []
+        failures = []
+
+        async def login():
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/auth/token", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+                    response.raise_for_status()
+                except Exception as e:
+                    failures.append(type(e).__name__)
+                    return
+                login_latencies.append((time.perf_counter() - start) * 1000)
+
+        burst_start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        burst_seconds = time.perf_counter() - burst_start
+        stop.set()
+        await probe
+
+    print(summarize("/health (idle)", baseline))
+    print(summarize("/health (login burst)", during))
+    if login_latencies:
+        print(summarize("/api/auth/token", login_latencies))
+    print(f"{logins} logins in {burst_seconds:.2f}s ({logins / burst_seconds:.1f}/s), {len(failures)} failed")
+    print(f"hash pool: {auth_service.hash_pool_stats.snapshot()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between /health probes")
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop (pre-offload behaviour)")
+    args = parser.parse_args()
+
+    if args.inline:
+        async def verify_inline(plain_password, hashed_password):
+            return auth_service.verify_password(plain_password, hashed_password)
+        routers.auth.verify_password_async = verify_inline
+
+    ensure_bench_user()
+    asyncio.run(run(args.logins, args.concurrency, args.interval))
+
+
+if __name__ == "__main__":
+    main()
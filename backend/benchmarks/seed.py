@@ -0,0 +1,157 @@
+"""
+Benchmark dataset.
+
+Seeds a realistic volume of data for the API benchmarks with set-based
+INSERT ... SELECT generate_series statements (a million progress rows take
+well under a minute): students and admins with profiles and subscriptions,
+published worlds -> levels -> lessons (the last lesson of every level is a
+boss battle), and completed lessons for every student, always a prefix of
+the course so the lock rules hold. Benchmark rows are tagged (users
+@bench.example.com, world slugs bench-*) and replaced on every run; other
+data is left alone. Admin counters are reconciled afterwards.
+
+Usage (from backend/, database initialised with `python database.py`;
+point DATABASE_URL at a scratch database):
+    python -m benchmarks.seed [--users 5000] [--worlds 30] [--lessons 1000] [--progress 1000000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import literal_column, text
+from sqlalchemy.dialects import postgresql
+
+from models import get_engine, get_async_session_local
+from services import stats_service
+from services.course_cache import bump_content_version
+from services.gamification_service import level_expression
+
+EMAIL_DOMAIN = "bench.example.com"
+SLUG_PREFIX = "bench-"
+LEVELS_PER_WORLD = 3
+FREE_WORLDS = 2
+
+# Profile level from totals.xp, as the app computes it (calculate_level)
+LEVEL_SQL = str(level_expression(literal_column("totals.xp")).compile(
+    dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+))
+
+RESET = [
+    # Children first; everything hangs off bench users or bench worlds
+    """DELETE FROM comments WHERE user_id IN (SELECT id FROM users WHERE email LIKE :email)
+       OR lesson_id IN (SELECT l.id FROM lessons l JOIN levels v ON v.id = l.level_id
+                        JOIN worlds w ON w.id = v.world_id WHERE w.slug LIKE :slug)""",
+    """DELETE FROM upload_sessions WHERE user_id IN (SELECT id FROM users WHERE email LIKE :email)""",
+    """DELETE FROM boss_submissions WHERE user_id IN (SELECT id FROM users WHERE email LIKE :email)
+       OR reviewed_by IN (SELECT id FROM users WHERE email LIKE :email)""",
+    """DELETE FROM user_progress WHERE user_id IN (SELECT id FROM users WHERE email LIKE :email)""",
+    """DELETE FROM lessons WHERE level_id IN (SELECT v.id FROM levels v JOIN worlds w ON w.id = v.world_id
+                                              WHERE w.slug LIKE :slug)""",
+    """DELETE FROM levels WHERE world_id IN (SELECT id FROM worlds WHERE slug LIKE :slug)""",
+    """DELETE FROM worlds WHERE slug LIKE :slug""",
+    """DELETE FROM subscriptions WHERE user_id IN (SELECT id FROM users WHERE email LIKE :email)""",
+    """DELETE FROM user_profiles WHERE user_id IN (SELECT id FROM users WHERE email LIKE :email)""",
+    """DELETE FROM users WHERE email LIKE :email""",
+]
+
+# Enums are stored by name
+SEED = [
+    """INSERT INTO users (id, email, hashed_password, role, created_at, updated_at)
+       SELECT gen_random_uuid(), 'bench-' || n || '@' || :domain, 'not-a-real-hash',
+              CASE WHEN n <= :admins THEN 'ADMIN' ELSE 'STUDENT' END::userrole,
+              now() - n * interval '1 minute', now()
+       FROM generate_series(1, :users + :admins) AS n""",
+    """INSERT INTO user_profiles (id, user_id, first_name, last_name, current_level_tag, xp, level,
+                                  streak_count, badges, progress_version)
+       SELECT gen_random_uuid(), id, 'Bench', split_part(email, '@', 1), 'BEGINNER', 0, 1, 0, '[]', 0
+       FROM users WHERE email LIKE :email""",
+    """INSERT INTO subscriptions (id, user_id, status, tier, current_period_end)
+       SELECT gen_random_uuid(), id, 'ACTIVE', 'PERFORMER', now() + interval '30 days'
+       FROM users WHERE email LIKE :email""",
+    """INSERT INTO worlds (id, title, description, slug, order_index, is_free, difficulty, is_published)
+       SELECT gen_random_uuid(), 'World ' || n, 'Benchmark world ' || n, :slug_prefix || n,
+              1000 + n, n <= :free_worlds,
+              (ARRAY['BEGINNER', 'INTERMEDIATE', 'ADVANCED'])[1 + (n - 1) * 3 / :worlds]::difficulty, true
+       FROM generate_series(1, :worlds) AS n""",
+    """INSERT INTO levels (id, world_id, title, order_index)
+       SELECT gen_random_uuid(), w.id, 'Level ' || n, n
+       FROM worlds w, generate_series(1, :levels_per_world) AS n
+       WHERE w.slug LIKE :slug""",
+    """INSERT INTO lessons (id, level_id, title, description, video_url, xp_value, order_index,
+                            is_boss_battle, duration_minutes)
+       SELECT gen_random_uuid(), v.id, 'Lesson ' || v.order_index || '.' || n, 'Benchmark lesson',
+              'lessons/bench/' || v.id || '/' || n || '.mp4', 50, n, n = :lessons_per_level, 10
+       FROM levels v JOIN worlds w ON w.id = v.world_id, generate_series(1, :lessons_per_level) AS n
+       WHERE w.slug LIKE :slug""",
+    # Student k completes the first quota(k) lessons of the course, spread
+    # around the average so the total comes close to :progress
+    """WITH course AS (
+           SELECT l.id, row_number() OVER (ORDER BY w.order_index, v.order_index, l.order_index) AS position
+           FROM lessons l JOIN levels v ON v.id = l.level_id JOIN worlds w ON w.id = v.world_id
+           WHERE w.slug LIKE :slug
+       ), students AS (
+           SELECT u.id, (row_number() OVER (ORDER BY u.email) * 7919) % (2 * :per_student + 1) AS quota
+           FROM users u WHERE u.email LIKE :email AND u.role = 'STUDENT'
+       )
+       INSERT INTO user_progress (id, user_id, lesson_id, is_completed, completed_at)
+       SELECT gen_random_uuid(), s.id, c.id, true, now() - c.position * interval '1 hour'
+       FROM students s JOIN course c ON c.position <= s.quota""",
+    f"""UPDATE user_profiles p SET xp = totals.xp, level = {LEVEL_SQL}
+       FROM (SELECT user_id, count(*) * 50 AS xp FROM user_progress GROUP BY user_id) totals
+       WHERE totals.user_id = p.user_id
+         AND p.user_id IN (SELECT id FROM users WHERE email LIKE :email)""",
+]
+
+
+def seed(users: int, admins: int, worlds: int, lessons: int, progress: int) -> None:
+    lessons_per_level = max(2, round(lessons / (worlds * LEVELS_PER_WORLD)))
+    per_student = max(0, min(progress // max(1, users), worlds * LEVELS_PER_WORLD * lessons_per_level))
+    params = {
+        "email": f"%@{EMAIL_DOMAIN}",
+        "domain": EMAIL_DOMAIN,
+        "slug": f"{SLUG_PREFIX}%",
+        "slug_prefix": SLUG_PREFIX,
+        "users": users,
+        "admins": admins,
+        "worlds": worlds,
+        "free_worlds": FREE_WORLDS,
+        "levels_per_world": LEVELS_PER_WORLD,
+        "lessons_per_level": lessons_per_level,
+        "per_student": per_student,
+    }
+    with get_engine().begin() as conn:
+        for statement in RESET + SEED:
+            start = time.perf_counter()
+            result = conn.execute(text(statement), params)
+            summary = " ".join(statement.split())[:60]
+            print(f"{time.perf_counter() - start:7.2f}s  {result.rowcount:>9} rows  {summary}")
+        # Raw SQL bypasses the ORM hook that tells workers the course changed
+        bump_content_version(conn)
+        conn.execute(text("ANALYZE"))
+
+
+async def reconcile_counters() -> None:
+    async with get_async_session_local()() as db:
+        await stats_service.reconcile(db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000, help="students")
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--worlds", type=int, default=30)
+    parser.add_argument("--lessons", type=int, default=1000, help="approximate total lessons")
+    parser.add_argument("--progress", type=int, default=1000000, help="approximate completed lesson rows")
+    args = parser.parse_args()
+
+    seed(args.users, args.admins, args.worlds, args.lessons, args.progress)
+    asyncio.run(reconcile_counters())
+    print("Counters reconciled")
+
+
+if __name__ == "__main__":
+    main()
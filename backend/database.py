@@ -1,15 +1,52 @@
 """
 Database initialization script.
-Run this to create all tables.
+Run this to create all tables, and any columns or indexes missing from
+existing tables.
 """
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
 from models import Base, get_engine
 
+def ensure_columns(engine):
+    """Add model columns that existing tables do not have yet."""
+    added = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                # Only nullable or server-defaulted columns can be added without a backfill
+                if column.name not in existing and (column.nullable or column.server_default is not None):
+                    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                    added.append(f"{table.name}.{column.name}")
+    return added
+
+def ensure_indexes(engine):
+    """Create indexes declared on the models that the database does not have yet."""
+    created = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                # create_all skips tables that already exist, so new indexes
+                # on existing tables are created here
+                if not conn.dialect.has_index(conn, table.name, index.name):
+                    index.create(bind=conn)
+                    created.append(index.name)
+    return created
+
 def init_db():
     """Create all database tables."""
     engine = get_engine()
     Base.metadata.create_all(bind=engine)
     print("Database tables created successfully!")
+    for name in ensure_columns(engine):
+        print(f"Added column {name}")
+    for name in ensure_indexes(engine):
+        print(f"Created index {name}")
 
 if __name__ == "__main__":
     init_db()
-
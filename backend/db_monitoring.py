@@ -0,0 +1,177 @@
+"""
+Connection pool and SQL monitoring hooks for the database engine.
+
+- InstrumentedQueuePool records how long each checkout waited for a free
+  connection so the pool can be sized from real data (see pool_status()).
+- install_query_sampling() logs a random sample of SQL statements instead of
+  echoing every statement synchronously.
+- install_query_tracking() adds every statement's count and duration to the
+  current request's QueryStats (see request_monitoring) and logs statements
+  slower than a threshold with their parameters redacted.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+logger = logging.getLogger("db")
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class PoolWaitStats:
+    """Thread-safe histogram of pool checkout wait times."""
+
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+            self.timeouts = 0
+            self.bucket_counts = [0] * len(self.buckets)
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.bucket_counts[index] += 1
+                    break
+
+    def observe_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.count,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": (self.total / self.count * 1000) if self.count else 0.0,
+                "max_wait_ms": self.max * 1000,
+                "wait_histogram_ms": {
+                    ("+Inf" if bound == float("inf") else str(bound * 1000)): count
+                    for bound, count in zip(self.buckets, self.bucket_counts)
+                },
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class _CheckoutTimingMixin:
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_wait_stats.observe_timeout()
+            raise
+        pool_wait_stats.observe(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """QueuePool that times how long callers wait for a connection."""
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times how long callers wait for a connection."""
+
+
+def pool_status(engine) -> dict:
+    """Current pool occupancy plus checkout wait statistics (sync or async engine)."""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checked_in": pool.checkedin(),
+        })
+    status.update(pool_wait_stats.snapshot())
+    return status
+
+
+def install_query_sampling(engine, sample_rate: float):
+    """Log roughly `sample_rate` of executed statements with their duration."""
+    if sample_rate <= 0:
+        return
+    engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        context._sampled_query_start = (
+            time.perf_counter() if random.random() < sample_rate else None
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _log(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_sampled_query_start", None)
+        if start is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logger.info("sql %.1fms %s", elapsed_ms, statement)
+
+
+class QueryStats:
+    """Statements issued and time spent in the database by one request."""
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_query_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def redact_parameters(parameters):
+    """Parameter types only: values may hold emails, tokens or password hashes."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: one set of parameters per row
+            return f"{len(parameters)} x {redact_parameters(parameters[0])}"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def install_query_tracking(engine, slow_query_ms: float):
+    """Count statements per request and log the ones slower than `slow_query_ms`."""
+    engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        context._tracked_query_start = time.perf_counter()
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.count += 1
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._tracked_query_start
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.seconds += elapsed
+        if slow_query_ms > 0 and elapsed * 1000 >= slow_query_ms:
+            logger.warning(
+                "slow sql %.1fms %s params=%s",
+                elapsed * 1000, " ".join(statement.split()), redact_parameters(parameters),
+            )
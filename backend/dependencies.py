@@ -1,19 +1,22 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
-from sqlalchemy.orm import Session
-from models import get_db
-from models.user import User, UserRole
+import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import get_async_db
+from models.user import UserRole
 from services.auth_service import decode_access_token
+from services.principal_cache import Principal, get_principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/token", auto_error=False)
 
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """Authenticated principal from the bearer token, served from the principal cache."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -28,23 +31,22 @@ def get_current_user(
     if user_id_str is None:
         raise credentials_exception
     
-    import uuid
     try:
         user_id = uuid.UUID(user_id_str)
     except ValueError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await get_principal(db, user_id)
     if user is None:
         raise credentials_exception
     
     return user
 
 
-def get_current_user_optional(
+async def get_current_user_optional(
     token: Optional[str] = Depends(oauth2_scheme_optional),
-    db: Session = Depends(get_db)
-) -> Optional[User]:
+    db: AsyncSession = Depends(get_async_db)
+) -> Optional[Principal]:
     """Optional authentication - returns user if token is valid, None otherwise."""
     if token is None:
         return None
@@ -58,19 +60,18 @@ def get_current_user_optional(
         if user_id_str is None:
             return None
         
-        import uuid
         try:
             user_id = uuid.UUID(user_id_str)
         except ValueError:
             return None
         
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await get_principal(db, user_id)
         return user
     except Exception:
         return None
 
 
-def get_admin_user(current_user: User = Depends(get_current_user)):
+async def get_admin_user(current_user: Principal = Depends(get_current_user)):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
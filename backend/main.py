@@ -1,12 +1,39 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routers import api_router
 from config import settings
+import metrics
+import readiness
+from models import get_async_db, get_async_session_local
+from request_monitoring import RequestMonitoringMiddleware
+from services import catalog_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pay cold-start costs before uvicorn accepts connections
+    if settings.STARTUP_WARMUP:
+        async with get_async_session_local()() as db:
+            await readiness.ensure_warm(db)
+    # Keep the anonymous catalog current off the request path
+    if settings.CATALOG_CACHE_REFRESH_SECONDS > 0:
+        catalog_cache.start_refresher(get_async_session_local())
+    if settings.METRICS_ENABLED:
+        metrics.start_sampler()
+    yield
+    await catalog_cache.stop_refresher()
+    await metrics.stop_sampler()
+
 
 app = FastAPI(
     title="Salsa Lab API",
     description="Backend API for Salsa Lab",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware configuration
@@ -16,7 +43,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Outermost: times the whole request and counts its SQL statements
+app.add_middleware(RequestMonitoringMiddleware)
 
 # Include routers
 app.include_router(api_router, prefix="/api")
@@ -32,6 +62,20 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check(db: AsyncSession = Depends(get_async_db)):
+    """Warmed up and the database answering: safe to route traffic here."""
+    ready, body = await readiness.check_readiness(db)
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(db: AsyncSession = Depends(get_async_db)):
+    """Prometheus text exposition (all workers in multiprocess mode)."""
+    body, content_type = await metrics.render(db)
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,187 @@
+"""
+Prometheus metrics, served at /metrics.
+
+Request metrics are recorded by RequestMonitoringMiddleware
+(request_monitoring.py): a latency histogram and a status counter per
+route template, SQL statements per request, and requests in flight. Hot
+paths elsewhere keep their existing in-process counters (pool checkouts,
+bcrypt queue, cache hits); sample() copies them into Prometheus metrics,
+from a per-worker background task every METRICS_SAMPLE_SECONDS and on
+every scrape. Job queue counts and lag are global, so they are read from
+the database at scrape time.
+
+Several workers (uvicorn --workers N, gunicorn): set PROMETHEUS_MULTIPROC_DIR
+to an empty directory, wiped before the server starts, in the environment
+of every worker. prometheus_client then keeps metrics in memory-mapped
+files there and /metrics aggregates all workers, whichever one answers.
+"""
+import asyncio
+import logging
+import os
+from typing import Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from db_monitoring import pool_status
+from models import get_async_engine
+from services.auth_service import hash_pool_stats
+from services.catalog_cache import catalog_cache_stats
+from services.course_cache import course_cache_stats
+from services.jobs import queue_stats
+from services.principal_cache import principal_cache_stats
+from services.s3_service import download_url_cache_stats
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route template",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter("http_requests", "Requests by route template and status", ["method", "route", "status"])
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements per request by route template",
+    ["method", "route"], buckets=QUERY_BUCKETS,
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled", multiprocess_mode="livesum")
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured pool size", multiprocess_mode="livesum")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond pool_size", multiprocess_mode="livesum")
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts", "Pool checkouts")
+DB_POOL_TIMEOUTS = Counter("db_pool_checkout_timeouts", "Checkouts that timed out waiting for a connection")
+DB_POOL_WAIT = Counter("db_pool_checkout_wait_seconds", "Total time spent waiting for a connection")
+
+HASH_QUEUE_DEPTH = Gauge("password_hash_queue_depth", "bcrypt jobs waiting for a hash thread", multiprocess_mode="livesum")
+HASH_RUNNING = Gauge("password_hash_running", "bcrypt jobs being hashed", multiprocess_mode="livesum")
+HASHES = Counter("password_hashes", "bcrypt hashes and verifications completed")
+
+CACHE_HITS = Counter("cache_hits", "In-process cache hits", ["cache"])
+CACHE_MISSES = Counter("cache_misses", "In-process cache misses", ["cache"])
+
+JOBS = Gauge("jobs", "Background jobs by status", ["status"], multiprocess_mode="mostrecent")
+JOB_LAG = Gauge("job_lag_seconds", "Age of the oldest due queued job", multiprocess_mode="mostrecent")
+
+# labels() takes a lock and builds a key on every call; resolve each child once
+_route_children: Dict[Tuple[str, str], tuple] = {}
+_status_children: Dict[Tuple[str, str, int], Counter] = {}
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, queries: int) -> None:
+    """Record one finished request (called by the request middleware)."""
+    children = _route_children.get((method, route))
+    if children is None:
+        children = _route_children[(method, route)] = (
+            REQUEST_LATENCY.labels(method, route), REQUEST_QUERIES.labels(method, route),
+        )
+    children[0].observe(seconds)
+    children[1].observe(queries)
+    counter = _status_children.get((method, route, status))
+    if counter is None:
+        counter = _status_children[(method, route, status)] = REQUESTS.labels(method, route, str(status))
+    counter.inc()
+
+
+_published: Dict[tuple, float] = {}
+
+
+def _publish(counter, key: tuple, total: float) -> None:
+    """Advance a Prometheus counter to a cumulative in-process total."""
+    previous = _published.get(key, 0)
+    if total < previous:
+        # The source was reset (e.g. a cache cleared)
+        previous = 0
+    if total > previous:
+        counter.inc(total - previous)
+    _published[key] = total
+
+
+def sample() -> None:
+    """Copy this worker's pool, bcrypt and cache counters into the metrics."""
+    pool = pool_status(get_async_engine())
+    DB_POOL_SIZE.set(pool.get("size", 0))
+    DB_POOL_CHECKED_OUT.set(pool.get("checked_out", 0))
+    DB_POOL_OVERFLOW.set(max(0, pool.get("overflow", 0)))
+    _publish(DB_POOL_CHECKOUTS, ("pool", "checkouts"), pool["checkouts"])
+    _publish(DB_POOL_TIMEOUTS, ("pool", "timeouts"), pool["timeouts"])
+    _publish(DB_POOL_WAIT, ("pool", "wait"), pool["avg_wait_ms"] * pool["checkouts"] / 1000)
+
+    hashing = hash_pool_stats.snapshot()
+    HASH_QUEUE_DEPTH.set(hashing["queue_depth"])
+    HASH_RUNNING.set(hashing["running"])
+    _publish(HASHES, ("hash", "completed"), hashing["completed"])
+
+    caches = {
+        "principal": principal_cache_stats(),
+        "course_snapshot": course_cache_stats(),
+        "anonymous_catalog": catalog_cache_stats(),
+        "download_url": download_url_cache_stats(),
+    }
+    for name, stats in caches.items():
+        _publish(CACHE_HITS.labels(name), ("hits", name), stats["hits"])
+        _publish(CACHE_MISSES.labels(name), ("misses", name), stats["misses"])
+
+
+async def _sample_forever(interval: float) -> None:
+    while True:
+        try:
+            sample()
+        except Exception:
+            logger.exception("Metrics sampling failed")
+        await asyncio.sleep(interval)
+
+
+_sampler = None
+
+
+def start_sampler() -> None:
+    global _sampler
+    if _sampler is None or _sampler.done():
+        _sampler = asyncio.create_task(_sample_forever(settings.METRICS_SAMPLE_SECONDS))
+
+
+async def stop_sampler() -> None:
+    global _sampler
+    task, _sampler = _sampler, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
+
+
+async def render(db: AsyncSession) -> Tuple[bytes, str]:
+    """The Prometheus exposition for this scrape and its content type."""
+    sample()
+    try:
+        stats = await queue_stats(db)
+    except Exception as e:
+        logger.warning(f"Job queue metrics unavailable: {e}")
+    else:
+        JOB_LAG.set(stats.pop("lag_seconds"))
+        for status, count in stats.items():
+            JOBS.labels(status).set(count)
+    return exposition(), CONTENT_TYPE_LATEST
+
+
+def exposition() -> bytes:
+    """Current metric values: every worker's in multiprocess mode, else this process's."""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
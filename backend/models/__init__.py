@@ -1,7 +1,11 @@
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from config import settings
+from db_monitoring import (
+    InstrumentedQueuePool, InstrumentedAsyncQueuePool, install_query_sampling, install_query_tracking,
+)
 
 # Base class for models
 Base = declarative_base()
@@ -9,12 +13,20 @@ Base = declarative_base()
 # Lazy initialization of engine and session
 _engine = None
 _SessionLocal = None
+_async_engine = None
+_AsyncSessionLocal = None
 
 def get_engine():
     """Get or create the database engine."""
     global _engine
     if _engine is None:
-        _engine = create_engine(settings.DATABASE_URL, echo=True)
+        _engine = create_engine(
+            settings.DATABASE_URL,
+            poolclass=InstrumentedQueuePool,
+            **settings.engine_options()
+        )
+        install_query_sampling(_engine, settings.DB_LOG_SAMPLE_RATE)
+        install_query_tracking(_engine, settings.DB_SLOW_QUERY_MS)
     return _engine
 
 def get_session_local():
@@ -24,6 +36,29 @@ def get_session_local():
         _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
     return _SessionLocal
 
+def get_async_engine():
+    """Get or create the asyncpg engine used by the API routers."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            settings.ASYNC_DATABASE_URL,
+            poolclass=InstrumentedAsyncQueuePool,
+            **settings.engine_options(async_driver=True)
+        )
+        install_query_sampling(_async_engine, settings.DB_LOG_SAMPLE_RATE)
+        install_query_tracking(_async_engine, settings.DB_SLOW_QUERY_MS)
+    return _async_engine
+
+def get_async_session_local():
+    """Get or create the async session factory."""
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        # Objects stay usable after commit; async sessions cannot lazy-load on access
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
 # For backward compatibility - expose engine as a property-like function
 def engine():
     """Get the engine (for backward compatibility)."""
@@ -31,10 +66,20 @@ def engine():
 
 # Import all models to ensure they're registered
 from models.user import User, UserProfile, Subscription
-from models.course import World, Level, Lesson
+from models.course import World, Level, Lesson, CourseContentVersion
 from models.progress import UserProgress, BossSubmission, Comment
+from models.stats import StatCounter
+from models.job import Job
+from models.stripe_event import StripeEvent
+from models.upload import UploadSession
+
+# Dependency to get an async database session (used by the API)
+async def get_async_db():
+    AsyncSessionLocal = get_async_session_local()
+    async with AsyncSessionLocal() as db:
+        yield db
 
-# Dependency to get database session
+# Synchronous session, kept for scripts such as database.py
 def get_db():
     SessionLocal = get_session_local()
     db = SessionLocal()
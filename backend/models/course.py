@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Integer, Boolean, Text, DateTime, ForeignKey, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, Text, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
@@ -56,6 +56,10 @@ class Lesson(Base):
     order_index = Column(Integer, nullable=False)
     is_boss_battle = Column(Boolean, default=False, nullable=False)
     duration_minutes = Column(Integer, nullable=True)
+    # HLS package written by transcode_videos.py
+    hls_url = Column(String, nullable=True)
+    poster_url = Column(String, nullable=True)
+    video_renditions = Column(JSONB, nullable=True)  # {"720p": playlist url, ...}
 
     # Relationships
     level = relationship("Level", back_populates="lessons")
@@ -63,3 +67,12 @@ class Lesson(Base):
     submissions = relationship("BossSubmission", back_populates="lesson")
     comments = relationship("Comment", back_populates="lesson")
 
+
+
+class CourseContentVersion(Base):
+    """Single-row counter bumped whenever the World/Level/Lesson tree changes."""
+    __tablename__ = "course_content_version"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(BigInteger, default=1, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
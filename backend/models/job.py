@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, Index, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+import enum
+
+from models import Base
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class Job(Base):
+    """A durable background job, enqueued in the transaction that needs it (services.jobs)."""
+    __tablename__ = "jobs"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB, default=dict, nullable=False)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    # Enqueueing twice with the same key is a no-op
+    dedupe_key = Column(String, unique=True, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Workers claim the oldest due jobs of a status
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
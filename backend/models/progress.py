@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Boolean, Text, DateTime, ForeignKey, UniqueConstraint, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Boolean, Text, DateTime, ForeignKey, UniqueConstraint, Index, Enum as SQLEnum, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
@@ -44,6 +44,13 @@ class BossSubmission(Base):
     submitted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     reviewed_at = Column(DateTime, nullable=True)
     reviewed_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    # HLS package written by transcode_videos.py
+    hls_url = Column(String, nullable=True)
+    poster_url = Column(String, nullable=True)
+    video_renditions = Column(JSONB, nullable=True)
+
+    # Review queue: keyset pages per status ordered by (submitted_at, id)
+    __table_args__ = (Index("ix_boss_submissions_status_submitted_at", "status", "submitted_at", "id"),)
 
     # Relationships
     user = relationship("User", back_populates="submissions", foreign_keys=[user_id])
@@ -61,6 +68,16 @@ class Comment(Base):
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    # Threads: keyset pages of a lesson's top-level comments by (created_at, id);
+    # replies: the recursive walk down from a thread follows parent_id
+    __table_args__ = (
+        Index(
+            "ix_comments_lesson_created_at", "lesson_id", "created_at", "id",
+            postgresql_where=text("parent_id IS NULL"),
+        ),
+        Index("ix_comments_parent_id", "parent_id"),
+    )
+
     # Relationships
     user = relationship("User", back_populates="comments")
     lesson = relationship("Lesson", back_populates="comments")
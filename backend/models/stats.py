@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, BigInteger, DateTime, func
+
+from models import Base
+
+
+class StatCounter(Base):
+    """
+    Materialized admin dashboard counter. Maintained incrementally by
+    services.stats_service in the transactions that change the underlying
+    rows, and recomputed from scratch by reconcile_stats.py.
+    """
+    __tablename__ = "stat_counters"
+
+    metric = Column(String, primary_key=True)  # e.g. "submissions", "signups_daily"
+    bucket = Column(String, primary_key=True)  # e.g. a status, a YYYY-MM-DD date, a world id
+    value = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), nullable=False)
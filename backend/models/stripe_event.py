@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, DateTime, Index, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
+import enum
+
+from models import Base
+
+
+class StripeEventStatus(str, enum.Enum):
+    PENDING = "pending"
+    PROCESSED = "processed"
+    IGNORED = "ignored"  # event type we do not act on
+
+
+class StripeEvent(Base):
+    """Webhook inbox: every verified Stripe event, stored once by event id."""
+    __tablename__ = "stripe_events"
+
+    id = Column(String, primary_key=True)  # Stripe event id (evt_...)
+    type = Column(String, nullable=False)
+    customer_id = Column(String, nullable=True)
+    payload = Column(JSONB, nullable=False)
+    stripe_created_at = Column(DateTime, nullable=False)
+    status = Column(SQLEnum(StripeEventStatus), default=StripeEventStatus.PENDING, nullable=False)
+    received_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+
+    # A customer's pending events, in the order Stripe created them
+    __table_args__ = (Index("ix_stripe_events_customer_status_created", "customer_id", "status", "stripe_created_at"),)
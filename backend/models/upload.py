@@ -0,0 +1,47 @@
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Index, Enum as SQLEnum, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from datetime import datetime
+import uuid
+import enum
+
+from models import Base
+
+
+class UploadSessionStatus(str, enum.Enum):
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    ABORTED = "aborted"
+
+
+class UploadSession(Base):
+    """
+    A resumable multipart upload of a boss battle video straight to S3
+    (services.upload_service). Parts are uploaded by the client with
+    presigned URLs; only their ETags are reported back here.
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    lesson_id = Column(UUID(as_uuid=True), ForeignKey("lessons.id"), nullable=False)
+    object_key = Column(String, nullable=False)
+    s3_upload_id = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    part_count = Column(Integer, nullable=False)
+    # {"<part number>": "<etag>"} for every part the client has reported
+    parts = Column(JSONB, default=dict, nullable=False)
+    status = Column(SQLEnum(UploadSessionStatus), default=UploadSessionStatus.ACTIVE, nullable=False)
+    submission_id = Column(UUID(as_uuid=True), ForeignKey("boss_submissions.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    completed_at = Column(DateTime, nullable=True)
+
+    # At most one resumable upload per user and boss battle
+    __table_args__ = (
+        Index(
+            "ix_upload_sessions_active_user_lesson", "user_id", "lesson_id",
+            unique=True, postgresql_where=text("status = 'ACTIVE'"),
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, Enum as SQLEnum, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -28,7 +28,7 @@ class User(Base):
     profile = relationship("UserProfile", back_populates="user", uselist=False)
     subscription = relationship("Subscription", back_populates="user", uselist=False)
     progress = relationship("UserProgress", back_populates="user")
-    submissions = relationship("BossSubmission", back_populates="user")
+    submissions = relationship("BossSubmission", back_populates="user", foreign_keys="BossSubmission.user_id")
     comments = relationship("Comment", back_populates="user")
 
 
@@ -43,7 +43,7 @@ class UserProfile(Base):
     __tablename__ = "user_profiles"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), unique=True, nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), unique=True, nullable=False, index=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     avatar_url = Column(String, nullable=True)
@@ -53,6 +53,9 @@ class UserProfile(Base):
     streak_count = Column(Integer, default=0, nullable=False)
     last_login_date = Column(DateTime, nullable=True)
     badges = Column(String, default="[]", nullable=False)  # JSONB stored as string for now
+    # Bumped with every XP award (lesson completions, boss battles); part of
+    # the ETag of progress-dependent responses (services.http_cache)
+    progress_version = Column(BigInteger, default=0, server_default=text("0"), nullable=False)
 
     # Relationships
     user = relationship("User", back_populates="profile")
@@ -76,12 +79,14 @@ class Subscription(Base):
     __tablename__ = "subscriptions"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), unique=True, nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), unique=True, nullable=False, index=True)
     stripe_customer_id = Column(String, index=True, nullable=True)
     stripe_subscription_id = Column(String, nullable=True)
     status = Column(SQLEnum(SubscriptionStatus), default=SubscriptionStatus.INCOMPLETE, nullable=False)
     tier = Column(SQLEnum(SubscriptionTier), default=SubscriptionTier.ROOKIE, nullable=False)
     current_period_end = Column(DateTime, nullable=True)
+    # Creation time of the last Stripe event applied; older events are skipped
+    stripe_event_created_at = Column(DateTime, nullable=True)
 
     # Relationships
     user = relationship("User", back_populates="subscription")
@@ -0,0 +1,112 @@
+"""
+Worker warm-up and the /ready check.
+
+A new worker would otherwise pay its cold-start costs on the first requests
+it serves: creating the engine and opening pool connections, configuring the
+SQLAlchemy mappers, and loading the course structure and anonymous catalog
+(services.course_cache, services.catalog_cache). warm_up() does all of that
+from the app lifespan, before uvicorn starts accepting connections.
+
+GET /ready reports whether this worker should get traffic: 200 once warm-up
+has succeeded and the database answers within READY_CHECK_TIMEOUT_SECONDS,
+503 otherwise. A worker that could not warm up at startup (database down)
+retries on each /ready call. Redis latency is reported but does not make the
+worker unready, because every Redis-backed cache falls back to process
+memory. /health stays a plain liveness check.
+"""
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+
+from config import settings
+from services import catalog_cache
+from services.course_cache import get_course_snapshot
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_warmed_up = False
+_lock = asyncio.Lock()
+
+
+async def _fill_pool(engine) -> int:
+    """Open pool_size connections at once so none is opened on a request."""
+    pool = engine.pool
+    size = pool.size() if isinstance(pool, QueuePool) else 1
+    async with AsyncExitStack() as stack:
+        connections = await asyncio.gather(*(stack.enter_async_context(engine.connect()) for _ in range(size)))
+        for connection in connections:
+            await connection.execute(text("SELECT 1"))
+    return size
+
+
+async def warm_up(db: AsyncSession) -> None:
+    """Prepare this worker for traffic; raises if the database is unreachable."""
+    global _warmed_up
+
+    start = time.perf_counter()
+    configure_mappers()
+    connections = await _fill_pool(db.bind)
+    snapshot = await get_course_snapshot(db)
+    # Also compiles the catalog's response serializer
+    await catalog_cache.refresh(db)
+    _warmed_up = True
+    logger.info(
+        f"Worker warmed up in {(time.perf_counter() - start) * 1000:.0f}ms: "
+        f"{connections} connections, content version {snapshot.version}"
+    )
+
+
+async def ensure_warm(db: AsyncSession) -> bool:
+    """Warm up unless already done; False if it failed."""
+    if _warmed_up:
+        return True
+    async with _lock:
+        if _warmed_up:
+            return True
+        try:
+            await warm_up(db)
+        except Exception as e:
+            logger.warning(f"Worker warm-up failed: {e}")
+            await db.rollback()
+    return _warmed_up
+
+
+async def _timed(check) -> dict:
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(check, settings.READY_CHECK_TIMEOUT_SECONDS)
+    except Exception as e:
+        return {"ok": False, "error": str(e) or type(e).__name__}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+async def check_readiness(db: AsyncSession) -> Tuple[bool, dict]:
+    """Whether this worker should receive traffic, and the details for the response body."""
+    database = await _timed(db.execute(text("SELECT 1")))
+    warmed_up = database["ok"] and await ensure_warm(db)
+
+    redis = get_redis()
+    redis_check = await _timed(redis.ping()) if redis is not None else {"ok": True, "enabled": False}
+
+    ready = database["ok"] and warmed_up
+    return ready, {
+        "status": "ready" if ready else "not ready",
+        "warmed_up": warmed_up,
+        "database": database,
+        "redis": redis_check,
+    }
+
+
+def reset_readiness() -> None:
+    """Forget the warm-up (tests)."""
+    global _warmed_up, _lock
+    _warmed_up = False
+    _lock = asyncio.Lock()
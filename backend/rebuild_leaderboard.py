@@ -0,0 +1,20 @@
+"""
+Leaderboard rebuild script.
+Run this after Redis is provisioned or flushed to repopulate the
+leaderboard sorted sets (all-time, this week, this month) from Postgres.
+"""
+import asyncio
+
+from models import get_async_session_local
+from services.leaderboard import rebuild_leaderboard
+
+
+async def main():
+    async with get_async_session_local()() as db:
+        counts = await rebuild_leaderboard(db)
+    for key, count in counts.items():
+        print(f"{key}: {count} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
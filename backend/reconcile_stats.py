@@ -0,0 +1,33 @@
+"""
+Admin stats reconciliation script.
+Recomputes every materialized admin counter (stat_counters) from the
+source tables. Run it from cron, or keep it running with --every.
+"""
+import argparse
+import asyncio
+import time
+
+from models import get_async_session_local
+from services.stats_service import reconcile
+
+
+async def reconcile_once():
+    started = time.perf_counter()
+    async with get_async_session_local()() as db:
+        written = await reconcile(db)
+    print(f"Reconciled {written} counters in {time.perf_counter() - started:.2f}s")
+
+
+async def main(every):
+    while True:
+        await reconcile_once()
+        if not every:
+            return
+        await asyncio.sleep(every)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--every", type=float, default=0, help="repeat every N seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.every))
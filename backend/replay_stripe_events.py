@@ -0,0 +1,29 @@
+"""
+Stripe event replay script.
+Marks stored webhook events (stripe_events) pending again and queues them
+for the job worker, e.g. after fixing a bug in how an event type is
+applied. Events are re-applied per customer in their original order.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+
+from models import get_async_session_local
+from services.stripe_webhooks import replay
+
+
+async def main(args):
+    async with get_async_session_local()() as db:
+        count = await replay(db, event_ids=args.event, customer_id=args.customer, since=args.since)
+    print(f"Queued {count} Stripe events for replay")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--event", action="append", default=[], help="event id (repeatable)")
+    parser.add_argument("--customer", help="only this Stripe customer's events")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only events created at or after this UTC time")
+    args = parser.parse_args()
+    if not (args.event or args.customer or args.since):
+        parser.error("pass --event, --customer or --since")
+    asyncio.run(main(args))
@@ -0,0 +1,100 @@
+"""
+Per-request database accounting.
+
+RequestMonitoringMiddleware gives each HTTP request a QueryStats in the
+current_query_stats context variable; the engine hooks from
+db_monitoring.install_query_tracking add every statement the request runs
+(count and time) to it. The totals are
+
+- returned in a Server-Timing header (db;dur=<ms>;desc="<n> queries",
+  app;dur=<ms>), visible in the browser's network panel,
+- logged as one JSON line per request on the "request" logger:
+  {"method", "path", "route", "status", "duration_ms", "db_queries", "db_ms"},
+- and recorded in the Prometheus request metrics (metrics.py).
+
+The header is sent when the response starts, so statements a streaming
+response runs afterwards only appear in the log line.
+"""
+import json
+import logging
+import time
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+
+import metrics
+from config import settings
+from db_monitoring import QueryStats, current_query_stats
+
+logger = logging.getLogger("request")
+
+_route_templates: Dict[object, str] = {}
+
+
+def route_template(scope) -> Optional[str]:
+    """The matched route's path template (e.g. /api/courses/lessons/{lesson_id})."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return None
+    template = _route_templates.get(endpoint)
+    if template is None:
+        app = scope.get("app")
+        for route in getattr(app, "routes", ()):
+            if getattr(route, "endpoint", None) is endpoint:
+                template = _route_templates[endpoint] = route.path
+                break
+    return template
+
+
+def server_timing(stats: QueryStats, seconds: float) -> str:
+    return f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries", app;dur={seconds * 1000:.1f}'
+
+
+class RequestMonitoringMiddleware:
+    """Pure ASGI middleware: handlers run in the same context, so they see the stats."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        if settings.METRICS_ENABLED:
+            metrics.IN_FLIGHT.inc()
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing", server_timing(stats, time.perf_counter() - start)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            seconds = time.perf_counter() - start
+            current_query_stats.reset(token)
+            route = route_template(scope)
+            if settings.METRICS_ENABLED:
+                metrics.IN_FLIGHT.dec()
+                # Unmatched paths share one label so scanners cannot blow up cardinality
+                metrics.observe_request(scope["method"], route or "unmatched", status_code, seconds, stats.count)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(json.dumps({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(seconds * 1000, 2),
+                    "db_queries": stats.count,
+                    "db_ms": round(stats.seconds * 1000, 2),
+                }))
@@ -8,6 +8,8 @@ from .courses import router as courses_router
 from .progress import router as progress_router
 from .submissions import router as submissions_router
 from .admin import router as admin_router
+from .users import router as users_router
+from .payments import router as payments_router
 
 # Register routers
 api_router.include_router(auth_router, prefix="/auth", tags=["auth"])
@@ -15,4 +17,6 @@ api_router.include_router(courses_router, prefix="/courses", tags=["courses"])
 api_router.include_router(progress_router, prefix="/progress", tags=["progress"])
 api_router.include_router(submissions_router, prefix="/submissions", tags=["submissions"])
 api_router.include_router(admin_router, prefix="/admin", tags=["admin"])
+api_router.include_router(users_router, prefix="/users", tags=["users"])
+api_router.include_router(payments_router, prefix="/payments", tags=["payments"])
 
@@ -1,57 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from models import get_db
-from models.user import User
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from models import get_async_db, get_async_engine
+from models.user import User, UserProfile, UserRole
 from models.progress import BossSubmission, SubmissionStatus
 from models.course import World, Level, Lesson
-from schemas.submissions import SubmissionResponse, GradeSubmissionRequest
+from schemas.submissions import GradeSubmissionRequest, AdminSubmissionResponse, SubmissionQueuePage
+from schemas.auth import RoleUpdateRequest
 from dependencies import get_admin_user
+from services.principal_cache import Principal, invalidate_principal
+from db_monitoring import pool_status
+from services.auth_service import hash_pool_stats
+from services.leaderboard import BOSS_BATTLE_XP
+from services.jobs import enqueue, queue_stats
+from services.pagination import encode_cursor, decode_cursor, InvalidCursor
+from services.s3_service import playback_url
+from services import stats_service
 from datetime import datetime
 import uuid
 
 router = APIRouter()
 
 
-@router.get("/submissions", response_model=List[SubmissionResponse])
+@router.get("/submissions", response_model=SubmissionQueuePage)
 async def get_pending_submissions(
-    admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    status_filter: str = Query("pending", alias="status", pattern="^(pending|approved|rejected)$"),
+    lesson_id: Optional[uuid.UUID] = None,
+    world_id: Optional[uuid.UUID] = None,
+    reviewer_id: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    admin_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all pending boss battle submissions."""
-    submissions = db.query(BossSubmission).filter(
-        BossSubmission.status == SubmissionStatus.PENDING
-    ).order_by(BossSubmission.submitted_at.asc()).all()
+    """
+    Review queue, oldest first, one keyset page at a time. Pass next_cursor
+    back as ?cursor= to get the following page.
+    """
+    stmt = select(
+        BossSubmission,
+        Lesson.title.label("lesson_title"),
+        UserProfile.first_name,
+        UserProfile.last_name,
+        User.email,
+    ).join(
+        Lesson, Lesson.id == BossSubmission.lesson_id
+    ).join(
+        User, User.id == BossSubmission.user_id
+    ).outerjoin(
+        UserProfile, UserProfile.user_id == BossSubmission.user_id
+    ).where(
+        BossSubmission.status == SubmissionStatus(status_filter)
+    )
     
-    return [
-        SubmissionResponse(
+    if lesson_id is not None:
+        stmt = stmt.where(BossSubmission.lesson_id == lesson_id)
+    if world_id is not None:
+        stmt = stmt.join(Level, Level.id == Lesson.level_id).where(Level.world_id == world_id)
+    if reviewer_id is not None:
+        stmt = stmt.where(BossSubmission.reviewed_by == reviewer_id)
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(BossSubmission.submitted_at, BossSubmission.id) > after)
+    
+    # One extra row tells us whether there is a next page
+    rows = (await db.execute(
+        stmt.order_by(BossSubmission.submitted_at, BossSubmission.id).limit(limit + 1)
+    )).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    items = [
+        AdminSubmissionResponse(
             id=str(s.id),
             status=s.status,
             feedback=s.instructor_feedback,
-            submitted_at=s.submitted_at
+            submitted_at=s.submitted_at,
+            user_id=str(s.user_id),
+            student_name=f"{first_name} {last_name}" if first_name else email,
+            student_email=email,
+            lesson_id=str(s.lesson_id),
+            lesson_title=lesson_title,
+            video_url=playback_url(s.video_url),
+            reviewed_at=s.reviewed_at,
+            reviewed_by=str(s.reviewed_by) if s.reviewed_by else None
         )
-        for s in submissions
+        for s, lesson_title, first_name, last_name, email in rows
     ]
+    next_cursor = encode_cursor(rows[-1][0].submitted_at, rows[-1][0].id) if has_more else None
+    return SubmissionQueuePage(items=items, next_cursor=next_cursor)
 
 
 @router.post("/submissions/{submission_id}/grade")
 async def grade_submission(
     submission_id: str,
     grade_data: GradeSubmissionRequest,
-    admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Grade a boss battle submission."""
-    submission = db.query(BossSubmission).filter(BossSubmission.id == submission_id).first()
-    if not submission:
+    # Locked until commit: concurrent gradings apply their transitions one after the other
+    row = (await db.execute(
+        select(BossSubmission, Level.world_id).join(
+            Lesson, Lesson.id == BossSubmission.lesson_id
+        ).join(
+            Level, Level.id == Lesson.level_id
+        ).where(BossSubmission.id == submission_id).with_for_update(of=BossSubmission)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Submission not found")
+    submission, world_id = row
+    old_status = submission.status
     
     # Update submission
     if grade_data.status == "approved":
         submission.status = SubmissionStatus.APPROVED
-        # Award XP for boss battle
-        from services.gamification_service import award_xp
-        award_xp(str(submission.user_id), 500, db)  # Boss battle XP
+        if old_status != SubmissionStatus.APPROVED:
+            # Award XP for boss battle (in the background, once per submission)
+            await enqueue(
+                db, "award_xp",
+                {"user_id": str(submission.user_id), "xp": BOSS_BATTLE_XP},
+                dedupe_key=f"boss-battle-xp:{submission.id}"
+            )
         
         # Unlock next world logic would go here
     elif grade_data.status == "rejected":
@@ -63,29 +137,108 @@ async def grade_submission(
     submission.instructor_video_url = grade_data.feedback_video_url
     submission.reviewed_at = datetime.utcnow()
     submission.reviewed_by = admin_user.id
+    await stats_service.record_grading(db, world_id, old_status, submission.status, submission.reviewed_at)
     
-    db.commit()
+    await db.commit()
     
     return {"message": "Submission graded successfully"}
 
 
+@router.put("/users/{user_id}/role")
+async def update_user_role(
+    user_id: uuid.UUID,
+    role_data: RoleUpdateRequest,
+    admin_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Change a user's role."""
+    try:
+        role = UserRole(role_data.role)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid role")
+    
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    user.role = role
+    await db.commit()
+    await invalidate_principal(user.id)
+    
+    return {"message": "Role updated successfully"}
+
+
 @router.get("/stats")
 async def get_admin_stats(
-    admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    admin_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get admin dashboard statistics."""
-    from models.user import UserProfile
-    
-    total_users = db.query(User).count()
-    total_submissions = db.query(BossSubmission).count()
-    pending_submissions = db.query(BossSubmission).filter(
-        BossSubmission.status == SubmissionStatus.PENDING
-    ).count()
+    """Get admin dashboard statistics from the materialized counters."""
+    counters = await stats_service.read_counters(db, stats_service.USERS, stats_service.SUBMISSIONS)
+    by_status = {s.value: counters[stats_service.SUBMISSIONS].get(s.value, 0) for s in SubmissionStatus}
     
     return {
-        "total_users": total_users,
-        "total_submissions": total_submissions,
-        "pending_submissions": pending_submissions
+        "total_users": counters[stats_service.USERS].get("total", 0),
+        "total_submissions": sum(by_status.values()),
+        "pending_submissions": by_status[SubmissionStatus.PENDING.value],
+        "submissions_by_status": by_status
     }
 
+
+@router.get("/stats/timeseries")
+async def get_admin_stats_timeseries(
+    days: int = Query(30, ge=1, le=366),
+    admin_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Daily signups, lesson completions and boss approvals for the last `days` days."""
+    return await stats_service.read_daily(db, days)
+
+
+@router.get("/stats/worlds")
+async def get_admin_stats_by_world(
+    admin_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Lesson completions and boss submissions per status for each world."""
+    metrics = [stats_service.WORLD_COMPLETIONS] + [
+        stats_service.WORLD_SUBMISSIONS + s.value for s in SubmissionStatus
+    ]
+    counters = await stats_service.read_counters(db, *metrics)
+    worlds = (await db.execute(
+        select(World.id, World.title).order_by(World.order_index)
+    )).all()
+    
+    return [
+        {
+            "world_id": str(world_id),
+            "title": title,
+            "completions": counters[stats_service.WORLD_COMPLETIONS].get(str(world_id), 0),
+            "submissions_by_status": {
+                s.value: counters[stats_service.WORLD_SUBMISSIONS + s.value].get(str(world_id), 0)
+                for s in SubmissionStatus
+            }
+        }
+        for world_id, title in worlds
+    ]
+
+
+@router.get("/db-pool")
+async def get_db_pool_status(admin_user: Principal = Depends(get_admin_user)):
+    """Connection pool occupancy and checkout wait times, for sizing DB_POOL_SIZE."""
+    return pool_status(get_async_engine())
+
+
+@router.get("/jobs")
+async def get_job_queue_status(
+    admin_user: Principal = Depends(get_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Background job counts per status and how far the workers are behind."""
+    return await queue_stats(db)
+
+
+@router.get("/hash-pool")
+async def get_hash_pool_status(admin_user: Principal = Depends(get_admin_user)):
+    """Queue depth and latency of the bcrypt thread pool used by register/login."""
+    return hash_pool_stats.snapshot()
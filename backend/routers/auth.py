@@ -1,33 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from datetime import timedelta
-from models import get_db
-from models.user import User, UserProfile, CurrentLevelTag, Subscription, SubscriptionTier
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from models import get_async_db
+from models.user import User, UserProfile, UserRole, CurrentLevelTag, Subscription, SubscriptionTier
 from schemas.auth import UserRegisterRequest, UserLoginRequest, TokenResponse, UserProfileResponse
-from services.auth_service import verify_password, get_password_hash, create_access_token
-from services.gamification_service import update_streak
+from services.auth_service import verify_password_async, get_password_hash_async, create_access_token
+from services.jobs import enqueue
+from services import stats_service
 from dependencies import get_current_user
-from config import settings
+from services.principal_cache import Principal, invalidate_principal
 import uuid
 
 router = APIRouter()
 
 
 @router.post("/register", response_model=TokenResponse)
-async def register(user_data: UserRegisterRequest, db: Session = Depends(get_db)):
+async def register(user_data: UserRegisterRequest, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = (await db.execute(
+        select(User.id).where(User.email == user_data.email)
+    )).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
 
+    # Return the connection to the pool while bcrypt runs on the hash threads
+    await db.close()
+
     # Create user
     user_id = uuid.uuid4()
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
-    from models.user import UserRole
     user = User(
         id=user_id,
         email=user_data.email,
@@ -35,7 +41,7 @@ async def register(user_data: UserRegisterRequest, db: Session = Depends(get_db)
         role=UserRole.STUDENT
     )
     db.add(user)
-    db.flush()
+    await db.flush()
 
     # Create user profile
     try:
@@ -63,8 +69,10 @@ async def register(user_data: UserRegisterRequest, db: Session = Depends(get_db)
         status="incomplete"
     )
     db.add(subscription)
+    await stats_service.record_signup(db)
 
-    db.commit()
+    await db.commit()
+    await invalidate_principal(user_id)
 
     # Create access token
     access_token = create_access_token(data={"sub": str(user_id)})
@@ -72,17 +80,26 @@ async def register(user_data: UserRegisterRequest, db: Session = Depends(get_db)
 
 
 @router.post("/token", response_model=TokenResponse)
-async def login(credentials: UserLoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == credentials.email).first()
-    if not user or not verify_password(credentials.password, user.hashed_password):
+async def login(credentials: UserLoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(
+        select(User).where(User.email == credentials.email)
+    )).scalar_one_or_none()
+
+    # Return the connection to the pool while bcrypt runs on the hash threads
+    await db.close()
+    if not user or not await verify_password_async(credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Update streak on login
-    update_streak(str(user.id), db)
+    # Update streak on login (in the background)
+    await enqueue(db, "update_streak", {
+        "user_id": str(user.id),
+        "logged_in_at": datetime.utcnow().isoformat()
+    })
+    await db.commit()
 
     # Create access token
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -91,18 +108,17 @@ async def login(credentials: UserLoginRequest, db: Session = Depends(get_db)):
 
 @router.get("/me", response_model=UserProfileResponse)
 async def get_current_user_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    profile = db.query(UserProfile).filter(UserProfile.user_id == current_user.id).first()
+    profile = await db.get(UserProfile, current_user.profile_id) if current_user.profile_id else None
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Profile not found"
         )
 
-    subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id).first()
-    tier = subscription.tier if subscription else "rookie"
+    tier = current_user.subscription_tier or "rookie"
 
     return UserProfileResponse(
         id=str(profile.id),
@@ -1,51 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from models import get_db
-from models.user import User, Subscription, SubscriptionStatus
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
+import uuid
+from models import get_async_db
 from models.course import World, Lesson, Level
-from models.progress import UserProgress
-from schemas.course import WorldResponse, LessonResponse, LessonDetailResponse
+from schemas.course import (
+    WorldResponse, LessonResponse, LessonDetailResponse,
+    CommentCreateRequest, CommentResponse, CommentThreadPage, CommentReplyPage,
+)
 from dependencies import get_current_user, get_current_user_optional
+from services.principal_cache import Principal
+from services.course_catalog import get_world_catalog
+from services.lesson_graph import LessonGraph
+from services.course_cache import get_course_snapshot
+from services.s3_service import hls_playback_url, playback_url
+from services import http_cache, catalog_cache, comment_service
 from typing import Optional
-from datetime import datetime
 
 router = APIRouter()
 
 
 @router.get("/worlds", response_model=List[WorldResponse])
 async def get_worlds(
-    current_user: Optional[User] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: Optional[Principal] = Depends(get_current_user_optional),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all worlds with lock status based on subscription. Accessible without authentication."""
-    worlds = db.query(World).filter(World.is_published == True).order_by(World.order_index).all()
+    if current_user is None:
+        # Same for every visitor: served pre-serialized from the catalog cache
+        catalog = await catalog_cache.get_anonymous_catalog(db)
+        if http_cache.is_fresh(request, catalog.etag):
+            return http_cache.not_modified(catalog.etag, None)
+        cached = Response(content=catalog.body, media_type="application/json")
+        http_cache.set_cache_headers(cached, catalog.etag, None)
+        return cached
     
-    # Check subscription if user is authenticated
-    is_subscribed = False
-    if current_user:
-        subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id).first()
-        is_subscribed = subscription and subscription.status == SubscriptionStatus.ACTIVE
+    etag = await http_cache.course_etag(db, current_user)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag, current_user)
+    http_cache.set_cache_headers(response, etag, current_user)
+    
+    worlds = await get_world_catalog(db, current_user.id)
+    
+    # Subscription status comes with the cached principal
+    is_subscribed = current_user.is_subscribed
     
     result = []
     for world in worlds:
-        # Check if world is locked (for unauthenticated users, only free worlds are unlocked)
-        is_locked = not world.is_free and (not current_user or not is_subscribed)
+        # Only free worlds are unlocked without a subscription
+        is_locked = not world.is_free and not is_subscribed
         
-        # Calculate progress (only if user is authenticated)
-        progress_percentage = 0
-        if current_user:
-            world_lessons = []
-            for level in world.levels:
-                world_lessons.extend(level.lessons)
-            
-            completed_count = db.query(UserProgress).filter(
-                UserProgress.user_id == current_user.id,
-                UserProgress.is_completed == True,
-                UserProgress.lesson_id.in_([l.id for l in world_lessons])
-            ).count()
-            
-            progress_percentage = (completed_count / len(world_lessons) * 100 if world_lessons else 0)
+        progress_percentage = (
+            world.completed_count / world.lesson_count * 100 if world.lesson_count else 0
+        )
         
         result.append(WorldResponse(
             id=str(world.id),
@@ -63,112 +73,185 @@ async def get_worlds(
 @router.get("/lessons/{lesson_id}", response_model=LessonDetailResponse)
 async def get_lesson(
     lesson_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get lesson details with lock status based on prerequisites."""
-    lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
-    if not lesson:
+    try:
+        lesson_id = uuid.UUID(lesson_id)
+    except ValueError:
         raise HTTPException(status_code=404, detail="Lesson not found")
+    etag = await http_cache.course_etag(db, current_user, signed_urls=True)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag, current_user)
     
-    # Check if previous lesson is completed
-    is_locked = False
-    if lesson.order_index > 1:
-        # Get previous lesson in same level
-        prev_lesson = db.query(Lesson).filter(
-            Lesson.level_id == lesson.level_id,
-            Lesson.order_index == lesson.order_index - 1
-        ).first()
-        
-        if prev_lesson:
-            progress = db.query(UserProgress).filter(
-                UserProgress.user_id == current_user.id,
-                UserProgress.lesson_id == prev_lesson.id,
-                UserProgress.is_completed == True
-            ).first()
-            is_locked = not progress
+    snapshot = await get_course_snapshot(db)
+    lesson = snapshot.get_lesson(lesson_id)
+    if lesson is not None:
+        # Structure comes from the course cache; only the prerequisite's progress needs the database
+        prev_lesson = snapshot.get_lesson(lesson.prev_id) if lesson.prev_id else None
+        graph = await LessonGraph.from_lessons(db, [l for l in (prev_lesson, lesson) if l], current_user.id)
+        world_is_free = lesson.is_free
+        next_lesson_id, prev_lesson_id = lesson.next_id, lesson.prev_id
+    else:
+        # Lessons of unpublished worlds are not cached
+        row = (await db.execute(
+            select(Lesson, World.is_free).join(
+                Level, Lesson.level_id == Level.id
+            ).join(
+                World, Level.world_id == World.id
+            ).where(Lesson.id == lesson_id)
+        )).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Lesson not found")
+        lesson, world_is_free = row
+        graph = await LessonGraph.for_level(db, lesson.level_id, current_user.id)
+        next_lesson = graph.next_lesson(lesson.id)
+        prev_lesson = graph.prev_lesson(lesson.id)
+        next_lesson_id = next_lesson.id if next_lesson else None
+        prev_lesson_id = prev_lesson.id if prev_lesson else None
+    is_locked = graph.is_locked(lesson.id)
     
     # Check subscription for non-free worlds
-    level = db.query(Level).filter(Level.id == lesson.level_id).first()
-    world = db.query(World).filter(World.id == level.world_id).first() if level else None
-    if world and not world.is_free:
-        subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id).first()
-        if not subscription or subscription.status != SubscriptionStatus.ACTIVE:
-            raise HTTPException(status_code=403, detail="Subscription required")
+    if not world_is_free and not current_user.is_subscribed:
+        raise HTTPException(status_code=403, detail="Subscription required")
     
     if is_locked:
         raise HTTPException(status_code=403, detail="Previous lesson must be completed")
     
-    # Get next and previous lesson IDs
-    next_lesson = db.query(Lesson).filter(
-        Lesson.level_id == lesson.level_id,
-        Lesson.order_index == lesson.order_index + 1
-    ).first()
-    
-    prev_lesson = db.query(Lesson).filter(
-        Lesson.level_id == lesson.level_id,
-        Lesson.order_index == lesson.order_index - 1
-    ).first()
-    
+    http_cache.set_cache_headers(response, etag, current_user)
     return LessonDetailResponse(
         id=str(lesson.id),
         title=lesson.title,
         description=lesson.description,
-        video_url=lesson.video_url,
+        video_url=playback_url(lesson.video_url),
+        hls_url=hls_playback_url(lesson.hls_url),
+        poster_url=playback_url(lesson.poster_url) if lesson.poster_url else None,
+        duration_minutes=lesson.duration_minutes,
         xp_value=lesson.xp_value,
-        next_lesson_id=str(next_lesson.id) if next_lesson else None,
-        prev_lesson_id=str(prev_lesson.id) if prev_lesson else None,
-        comments=[]  # TODO: Implement comments
+        next_lesson_id=str(next_lesson_id) if next_lesson_id else None,
+        prev_lesson_id=str(prev_lesson_id) if prev_lesson_id else None,
+        # Threads are paged separately: GET /lessons/{lesson_id}/comments
+        comments=[]
     )
 
 
 @router.get("/worlds/{world_id}/lessons", response_model=List[LessonResponse])
 async def get_world_lessons(
     world_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all lessons in a world with completion and lock status."""
-    world = db.query(World).filter(World.id == world_id).first()
-    if not world:
+    try:
+        world_id = uuid.UUID(world_id)
+    except ValueError:
         raise HTTPException(status_code=404, detail="World not found")
+    etag = await http_cache.course_etag(db, current_user, signed_urls=True)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag, current_user)
     
-    lessons = []
-    for level in world.levels:
-        for lesson in level.lessons:
-            # Check completion
-            progress = db.query(UserProgress).filter(
-                UserProgress.user_id == current_user.id,
-                UserProgress.lesson_id == lesson.id
-            ).first()
-            is_completed = progress.is_completed if progress else False
-            
-            # Check lock status
-            is_locked = False
-            if lesson.order_index > 1:
-                prev_lesson = db.query(Lesson).filter(
-                    Lesson.level_id == lesson.level_id,
-                    Lesson.order_index == lesson.order_index - 1
-                ).first()
-                if prev_lesson:
-                    prev_progress = db.query(UserProgress).filter(
-                        UserProgress.user_id == current_user.id,
-                        UserProgress.lesson_id == prev_lesson.id,
-                        UserProgress.is_completed == True
-                    ).first()
-                    is_locked = not prev_progress
-            
-            lessons.append(LessonResponse(
-                id=str(lesson.id),
-                title=lesson.title,
-                description=lesson.description,
-                video_url=lesson.video_url,
-                xp_value=lesson.xp_value,
-                is_completed=is_completed,
-                is_locked=is_locked,
-                is_boss_battle=lesson.is_boss_battle,
-                order_index=lesson.order_index
-            ))
+    snapshot = await get_course_snapshot(db)
+    if snapshot.get_world(world_id) is not None:
+        graph = await LessonGraph.from_lessons(db, snapshot.world_lessons(world_id), current_user.id)
+    else:
+        # Unpublished worlds are not cached
+        world = await db.get(World, world_id)
+        if not world:
+            raise HTTPException(status_code=404, detail="World not found")
+        graph = await LessonGraph.for_world(db, world.id, current_user.id)
     
-    return lessons
+    http_cache.set_cache_headers(response, etag, current_user)
+    return [
+        LessonResponse(
+            id=str(lesson.id),
+            title=lesson.title,
+            description=lesson.description,
+            video_url=playback_url(lesson.video_url),
+            hls_url=hls_playback_url(lesson.hls_url),
+            poster_url=playback_url(lesson.poster_url) if lesson.poster_url else None,
+            duration_minutes=lesson.duration_minutes,
+            xp_value=lesson.xp_value,
+            is_completed=graph.is_completed(lesson.id),
+            is_locked=graph.is_locked(lesson.id),
+            is_boss_battle=lesson.is_boss_battle,
+            order_index=lesson.order_index
+        )
+        for lesson in graph.lessons
+    ]
+
 
+async def _check_comment_access(db: AsyncSession, lesson_id, current_user: Principal) -> None:
+    """Comments follow the lesson's own access: published, and paid worlds need a subscription."""
+    lesson = (await get_course_snapshot(db)).get_lesson(lesson_id)
+    if lesson is None:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    if not lesson.is_free and not current_user.is_subscribed:
+        raise HTTPException(status_code=403, detail="Subscription required")
+
+
+@router.get("/lessons/{lesson_id}/comments", response_model=CommentThreadPage)
+async def get_lesson_comments(
+    lesson_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    A lesson's comment threads, newest first, one keyset page at a time,
+    each with its first replies. Pass next_cursor back as ?cursor=.
+    """
+    await _check_comment_access(db, lesson_id, current_user)
+    try:
+        return await comment_service.thread_page(db, lesson_id, cursor, limit)
+    except comment_service.CommentError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@router.post("/lessons/{lesson_id}/comments", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
+async def create_lesson_comment(
+    lesson_id: str,
+    comment_data: CommentCreateRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start a thread on a lesson, or reply to a comment with parent_id."""
+    await _check_comment_access(db, lesson_id, current_user)
+    try:
+        return await comment_service.create_comment(
+            db, current_user.id, lesson_id, comment_data.content, comment_data.parent_id
+        )
+    except comment_service.CommentError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@router.get("/comments/{comment_id}/replies", response_model=CommentReplyPage)
+async def get_comment_replies(
+    comment_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Every reply below a comment (all depths), oldest first, one keyset page at a time."""
+    try:
+        lesson_id = await comment_service.get_lesson_id(db, comment_id)
+        await _check_comment_access(db, lesson_id, current_user)
+        return await comment_service.reply_page(db, comment_id, cursor, limit)
+    except comment_service.CommentError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@router.get("/comment-counts", response_model=Dict[str, int])
+async def get_comment_counts(
+    lesson_id: List[str] = Query(...),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Number of comments per lesson: ?lesson_id=...&lesson_id=..."""
+    return await comment_service.comment_counts(db, lesson_id)
@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from models import get_db
-from models.user import User
+from models import get_async_db
 from models.progress import BossSubmission, SubmissionStatus
-from models.course import Lesson
-from schemas.submissions import SubmissionCreateRequest, SubmissionResponse
+from models.course import Level, Lesson
+from schemas.submissions import (
+    SubmissionCreateRequest, SubmissionResponse, UploadInitiateRequest, UploadSessionResponse,
+    UploadPartUrlsRequest, UploadPartUrlsResponse, UploadPartsReportRequest,
+)
+from services import stats_service, upload_service
+from config import settings
 from dependencies import get_current_user
-from datetime import datetime
+from services.principal_cache import Principal
 import uuid
 
 router = APIRouter()
@@ -16,22 +21,29 @@ router = APIRouter()
 @router.post("/submit", response_model=SubmissionResponse)
 async def submit_boss_battle(
     submission_data: SubmissionCreateRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submit a boss battle video."""
-    lesson = db.query(Lesson).filter(Lesson.id == submission_data.lesson_id).first()
-    if not lesson:
+    row = (await db.execute(
+        select(Lesson, Level.world_id).join(
+            Level, Level.id == Lesson.level_id
+        ).where(Lesson.id == submission_data.lesson_id)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Lesson not found")
+    lesson, world_id = row
     
     if not lesson.is_boss_battle:
         raise HTTPException(status_code=400, detail="This lesson is not a boss battle")
     
     # Check if submission already exists
-    existing = db.query(BossSubmission).filter(
-        BossSubmission.user_id == current_user.id,
-        BossSubmission.lesson_id == lesson.id
-    ).first()
+    existing = (await db.execute(
+        select(BossSubmission.id).where(
+            BossSubmission.user_id == current_user.id,
+            BossSubmission.lesson_id == lesson.id
+        )
+    )).first()
     
     if existing:
         raise HTTPException(status_code=400, detail="Submission already exists for this lesson")
@@ -45,7 +57,8 @@ async def submit_boss_battle(
         status=SubmissionStatus.PENDING
     )
     db.add(submission)
-    db.commit()
+    await stats_service.record_submission(db, world_id)
+    await db.commit()
     
     return SubmissionResponse(
         id=str(submission.id),
@@ -57,13 +70,15 @@ async def submit_boss_battle(
 
 @router.get("/my-submissions", response_model=List[SubmissionResponse])
 async def get_my_submissions(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all submissions for current user."""
-    submissions = db.query(BossSubmission).filter(
-        BossSubmission.user_id == current_user.id
-    ).order_by(BossSubmission.submitted_at.desc()).all()
+    submissions = (await db.execute(
+        select(BossSubmission).where(
+            BossSubmission.user_id == current_user.id
+        ).order_by(BossSubmission.submitted_at.desc())
+    )).scalars().all()
     
     return [
         SubmissionResponse(
@@ -75,3 +90,113 @@ async def get_my_submissions(
         for s in submissions
     ]
 
+
+def _upload_response(session) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        id=str(session.id),
+        lesson_id=str(session.lesson_id),
+        status=session.status.value,
+        size_bytes=session.size_bytes,
+        part_size=session.part_size,
+        part_count=session.part_count,
+        uploaded_parts=sorted(int(number) for number in session.parts),
+        missing_parts=upload_service.missing_parts(session),
+        submission_id=str(session.submission_id) if session.submission_id else None,
+    )
+
+
+@router.post("/uploads", response_model=UploadSessionResponse)
+async def initiate_upload(
+    upload_data: UploadInitiateRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start a resumable boss battle video upload, or resume the one in progress."""
+    try:
+        session = await upload_service.initiate_upload(
+            db, current_user.id, upload_data.lesson_id,
+            upload_data.filename, upload_data.content_type, upload_data.size_bytes,
+        )
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _upload_response(session)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(
+    upload_id: str,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get an upload's progress (which parts are still missing)."""
+    try:
+        session = await upload_service.get_session(db, upload_id, current_user.id)
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _upload_response(session)
+
+
+@router.post("/uploads/{upload_id}/part-urls", response_model=UploadPartUrlsResponse)
+async def get_upload_part_urls(
+    upload_id: str,
+    request_data: UploadPartUrlsRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Presigned URLs to PUT parts directly to storage."""
+    try:
+        session = await upload_service.get_session(db, upload_id, current_user.id)
+        urls = upload_service.presign_parts(session, request_data.part_numbers)
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return UploadPartUrlsResponse(urls=urls, expires_in=settings.UPLOAD_PART_URL_EXPIRY_SECONDS)
+
+
+@router.post("/uploads/{upload_id}/parts", response_model=UploadSessionResponse)
+async def report_upload_parts(
+    upload_id: str,
+    report: UploadPartsReportRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Record parts the client has finished uploading (their ETags)."""
+    try:
+        session = await upload_service.record_parts(
+            db, upload_id, current_user.id, {part.part_number: part.etag for part in report.parts}
+        )
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return _upload_response(session)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=SubmissionResponse)
+async def complete_upload(
+    upload_id: str,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Finish an upload and submit the video for grading."""
+    try:
+        submission = await upload_service.complete_upload(db, upload_id, current_user.id)
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    return SubmissionResponse(
+        id=str(submission.id),
+        status=submission.status,
+        feedback=submission.instructor_feedback,
+        submitted_at=submission.submitted_at
+    )
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    upload_id: str,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Abandon an upload and discard its uploaded parts."""
+    try:
+        await upload_service.abort_upload(db, upload_id, current_user.id)
+    except upload_service.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
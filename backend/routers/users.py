@@ -1,62 +1,73 @@
-from typing import Annotated, List
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from models import get_async_db
+from models.user import UserProfile
+from schemas.auth import UserProfileResponse
+from schemas.gamification import LeaderboardEntry, LeaderboardAroundResponse
+from services import leaderboard
+from dependencies import get_current_user
+from services.principal_cache import Principal
 
-from output.backend.dependencies import get_db, get_current_user
-from output.backend.schemas import gamification as gamification_schemas
-from output.backend.models import user as user_models
+router = APIRouter()
 
-router = APIRouter(prefix="/users", tags=["users"])
+PERIOD_PATTERN = "^(all|weekly|monthly)$"
 
 
-@router.get("/me", response_model=gamification_schemas.UserProfileResponse)
-def read_users_me(
-    current_user: Annotated[user_models.User, Depends(get_current_user)],
+@router.get("/me", response_model=UserProfileResponse)
+async def read_users_me(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if not current_user.profile:
-        # This should ideally not happen if user and profile are created together
+    """Get the current user's profile."""
+    profile = await db.get(UserProfile, current_user.profile_id) if current_user.profile_id else None
+    if not profile:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User profile not found"
         )
-    
-    # Assuming Subscription model has a 'tier' attribute
-    subscription_tier = current_user.subscription.tier.value if current_user.subscription else "rookie"
-
-    return gamification_schemas.UserProfileResponse(
-        id=current_user.profile.id,
-        first_name=current_user.profile.first_name,
-        last_name=current_user.profile.last_name,
-        xp=current_user.profile.xp,
-        level=current_user.profile.level,
-        streak_count=current_user.profile.streak_count,
-        tier=subscription_tier,
-        avatar_url=current_user.profile.avatar_url,
-        current_level_tag=current_user.profile.current_level_tag.value
+
+    return UserProfileResponse(
+        id=str(profile.id),
+        first_name=profile.first_name,
+        last_name=profile.last_name,
+        xp=profile.xp,
+        level=profile.level,
+        streak_count=profile.streak_count,
+        tier=current_user.subscription_tier or "rookie",
+        role=current_user.role.value,
+        avatar_url=profile.avatar_url
     )
 
 
-@router.get("/leaderboard", response_model=List[gamification_schemas.LeaderboardEntry])
-def get_leaderboard(db: Annotated[Session, Depends(get_db)]):
-    leaderboard_entries = (
-        db.query(user_models.UserProfile)
-        .join(user_models.User)
-        .order_by(desc(user_models.UserProfile.xp))
-        .limit(10)
-        .all()
+def _entry(row) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        user_id=row.user_id,
+        name=row.name,
+        avatar_url=row.avatar_url,
+        xp_total=row.xp_total,
+        rank=row.rank
     )
 
-    results = []
-    for entry in leaderboard_entries:
-        # Assuming User model has a 'subscription' relationship to get tier
-        subscription_tier = entry.user.subscription.tier.value if entry.user.subscription else "rookie"
-        results.append(
-            gamification_schemas.LeaderboardEntry(
-                user_id=entry.user_id,
-                name=f"{entry.first_name} {entry.last_name}",
-                avatar_url=entry.avatar_url,
-                xp_total=entry.xp,
-                tier=subscription_tier
-            )
-        )
-    return results
\ No newline at end of file
+
+@router.get("/leaderboard", response_model=List[LeaderboardEntry])
+async def get_leaderboard(
+    period: str = Query("all", pattern=PERIOD_PATTERN),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Top users by XP, all-time or for the current week/month."""
+    rows = await leaderboard.get_top(db, period, limit)
+    return [_entry(row) for row in rows]
+
+
+@router.get("/leaderboard/me", response_model=LeaderboardAroundResponse)
+async def get_my_leaderboard_position(
+    period: str = Query("all", pattern=PERIOD_PATTERN),
+    radius: int = Query(2, ge=0, le=25),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """The current user's rank and the users just above and below them."""
+    rank, rows = await leaderboard.get_around(db, current_user.id, period, radius)
+    return LeaderboardAroundResponse(rank=rank, entries=[_entry(row) for row in rows])
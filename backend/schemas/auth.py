@@ -35,3 +35,7 @@ class UserProfileResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class RoleUpdateRequest(BaseModel):
+    role: str  # "student", "instructor" or "admin"
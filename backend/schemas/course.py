@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -21,6 +21,9 @@ class LessonResponse(BaseModel):
     title: str
     description: Optional[str]
     video_url: str
+    hls_url: Optional[str] = None
+    poster_url: Optional[str] = None
+    duration_minutes: Optional[int] = None
     xp_value: int
     is_completed: bool
     is_locked: bool
@@ -37,16 +40,44 @@ class CommentResponse(BaseModel):
     content: str
     created_at: datetime
     parent_id: Optional[str] = None
+    author_name: Optional[str] = None
+    depth: int = 0  # 0 for a thread, 1 for a direct reply, ...
 
     class Config:
         from_attributes = True
 
 
+class CommentCreateRequest(BaseModel):
+    content: str = Field(..., min_length=1, max_length=5000)
+    parent_id: Optional[str] = None  # reply to this comment
+
+
+class CommentThreadResponse(CommentResponse):
+    # The thread's first replies (all depths, oldest first); page the rest
+    # with GET /courses/comments/{id}/replies
+    replies: List[CommentResponse] = []
+    reply_count: int = 0
+
+
+class CommentThreadPage(BaseModel):
+    items: List[CommentThreadResponse]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+    total_comments: int = 0
+
+
+class CommentReplyPage(BaseModel):
+    items: List[CommentResponse]
+    next_cursor: Optional[str] = None
+
+
 class LessonDetailResponse(BaseModel):
     id: str
     title: str
     description: Optional[str]
     video_url: str
+    hls_url: Optional[str] = None
+    poster_url: Optional[str] = None
+    duration_minutes: Optional[int] = None
     xp_value: int
     next_lesson_id: Optional[str] = None
     prev_lesson_id: Optional[str] = None
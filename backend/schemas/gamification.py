@@ -15,3 +15,8 @@ class LeaderboardEntry(BaseModel):
     xp_total: int
     rank: int
 
+
+
+class LeaderboardAroundResponse(BaseModel):
+    rank: int | None
+    entries: list[LeaderboardEntry]
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+
+class CheckoutSessionRequest(BaseModel):
+    price_id: str
+    success_url: str
+    cancel_url: str
+
+
+class CheckoutSessionResponse(BaseModel):
+    session_id: str
+    url: str
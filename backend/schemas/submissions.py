@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -23,3 +23,57 @@ class GradeSubmissionRequest(BaseModel):
     feedback_text: Optional[str] = None
     feedback_video_url: Optional[str] = None
 
+
+
+class AdminSubmissionResponse(SubmissionResponse):
+    user_id: str
+    student_name: str
+    student_email: str
+    lesson_id: str
+    lesson_title: str
+    video_url: str
+    reviewed_at: Optional[datetime] = None
+    reviewed_by: Optional[str] = None
+
+
+class SubmissionQueuePage(BaseModel):
+    items: List[AdminSubmissionResponse]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+
+class UploadInitiateRequest(BaseModel):
+    lesson_id: str
+    filename: str
+    content_type: str
+    size_bytes: int
+
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    lesson_id: str
+    status: str
+    size_bytes: int
+    part_size: int
+    part_count: int
+    uploaded_parts: List[int]
+    missing_parts: List[int]
+    submission_id: Optional[str] = None
+
+
+class UploadPartUrlsRequest(BaseModel):
+    # Defaults to the next batch of parts not uploaded yet
+    part_numbers: Optional[List[int]] = None
+
+
+class UploadPartUrlsResponse(BaseModel):
+    urls: Dict[int, str]
+    expires_in: int
+
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class UploadPartsReportRequest(BaseModel):
+    parts: List[UploadedPart]
@@ -1,3 +1,7 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
@@ -14,6 +18,95 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class HashPoolStats:
+    """Queue depth and latency of the bcrypt thread pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queued = 0
+            self.running = 0
+            self.completed = 0
+            self.total_wait = 0.0
+            self.total_hash = 0.0
+            self.max_latency = 0.0
+
+    def submitted(self):
+        with self._lock:
+            self.queued += 1
+
+    def started(self, waited: float):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += waited
+
+    def finished(self, waited: float, hashed: float):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+            self.total_hash += hashed
+            self.max_latency = max(self.max_latency, waited + hashed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": settings.PASSWORD_HASH_WORKERS,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_queue_wait_ms": self.total_wait / completed * 1000,
+                "avg_hash_ms": self.total_hash / completed * 1000,
+                "max_latency_ms": self.max_latency * 1000,
+            }
+
+
+hash_pool_stats = HashPoolStats()
+_hash_executor = None
+
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    """Get or create the thread pool bcrypt work runs on."""
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash",
+        )
+    return _hash_executor
+
+
+async def _run_in_hash_pool(func, *args):
+    submitted_at = time.perf_counter()
+    hash_pool_stats.submitted()
+
+    def timed():
+        started_at = time.perf_counter()
+        waited = started_at - submitted_at
+        hash_pool_stats.started(waited)
+        try:
+            return func(*args)
+        finally:
+            hash_pool_stats.finished(waited, time.perf_counter() - started_at)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), timed)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hash thread pool, keeping the event loop free."""
+    return await _run_in_hash_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hash thread pool, keeping the event loop free."""
+    return await _run_in_hash_pool(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -31,4 +124,3 @@ def decode_access_token(token: str):
         return payload
     except JWTError:
         return None
-
@@ -0,0 +1,182 @@
+"""
+Pre-serialized world catalog for anonymous visitors.
+
+Without a signed-in user GET /api/courses/worlds is the same list for
+everyone (landing page traffic), so each worker keeps it as ready-to-send
+JSON bytes together with its ETag, keyed by the course content version:
+
+- The entry is built from the in-process CourseSnapshot (services.course_cache),
+  so a rebuild costs no queries beyond the snapshot's own.
+- Concurrent misses wait on one lock and share a single rebuild.
+- With Redis enabled the latest entry is also published there, so a freshly
+  started worker can serve it before touching the database.
+- In the API process a background task (start_refresher, started from the
+  app lifespan) re-checks the content version every
+  CATALOG_CACHE_REFRESH_SECONDS and swaps in a new entry when it moved;
+  requests then never touch the database. Without the refresher (scripts,
+  tests) requests check the snapshot themselves, which queries at most once
+  every COURSE_CACHE_CHECK_SECONDS.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from schemas.course import WorldResponse
+from services import http_cache
+from services.course_cache import CourseSnapshot, get_course_snapshot, invalidate_course_cache
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = "catalog:anonymous"
+
+_serializer = TypeAdapter(List[WorldResponse])
+
+
+class CatalogEntry:
+    """The anonymous catalog at one content version, ready to send."""
+    __slots__ = ("version", "body", "etag")
+
+    def __init__(self, version: int, body: bytes):
+        self.version = version
+        self.body = body
+        self.etag = http_cache.make_etag(str(version))
+
+
+_entry: Optional[CatalogEntry] = None
+_lock = asyncio.Lock()
+_refresher: Optional[asyncio.Task] = None
+# Anonymous catalog requests / entries serialized (misses)
+_requests = 0
+_misses = 0
+
+
+def serialize(snapshot: CourseSnapshot) -> bytes:
+    """The anonymous GET /worlds body: free worlds unlocked, no progress."""
+    return _serializer.dump_json([
+        WorldResponse(
+            id=str(world.id),
+            title=world.title,
+            description=world.description,
+            image_url=world.image_url,
+            difficulty=world.difficulty,
+            progress_percentage=0,
+            is_locked=not world.is_free,
+        )
+        for world in snapshot.worlds
+    ])
+
+
+async def _read_redis() -> Optional[CatalogEntry]:
+    redis = get_redis()
+    if redis is None:
+        return None
+    try:
+        cached = await redis.hgetall(REDIS_KEY)
+    except Exception as e:
+        logger.warning(f"Catalog cache Redis read failed: {e}")
+        return None
+    if not cached:
+        return None
+    return CatalogEntry(int(cached["version"]), cached["body"].encode())
+
+
+async def _write_redis(entry: CatalogEntry) -> None:
+    redis = get_redis()
+    if redis is None:
+        return
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(REDIS_KEY, mapping={"version": entry.version, "body": entry.body.decode()})
+            pipe.expire(REDIS_KEY, settings.CATALOG_CACHE_REDIS_TTL_SECONDS)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Catalog cache Redis write failed: {e}")
+
+
+async def refresh(db: AsyncSession) -> CatalogEntry:
+    """Return the entry for the current content version, rebuilding it if needed."""
+    global _entry, _misses
+
+    snapshot = await get_course_snapshot(db)
+    entry = _entry
+    if entry is not None and entry.version == snapshot.version:
+        return entry
+
+    async with _lock:
+        if _entry is not None and _entry.version == snapshot.version:
+            # Another request rebuilt while we waited
+            return _entry
+        entry = await _read_redis()
+        if entry is None or entry.version != snapshot.version:
+            entry = CatalogEntry(snapshot.version, serialize(snapshot))
+            _misses += 1
+            await _write_redis(entry)
+        _entry = entry
+    return entry
+
+
+async def get_anonymous_catalog(db: AsyncSession) -> CatalogEntry:
+    """The catalog for anonymous visitors; no queries while the refresher runs."""
+    global _entry, _requests
+
+    _requests += 1
+    entry = _entry
+    if entry is None and _refresher is not None:
+        async with _lock:
+            if _entry is None:
+                _entry = await _read_redis()
+            entry = _entry
+    if entry is not None and _refresher is not None:
+        return entry
+    return await refresh(db)
+
+
+async def _refresh_forever(session_factory, interval: float) -> None:
+    while True:
+        try:
+            # Re-check the content version now rather than on the snapshot's schedule
+            invalidate_course_cache()
+            async with session_factory() as db:
+                await refresh(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Catalog cache refresh failed")
+        await asyncio.sleep(interval)
+
+
+def start_refresher(session_factory, interval: Optional[float] = None) -> asyncio.Task:
+    """Keep the entry current from a background task on the running loop."""
+    global _refresher
+    if _refresher is None or _refresher.done():
+        _refresher = asyncio.create_task(_refresh_forever(
+            session_factory,
+            settings.CATALOG_CACHE_REFRESH_SECONDS if interval is None else interval,
+        ))
+    return _refresher
+
+
+async def stop_refresher() -> None:
+    global _refresher
+    task, _refresher = _refresher, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def catalog_cache_stats() -> dict:
+    return {"version": _entry.version if _entry else None, "hits": max(0, _requests - _misses), "misses": _misses}
+
+
+def clear_catalog_cache() -> None:
+    global _entry, _lock
+    _entry = None
+    _lock = asyncio.Lock()
@@ -0,0 +1,221 @@
+"""
+Lesson comment threads.
+
+A lesson's top-level comments (parent_id NULL) are its threads, paged
+newest first with keyset cursors over (created_at, id). Each page loads in
+a fixed number of queries whatever the lesson's size:
+
+1. the page of threads (ix_comments_lesson_created_at),
+2. one recursive CTE walking down from all of the page's threads at once
+   (ix_comments_parent_id), returning at most REPLIES_PER_THREAD replies per
+   thread together with each thread's total reply count,
+3. the lesson's comment count (a stat_counters row, see stats_service).
+
+Replies come back flat, oldest first, with their parent_id and depth, so
+the client nests them; a thread's remaining replies are paged with
+reply_page. Nothing goes through the Comment.replies relationship, which
+would load one level per query.
+"""
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, func, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.progress import Comment
+from models.user import UserProfile
+from schemas.course import CommentResponse, CommentThreadResponse, CommentThreadPage, CommentReplyPage
+from services import stats_service
+from services.pagination import encode_cursor, decode_cursor, InvalidCursor
+
+REPLIES_PER_THREAD = 20
+
+
+class CommentError(Exception):
+    """A comment request was refused; carries the HTTP status and detail to return."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _as_uuid(value, detail: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise CommentError(404, detail)
+
+
+def _after(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursor:
+        raise CommentError(400, "Invalid cursor")
+
+
+_COLUMNS = (
+    Comment.id,
+    Comment.user_id,
+    Comment.parent_id,
+    Comment.content,
+    Comment.created_at,
+    UserProfile.first_name,
+    UserProfile.last_name,
+)
+
+
+def _with_authors(stmt):
+    return stmt.outerjoin(UserProfile, UserProfile.user_id == Comment.user_id)
+
+
+def _response(row, cls=CommentResponse, **extra):
+    return cls(
+        id=str(row.id),
+        user_id=str(row.user_id),
+        parent_id=str(row.parent_id) if row.parent_id else None,
+        content=row.content,
+        created_at=row.created_at,
+        author_name=f"{row.first_name} {row.last_name}" if row.first_name else None,
+        **extra,
+    )
+
+
+def _descendants(root_ids: Iterable[uuid.UUID]):
+    """Recursive CTE of every reply below the given comments: (id, root_id, depth)."""
+    tree = select(
+        Comment.id, Comment.parent_id.label("root_id"), literal(1).label("depth")
+    ).where(Comment.parent_id.in_(list(root_ids))).cte("comment_tree", recursive=True)
+    return tree.union_all(
+        select(Comment.id, tree.c.root_id, tree.c.depth + 1).join(tree, Comment.parent_id == tree.c.id)
+    )
+
+
+async def thread_page(db: AsyncSession, lesson_id, cursor: Optional[str] = None, limit: int = 20) -> CommentThreadPage:
+    """One page of a lesson's threads, newest first, with their first replies."""
+    lesson_id = _as_uuid(lesson_id, "Lesson not found")
+    stmt = _with_authors(select(*_COLUMNS)).where(
+        Comment.lesson_id == lesson_id,
+        Comment.parent_id.is_(None),
+    )
+    after = _after(cursor)
+    if after is not None:
+        stmt = stmt.where(tuple_(Comment.created_at, Comment.id) < after)
+
+    # One extra row tells us whether there is a next page
+    threads = (await db.execute(
+        stmt.order_by(Comment.created_at.desc(), Comment.id.desc()).limit(limit + 1)
+    )).all()
+    has_more = len(threads) > limit
+    threads = threads[:limit]
+
+    replies: Dict[uuid.UUID, list] = {thread.id: [] for thread in threads}
+    reply_counts: Dict[uuid.UUID, int] = {}
+    if threads:
+        tree = _descendants(replies)
+        ranked = _with_authors(
+            select(
+                *_COLUMNS,
+                tree.c.root_id,
+                tree.c.depth,
+                func.row_number().over(
+                    partition_by=tree.c.root_id, order_by=(Comment.created_at, Comment.id)
+                ).label("position"),
+                func.count().over(partition_by=tree.c.root_id).label("reply_count"),
+            ).join(tree, tree.c.id == Comment.id)
+        ).subquery()
+        rows = (await db.execute(
+            select(ranked).where(
+                ranked.c.position <= REPLIES_PER_THREAD
+            ).order_by(ranked.c.root_id, ranked.c.position)
+        )).all()
+        for row in rows:
+            replies[row.root_id].append(_response(row, depth=row.depth))
+            reply_counts[row.root_id] = row.reply_count
+
+    total = await stats_service.read_buckets(db, stats_service.LESSON_COMMENTS, [str(lesson_id)])
+    last = threads[-1] if threads else None
+    return CommentThreadPage(
+        items=[
+            _response(
+                thread,
+                CommentThreadResponse,
+                replies=replies[thread.id],
+                reply_count=reply_counts.get(thread.id, 0),
+            )
+            for thread in threads
+        ],
+        next_cursor=encode_cursor(last.created_at, last.id) if has_more else None,
+        total_comments=total[str(lesson_id)],
+    )
+
+
+async def reply_page(db: AsyncSession, thread_id, cursor: Optional[str] = None, limit: int = 50) -> CommentReplyPage:
+    """One page of every reply below a thread, oldest first."""
+    thread_id = _as_uuid(thread_id, "Comment not found")
+    tree = _descendants([thread_id])
+    stmt = _with_authors(
+        select(*_COLUMNS, tree.c.depth).join(tree, tree.c.id == Comment.id)
+    )
+    after = _after(cursor)
+    if after is not None:
+        stmt = stmt.where(tuple_(Comment.created_at, Comment.id) > after)
+
+    rows = (await db.execute(
+        stmt.order_by(Comment.created_at, Comment.id).limit(limit + 1)
+    )).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return CommentReplyPage(
+        items=[_response(row, depth=row.depth) for row in rows],
+        next_cursor=encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+    )
+
+
+async def get_lesson_id(db: AsyncSession, comment_id) -> uuid.UUID:
+    comment_id = _as_uuid(comment_id, "Comment not found")
+    lesson_id = (await db.execute(
+        select(Comment.lesson_id).where(Comment.id == comment_id)
+    )).scalar()
+    if lesson_id is None:
+        raise CommentError(404, "Comment not found")
+    return lesson_id
+
+
+async def create_comment(db: AsyncSession, user_id, lesson_id, content: str, parent_id=None) -> CommentResponse:
+    """Add a thread or a reply to a lesson and commit."""
+    lesson_id = _as_uuid(lesson_id, "Lesson not found")
+    content = content.strip()
+    if not content:
+        raise CommentError(400, "Comment cannot be empty")
+    if parent_id is not None:
+        parent_id = _as_uuid(parent_id, "Comment not found")
+        if await get_lesson_id(db, parent_id) != lesson_id:
+            raise CommentError(400, "Replies must be on the same lesson")
+
+    comment = Comment(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        lesson_id=lesson_id,
+        parent_id=parent_id,
+        content=content,
+        created_at=datetime.utcnow(),
+    )
+    db.add(comment)
+    await stats_service.record_comment(db, lesson_id)
+    await db.commit()
+    return CommentResponse(
+        id=str(comment.id),
+        user_id=str(comment.user_id),
+        parent_id=str(parent_id) if parent_id else None,
+        content=comment.content,
+        created_at=comment.created_at,
+    )
+
+
+async def comment_counts(db: AsyncSession, lesson_ids: List[str]) -> Dict[str, int]:
+    """{lesson_id: number of comments} in one lookup."""
+    return await stats_service.read_buckets(db, stats_service.LESSON_COMMENTS, lesson_ids)
@@ -0,0 +1,106 @@
+"""
+Lesson completion pipeline.
+
+complete_lesson runs a whole completion in one transaction and five
+statements: one join resolving the lesson, its predecessor and both
+progress rows; an INSERT ... ON CONFLICT upsert of the progress row; the
+XP and streak UPDATEs; and the admin stats counter upsert. Duplicate completions racing each other are
+settled by the unique_user_lesson constraint: only the request whose
+upsert flips is_completed gets a row back and awards XP.
+"""
+from datetime import datetime
+import uuid
+from sqlalchemy import select, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from models.course import Level, Lesson
+from models.progress import UserProgress
+from services.gamification_service import award_xp, update_streak, commit_awards
+from services import stats_service
+
+
+class CompletionError(Exception):
+    """A completion was refused; carries the HTTP status and detail to return."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def _load_completion_state(db: AsyncSession, user_id, lesson_id):
+    prev_lesson = aliased(Lesson)
+    own_progress = aliased(UserProgress)
+    prev_progress = aliased(UserProgress)
+    return (await db.execute(
+        select(
+            Lesson.id,
+            Lesson.xp_value,
+            Lesson.order_index,
+            Level.world_id,
+            prev_lesson.id.label("prev_id"),
+            own_progress.is_completed.label("completed"),
+            prev_progress.is_completed.label("prev_completed"),
+        ).join(
+            Level, Level.id == Lesson.level_id
+        ).outerjoin(
+            prev_lesson,
+            and_(
+                prev_lesson.level_id == Lesson.level_id,
+                prev_lesson.order_index == Lesson.order_index - 1,
+            )
+        ).outerjoin(
+            own_progress,
+            and_(own_progress.lesson_id == Lesson.id, own_progress.user_id == user_id)
+        ).outerjoin(
+            prev_progress,
+            and_(prev_progress.lesson_id == prev_lesson.id, prev_progress.user_id == user_id)
+        ).where(Lesson.id == lesson_id)
+    )).first()
+
+
+async def complete_lesson(db: AsyncSession, user_id, lesson_id) -> dict:
+    """
+    Mark a lesson complete, award its XP and update the streak, then commit.
+    Returns award_xp's result; raises CompletionError when the lesson does
+    not exist, is already completed or is still locked.
+    """
+    try:
+        lesson_id = uuid.UUID(str(lesson_id))
+    except ValueError:
+        raise CompletionError(404, "Lesson not found")
+
+    state = await _load_completion_state(db, user_id, lesson_id)
+    if state is None:
+        raise CompletionError(404, "Lesson not found")
+    if state.completed:
+        raise CompletionError(400, "Lesson already completed")
+    # Same rule as LessonGraph.is_locked
+    if state.order_index > 1 and state.prev_id is not None and not state.prev_completed:
+        raise CompletionError(403, "Previous lesson must be completed first")
+
+    now = datetime.utcnow()
+    upsert = insert(UserProgress).values(
+        user_id=user_id,
+        lesson_id=state.id,
+        is_completed=True,
+        completed_at=now,
+    )
+    completed_id = (await db.execute(
+        upsert.on_conflict_do_update(
+            constraint="unique_user_lesson",
+            set_={"is_completed": True, "completed_at": now},
+            where=UserProgress.is_completed.is_(False),
+        ).returning(UserProgress.id)
+    )).scalar_one_or_none()
+    if completed_id is None:
+        # A concurrent request completed it first
+        await db.rollback()
+        raise CompletionError(400, "Lesson already completed")
+
+    xp_result = await award_xp(str(user_id), state.xp_value, db)
+    await update_streak(str(user_id), db)
+    await stats_service.record_completion(db, state.world_id, now)
+    await commit_awards(db)
+    return xp_result
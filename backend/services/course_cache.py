@@ -0,0 +1,230 @@
+"""
+In-process cache of the published World -> Level -> Lesson tree.
+
+The course structure changes rarely, so each worker keeps one immutable
+CourseSnapshot built from Postgres and shares it between requests. Snapshots
+are keyed by the course content version (see CourseContentVersion): any ORM
+flush touching a World, Level or Lesson bumps the version in the same
+transaction, and workers re-check the version at most once every
+COURSE_CACHE_CHECK_SECONDS, swapping in a freshly built snapshot when it moved.
+"""
+import asyncio
+import time
+from types import MappingProxyType
+from typing import Dict, Optional, Tuple
+import uuid
+
+from sqlalchemy import select, event
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from models.course import World, Level, Lesson, CourseContentVersion
+
+
+class _Record:
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id}>"
+
+
+class WorldRecord(_Record):
+    __slots__ = (
+        "id", "title", "description", "image_url", "difficulty",
+        "is_free", "order_index", "lesson_ids",
+    )
+
+
+class LessonRecord(_Record):
+    __slots__ = (
+        "id", "level_id", "world_id", "title", "description", "video_url",
+        "hls_url", "poster_url", "duration_minutes", "xp_value", "order_index", "is_boss_battle", "is_free",
+        "prev_id", "next_id",
+    )
+
+
+class CourseSnapshot:
+    """Immutable view of the published course graph at one content version."""
+    __slots__ = ("version", "worlds", "world_by_id", "lesson_by_id")
+
+    def __init__(self, version: int, worlds: Tuple[WorldRecord, ...], lessons: Dict[uuid.UUID, LessonRecord]):
+        self.version = version
+        self.worlds = worlds
+        self.world_by_id = MappingProxyType({world.id: world for world in worlds})
+        self.lesson_by_id = MappingProxyType(lessons)
+
+    def get_world(self, world_id) -> Optional[WorldRecord]:
+        return self.world_by_id.get(_as_uuid(world_id))
+
+    def get_lesson(self, lesson_id) -> Optional[LessonRecord]:
+        return self.lesson_by_id.get(_as_uuid(lesson_id))
+
+    def world_lessons(self, world_id) -> Tuple[LessonRecord, ...]:
+        world = self.get_world(world_id)
+        if world is None:
+            return ()
+        return tuple(self.lesson_by_id[lesson_id] for lesson_id in world.lesson_ids)
+
+
+def _as_uuid(value) -> Optional[uuid.UUID]:
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+_snapshot: Optional[CourseSnapshot] = None
+_checked_at = 0.0
+_lock = asyncio.Lock()
+# Served without a reload / reloaded
+_hits = 0
+_misses = 0
+
+
+async def get_content_version(db: AsyncSession) -> int:
+    version = (await db.execute(
+        select(CourseContentVersion.version).where(CourseContentVersion.id == 1)
+    )).scalar()
+    return version or 0
+
+
+def bump_content_version(connection) -> None:
+    """Increment the course content version on the given connection/session."""
+    stmt = insert(CourseContentVersion.__table__).values(id=1, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["id"],
+        set_={"version": CourseContentVersion.__table__.c.version + 1},
+    )
+    connection.execute(stmt)
+
+
+async def build_snapshot(db: AsyncSession, version: int) -> CourseSnapshot:
+    """Load the published course tree (two queries) into a CourseSnapshot."""
+    worlds = (await db.execute(
+        select(World).where(World.is_published == True).order_by(World.order_index)
+    )).scalars().all()
+    rows = (await db.execute(
+        select(Lesson, Level.world_id).join(
+            Level, Lesson.level_id == Level.id
+        ).join(
+            World, Level.world_id == World.id
+        ).where(
+            World.is_published == True
+        ).order_by(
+            Level.order_index, Lesson.order_index
+        )
+    )).all()
+
+    world_free = {world.id: world.is_free for world in worlds}
+    by_position = {(lesson.level_id, lesson.order_index): lesson.id for lesson, _ in rows}
+    lessons = {}
+    world_lesson_ids = {world.id: [] for world in worlds}
+    for lesson, world_id in rows:
+        lessons[lesson.id] = LessonRecord(
+            id=lesson.id,
+            level_id=lesson.level_id,
+            world_id=world_id,
+            title=lesson.title,
+            description=lesson.description,
+            video_url=lesson.video_url,
+            hls_url=lesson.hls_url,
+            poster_url=lesson.poster_url,
+            duration_minutes=lesson.duration_minutes,
+            xp_value=lesson.xp_value,
+            order_index=lesson.order_index,
+            is_boss_battle=lesson.is_boss_battle,
+            is_free=world_free[world_id],
+            prev_id=by_position.get((lesson.level_id, lesson.order_index - 1)),
+            next_id=by_position.get((lesson.level_id, lesson.order_index + 1)),
+        )
+        world_lesson_ids[world_id].append(lesson.id)
+
+    world_records = tuple(
+        WorldRecord(
+            id=world.id,
+            title=world.title,
+            description=world.description,
+            image_url=world.image_url,
+            difficulty=world.difficulty,
+            is_free=world.is_free,
+            order_index=world.order_index,
+            lesson_ids=tuple(world_lesson_ids[world.id]),
+        )
+        for world in worlds
+    )
+    return CourseSnapshot(version, world_records, lessons)
+
+
+async def get_course_snapshot(db: AsyncSession) -> CourseSnapshot:
+    """Return the shared snapshot, reloading it if the content version moved."""
+    global _snapshot, _checked_at, _hits, _misses
+
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < settings.COURSE_CACHE_CHECK_SECONDS:
+        _hits += 1
+        return snapshot
+
+    async with _lock:
+        if _snapshot is not snapshot:
+            # Another request reloaded while we waited
+            _hits += 1
+            return _snapshot
+        version = await get_content_version(db)
+        if snapshot is None or snapshot.version != version:
+            snapshot = await build_snapshot(db, version)
+            _snapshot = snapshot
+            _misses += 1
+        else:
+            _hits += 1
+        _checked_at = time.monotonic()
+    return snapshot
+
+
+def invalidate_course_cache() -> None:
+    """Force the next get_course_snapshot call to re-check the content version."""
+    global _checked_at
+    _checked_at = 0.0
+
+
+def course_cache_stats() -> dict:
+    return {"version": _snapshot.version if _snapshot else None, "hits": _hits, "misses": _misses}
+
+
+def clear_course_cache() -> None:
+    global _snapshot, _checked_at, _lock
+    _snapshot = None
+    _checked_at = 0.0
+    _lock = asyncio.Lock()
+
+
+_COURSE_MODELS = (World, Level, Lesson)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_version_on_course_change(session, flush_context):
+    changed = (session.new, session.dirty, session.deleted)
+    if any(isinstance(obj, _COURSE_MODELS) for objects in changed for obj in objects):
+        bump_content_version(session.connection())
+        session.info["course_content_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("course_content_changed", False):
+        invalidate_course_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop("course_content_changed", None)
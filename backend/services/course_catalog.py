@@ -0,0 +1,53 @@
+from typing import List, Optional
+from sqlalchemy import select, func, and_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.course import World, Level, Lesson
+from models.progress import UserProgress
+
+
+async def get_world_catalog(db: AsyncSession, user_id: Optional[str] = None) -> List:
+    """
+    Load published worlds with their lesson counts and the user's completed
+    lesson counts in a single aggregated query.
+
+    Returns rows with the World columns plus `lesson_count` and
+    `completed_count` (always 0 when no user is given).
+    """
+    if user_id is not None:
+        completed_count = func.count(UserProgress.id)
+    else:
+        completed_count = literal(0)
+
+    stmt = select(
+        World.id,
+        World.title,
+        World.description,
+        World.image_url,
+        World.difficulty,
+        World.is_free,
+        func.count(Lesson.id).label("lesson_count"),
+        completed_count.label("completed_count"),
+    ).outerjoin(
+        Level, Level.world_id == World.id
+    ).outerjoin(
+        Lesson, Lesson.level_id == Level.id
+    )
+
+    if user_id is not None:
+        stmt = stmt.outerjoin(
+            UserProgress,
+            and_(
+                UserProgress.lesson_id == Lesson.id,
+                UserProgress.user_id == user_id,
+                UserProgress.is_completed == True,
+            )
+        )
+
+    stmt = stmt.where(
+        World.is_published == True
+    ).group_by(
+        World.id
+    ).order_by(
+        World.order_index
+    )
+    return (await db.execute(stmt)).all()
@@ -1,7 +1,14 @@
 import math
 from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import update, case, cast, func, Date, Integer, event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.user import UserProfile
+from services import leaderboard
+
+# XP awards of the open transaction, published to the leaderboard on commit
+PENDING_AWARDS_KEY = "pending_xp_awards"
 
 
 def calculate_level(xp: int) -> int:
@@ -11,50 +18,93 @@ def calculate_level(xp: int) -> int:
     return int(math.floor(math.sqrt(xp / 100)))
 
 
-def update_streak(user_id: str, db: Session) -> int:
-    """Update user streak based on last login date. Returns new streak count."""
-    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-    if not profile:
-        return 0
-
-    today = datetime.utcnow().date()
-    last_login = profile.last_login_date.date() if profile.last_login_date else None
-    yesterday = (today - timedelta(days=1))
-
-    if last_login is None:
-        # First login
-        profile.streak_count = 1
-    elif last_login == yesterday:
-        # Consecutive day
-        profile.streak_count += 1
-    elif last_login < yesterday:
-        # Streak broken
-        profile.streak_count = 1
-    # If last_login == today, streak stays the same
-
-    profile.last_login_date = datetime.utcnow()
-    db.commit()
-    return profile.streak_count
-
-
-def award_xp(user_id: str, xp_amount: int, db: Session) -> dict:
-    """Award XP to user and return level up status."""
-    profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
-    if not profile:
+def level_expression(xp):
+    """calculate_level as a SQL expression over an XP column or value."""
+    return case(
+        (xp <= 0, 1),
+        else_=cast(func.floor(func.sqrt(xp / 100.0)), Integer),
+    )
+
+
+async def update_streak(user_id: str, db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """
+    Update user streak based on last login date in one UPDATE. Does not
+    commit. `now` is the login time (defaults to the current time). Returns
+    new streak count (0 when the user has no profile).
+    """
+    now = now or datetime.utcnow()
+    yesterday = (now - timedelta(days=1)).date()
+    last_login = cast(UserProfile.last_login_date, Date)
+
+    streak = (await db.execute(
+        update(UserProfile)
+        .where(UserProfile.user_id == user_id)
+        .values(
+            streak_count=case(
+                # First login
+                (UserProfile.last_login_date.is_(None), 1),
+                # Consecutive day
+                (last_login == yesterday, UserProfile.streak_count + 1),
+                # Streak broken
+                (last_login < yesterday, 1),
+                # Already logged in today: streak stays the same
+                else_=UserProfile.streak_count,
+            ),
+            last_login_date=now,
+        )
+        .returning(UserProfile.streak_count)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    return streak or 0
+
+
+async def award_xp(user_id: str, xp_amount: int, db: AsyncSession) -> dict:
+    """
+    Award XP to user and return level up status.
+
+    Increments xp and recomputes level in a single UPDATE ... RETURNING, so
+    concurrent awards cannot overwrite each other. The same UPDATE bumps the
+    profile's progress_version (HTTP cache validators). Does not commit: the
+    caller commits with commit_awards() so the leaderboard is updated once
+    the transaction is durable.
+    """
+    new_xp = UserProfile.xp + xp_amount
+    row = (await db.execute(
+        update(UserProfile)
+        .where(UserProfile.user_id == user_id)
+        .values(
+            xp=new_xp,
+            level=level_expression(new_xp),
+            progress_version=UserProfile.progress_version + 1,
+        )
+        .returning(UserProfile.xp, UserProfile.level)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is None:
         return {"error": "Profile not found"}
 
-    old_level = profile.level
-    profile.xp += xp_amount
-    new_level = calculate_level(profile.xp)
-    profile.level = new_level
+    new_total_xp, new_level = row
+    # Level is always derived from XP, so the level before this award
+    # follows from the XP before it
+    leveled_up = new_level > calculate_level(new_total_xp - xp_amount)
 
-    leveled_up = new_level > old_level
-    db.commit()
+    db.info.setdefault(PENDING_AWARDS_KEY, []).append((user_id, xp_amount, new_total_xp))
 
     return {
         "xp_gained": xp_amount,
-        "new_total_xp": profile.xp,
+        "new_total_xp": new_total_xp,
         "leveled_up": leveled_up,
         "new_level": new_level
     }
 
+
+async def commit_awards(db: AsyncSession) -> None:
+    """Commit the transaction, then publish its XP awards to the leaderboard."""
+    await db.commit()
+    for user_id, xp_amount, new_total_xp in db.info.pop(PENDING_AWARDS_KEY, []):
+        await leaderboard.record_xp(user_id, xp_amount, new_total_xp)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_awards_on_rollback(session):
+    session.info.pop(PENDING_AWARDS_KEY, None)
@@ -0,0 +1,96 @@
+"""
+Conditional GET for the course endpoints.
+
+Course responses are a function of the course content version (bumped on
+every World/Level/Lesson change, see services.course_cache) and, for a
+signed-in user, of their progress (UserProfile.progress_version, bumped
+with every XP award) and subscription status. A strong ETag is derived
+from those versions alone, so a handler can compare it with If-None-Match
+and answer 304 before running any of its own queries:
+
+    etag = await http_cache.course_etag(db, current_user)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag, current_user)
+    http_cache.set_cache_headers(response, etag, current_user)
+
+The content version comes from the in-process course snapshot and the
+principal from its cache, so an anonymous revalidation costs no queries
+and a signed-in one a single primary-key lookup. The anonymous catalog
+itself is served from pre-serialized bytes (services.catalog_cache).
+
+Anonymous responses are public and cacheable by a CDN for
+CATALOG_CACHE_S_MAXAGE seconds; signed-in responses are private and must
+be revalidated. Both vary on Authorization.
+"""
+import hashlib
+import time
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.user import UserProfile
+from services.course_cache import get_course_snapshot
+from services.principal_cache import Principal
+
+
+async def progress_version(db: AsyncSession, principal: Principal) -> int:
+    if principal.profile_id is None:
+        return 0
+    version = (await db.execute(
+        select(UserProfile.progress_version).where(UserProfile.id == principal.profile_id)
+    )).scalar()
+    return version or 0
+
+
+async def course_etag(db: AsyncSession, principal: Optional[Principal], signed_urls: bool = False) -> str:
+    """
+    Strong ETag for a course response as seen by `principal` (None for
+    anonymous). Responses carrying presigned video URLs pass signed_urls so
+    the tag also rolls over before a revalidated copy's URLs could expire.
+    """
+    parts = [str((await get_course_snapshot(db)).version)]
+    if principal is not None:
+        status = principal.subscription_status.value if principal.subscription_status else ""
+        parts += [str(principal.id), status, str(await progress_version(db, principal))]
+    if signed_urls:
+        # A URL served in this window is valid for at least the refresh margin
+        parts.append(str(int(time.time() // max(1, settings.S3_DOWNLOAD_URL_REFRESH_SECONDS))))
+    return make_etag(*parts)
+
+
+def make_etag(*parts: str) -> str:
+    digest = hashlib.sha1(":".join(parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def is_fresh(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match matches `etag` (weak comparison, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _headers(etag: str, principal: Optional[Principal]) -> dict:
+    if principal is None:
+        cache_control = (
+            f"public, max-age={settings.CATALOG_CACHE_MAX_AGE}, "
+            f"s-maxage={settings.CATALOG_CACHE_S_MAXAGE}, "
+            f"stale-while-revalidate={settings.CATALOG_CACHE_MAX_AGE}"
+        )
+    else:
+        cache_control = "private, no-cache"
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Authorization"}
+
+
+def set_cache_headers(response: Response, etag: str, principal: Optional[Principal]) -> None:
+    response.headers.update(_headers(etag, principal))
+
+
+def not_modified(etag: str, principal: Optional[Principal]) -> Response:
+    return Response(status_code=304, headers=_headers(etag, principal))
@@ -0,0 +1,28 @@
+"""
+Built-in background job handlers (see services.jobs).
+
+Each handler runs inside the transaction that marks its job done and must
+not commit itself.
+"""
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.jobs import job_handler
+from services.gamification_service import award_xp, update_streak
+from services import stripe_webhooks
+
+
+@job_handler("award_xp")
+async def award_xp_job(db: AsyncSession, payload: dict) -> None:
+    result = await award_xp(payload["user_id"], payload["xp"], db)
+    if "error" in result:
+        raise LookupError(result["error"])
+
+
+@job_handler("update_streak")
+async def update_streak_job(db: AsyncSession, payload: dict) -> None:
+    await update_streak(payload["user_id"], db, now=datetime.fromisoformat(payload["logged_in_at"]))
+
+
+@job_handler("stripe_customer_events")
+async def stripe_customer_events_job(db: AsyncSession, payload: dict) -> None:
+    await stripe_webhooks.process_customer_events(db, payload.get("customer_id"), payload.get("event_id"))
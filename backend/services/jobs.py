@@ -0,0 +1,255 @@
+"""
+Durable background jobs on a Postgres `jobs` table.
+
+Request handlers record intent with enqueue() inside their own transaction,
+so a job exists exactly when the write that needs it commits. Workers
+(worker.py, a separate process from the API) claim due jobs with
+UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED), so any number
+of workers can drain the table without blocking each other.
+
+A job's handler runs in the same transaction that marks the job done, and
+that update only matches while the job is still running under this
+worker's claim. If the job was re-claimed after its lock timed out, the
+stale run is rolled back, so its database effects apply exactly once. A failing job is retried with
+exponential backoff until max_attempts, then marked failed. Jobs whose
+worker died mid-run are claimed again after JOB_LOCK_TIMEOUT_SECONDS.
+
+Handlers are registered with @job_handler("kind") and receive
+(db, payload); the built-in ones live in services.job_handlers. Work that
+must only happen once the job's transaction is durable (cache
+invalidation, notifications) is deferred with after_commit().
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import get_async_session_local
+from models.job import Job, JobStatus
+from services.gamification_service import commit_awards
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[AsyncSession, dict], Awaitable[None]]
+_handlers: Dict[str, Handler] = {}
+AFTER_COMMIT_KEY = "job_after_commit"
+
+
+def job_handler(kind: str):
+    """Register an async handler(db, payload) for a job kind."""
+    def register(func: Handler) -> Handler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """Run an async callback once the current job's transaction commits."""
+    db.info.setdefault(AFTER_COMMIT_KEY, []).append(callback)
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict,
+    run_at: Optional[datetime] = None,
+    dedupe_key: Optional[str] = None,
+    max_attempts: Optional[int] = None,
+) -> None:
+    """Add a job in the caller's transaction. Does not commit."""
+    stmt = insert(Job).values(
+        kind=kind,
+        payload=payload,
+        status=JobStatus.QUEUED,
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=run_at or datetime.utcnow(),
+    )
+    if dedupe_key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[Job.dedupe_key])
+    await db.execute(stmt)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for a job that failed `attempts` times."""
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def claim(db: AsyncSession, worker_id: str, limit: int) -> list:
+    """Lock up to `limit` due jobs for this worker and commit the claim."""
+    now = datetime.utcnow()
+    due = select(Job.id).where(
+        or_(
+            and_(Job.status == JobStatus.QUEUED, Job.run_at <= now),
+            and_(
+                Job.status == JobStatus.RUNNING,
+                Job.locked_at < now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS),
+            ),
+        )
+    ).order_by(Job.run_at, Job.id).limit(limit).with_for_update(skip_locked=True)
+
+    jobs = (await db.execute(
+        update(Job)
+        .where(Job.id.in_(due.scalar_subquery()))
+        .values(
+            status=JobStatus.RUNNING,
+            locked_at=now,
+            locked_by=worker_id,
+            attempts=Job.attempts + 1,
+        )
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return jobs
+
+
+async def _finish(db: AsyncSession, job, worker_id: str, **values) -> bool:
+    """Release this worker's claim on a job; False if the claim was lost (re-claimed elsewhere)."""
+    finished = (await db.execute(
+        update(Job)
+        .where(
+            Job.id == job.id,
+            Job.status == JobStatus.RUNNING,
+            Job.locked_by == worker_id,
+            Job.attempts == job.attempts,
+        )
+        .values(locked_at=None, locked_by=None, **values)
+        .returning(Job.id)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    return finished is not None
+
+
+async def run_job(session_factory, job, worker_id: str) -> bool:
+    """Run one job claimed by worker_id; returns True when it completed."""
+    async with session_factory() as db:
+        try:
+            handler = _handlers.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job.kind!r}")
+            await handler(db, job.payload)
+            if not await _finish(db, job, worker_id, status=JobStatus.DONE, finished_at=datetime.utcnow(), last_error=None):
+                db.info.pop(AFTER_COMMIT_KEY, None)
+                await db.rollback()
+                logger.warning(f"Job {job.id} ({job.kind}) was claimed again while running; discarding this run")
+                return False
+            await commit_awards(db)
+        except Exception as e:
+            db.info.pop(AFTER_COMMIT_KEY, None)
+            await db.rollback()
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts >= job.max_attempts or isinstance(e, LookupError):
+                logger.error(f"Job {job.id} ({job.kind}) failed permanently: {error}")
+                await _finish(db, job, worker_id, status=JobStatus.FAILED, finished_at=datetime.utcnow(), last_error=error)
+            else:
+                delay = retry_delay(job.attempts)
+                logger.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay:.1f}s: {error}")
+                await _finish(
+                    db, job, worker_id,
+                    status=JobStatus.QUEUED,
+                    run_at=datetime.utcnow() + timedelta(seconds=delay),
+                    last_error=error,
+                )
+            await db.commit()
+            return False
+
+        for callback in db.info.pop(AFTER_COMMIT_KEY, []):
+            try:
+                await callback()
+            except Exception as e:
+                logger.warning(f"Job {job.id} ({job.kind}) after-commit callback failed: {e}")
+        return True
+
+
+async def prune(db: AsyncSession, older_than_days: int = None) -> int:
+    """Delete finished jobs older than the retention window and commit."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days or settings.JOB_RETENTION_DAYS)
+    result = await db.execute(
+        delete(Job).where(Job.status == JobStatus.DONE, Job.finished_at < cutoff)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def queue_stats(db: AsyncSession) -> dict:
+    """Job counts per status and the lag of the oldest due job, in seconds."""
+    now = datetime.utcnow()
+    counts = dict((await db.execute(
+        select(Job.status, func.count()).group_by(Job.status)
+    )).all())
+    oldest_due = (await db.execute(
+        select(func.min(Job.run_at)).where(Job.status == JobStatus.QUEUED, Job.run_at <= now)
+    )).scalar()
+    return {
+        **{status.value: counts.get(status, 0) for status in JobStatus},
+        "lag_seconds": (now - oldest_due).total_seconds() if oldest_due else 0.0,
+    }
+
+
+class JobWorker:
+    """
+    Claims batches of up to `concurrency` jobs and runs them concurrently on
+    the event loop, polling every `poll_interval` seconds when idle.
+    """
+
+    def __init__(self, session_factory=None, concurrency: int = None, poll_interval: float = None, worker_id: str = None):
+        self.session_factory = session_factory or get_async_session_local()
+        self.concurrency = concurrency or settings.JOB_WORKER_CONCURRENCY
+        self.poll_interval = settings.JOB_POLL_INTERVAL_SECONDS if poll_interval is None else poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.completed = 0
+        self.failed = 0
+
+    async def run_once(self) -> int:
+        """Claim and run one batch; returns the number of jobs claimed."""
+        async with self.session_factory() as db:
+            jobs = await claim(db, self.worker_id, self.concurrency)
+        if jobs:
+            results = await asyncio.gather(*(run_job(self.session_factory, job, self.worker_id) for job in jobs))
+            self.completed += sum(results)
+            self.failed += len(results) - sum(results)
+        return len(jobs)
+
+    async def drain(self) -> int:
+        """Run batches until no job is due; returns the number of jobs run."""
+        total = 0
+        while True:
+            claimed = await self.run_once()
+            if not claimed:
+                return total
+            total += claimed
+
+    async def run_forever(self, stop: Optional[asyncio.Event] = None, prune_every: float = 3600):
+        stop = stop or asyncio.Event()
+        last_prune = 0.0
+        logger.info(f"Job worker {self.worker_id} started (concurrency={self.concurrency})")
+        while not stop.is_set():
+            if time.monotonic() - last_prune > prune_every:
+                async with self.session_factory() as db:
+                    await prune(db)
+                last_prune = time.monotonic()
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Job worker {self.worker_id} poll failed: {e}")
+                claimed = 0
+            if not claimed:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+
+# Register the built-in handlers
+import services.job_handlers  # noqa: E402,F401
@@ -0,0 +1,377 @@
+"""
+XP leaderboard backed by Redis sorted sets.
+
+Each period has its own ZSET of user id -> XP:
+
+- leaderboard:all                  total XP (ZADD of the profile total)
+- leaderboard:weekly:<YYYY-Www>    XP earned in that ISO week (ZINCRBY)
+- leaderboard:monthly:<YYYY-MM>    XP earned in that month (ZINCRBY)
+
+XP awards are applied with record_xp once their transaction commits
+(gamification_service.commit_awards), so reads are a ZREVRANGE /
+ZREVRANK (O(log n)) plus one batched profile lookup for the names.
+
+A set is only complete once rebuild_leaderboard has populated it from
+Postgres, which also writes its marker key (<key>:ready). record_xp only
+updates sets that have a marker, and reads only use them. While a set is
+being rebuilt (<key>:building), record_xp also applies awards to its
+staging set, which the rebuild merges into the result, so an award that
+commits after the rebuild's SELECT is not lost. Redis is
+optional: when it is disabled, or a period has no marker (cold start,
+flushed Redis, a new week or month), reads fall back to a single ranked
+Postgres query and a rebuild is started in the background.
+`python rebuild_leaderboard.py` does the same rebuild by hand.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import WatchError
+from sqlalchemy import select, func, and_, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from models.user import UserProfile
+from models.course import Lesson
+from models.progress import UserProgress, BossSubmission, SubmissionStatus
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("all", "weekly", "monthly")
+KEY_PREFIX = "leaderboard:"
+# Window keys are kept one extra window after they close
+WINDOW_RETENTION = {"weekly": timedelta(weeks=2), "monthly": timedelta(days=62)}
+
+# XP for an approved boss battle submission
+BOSS_BATTLE_XP = 500
+
+# Held while one worker rebuilds after a cold start, so others do not repeat it
+REBUILD_LOCK_KEY = f"{KEY_PREFIX}rebuilding"
+REBUILD_LOCK_SECONDS = 60
+# Longest a rebuild of one period may take before awards stop going to its staging set
+REBUILD_STAGING_SECONDS = 600
+
+_rebuild_task: Optional[asyncio.Task] = None
+
+
+class LeaderboardRow:
+    __slots__ = ("user_id", "name", "avatar_url", "xp_total", "rank")
+
+    def __init__(self, user_id, name, avatar_url, xp_total, rank):
+        self.user_id = user_id
+        self.name = name
+        self.avatar_url = avatar_url
+        self.xp_total = xp_total
+        self.rank = rank
+
+
+def window_start(period: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Start of the current window for a period (None for all-time)."""
+    now = now or datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "weekly":
+        return today - timedelta(days=today.weekday())
+    if period == "monthly":
+        return today.replace(day=1)
+    return None
+
+
+def period_key(period: str, now: Optional[datetime] = None) -> str:
+    """Redis key holding the current window of a period."""
+    now = now or datetime.utcnow()
+    if period == "weekly":
+        year, week, _ = now.isocalendar()
+        return f"{KEY_PREFIX}weekly:{year}-W{week:02d}"
+    if period == "monthly":
+        return f"{KEY_PREFIX}monthly:{now:%Y-%m}"
+    return f"{KEY_PREFIX}all"
+
+
+def ready_key(key: str) -> str:
+    """Marker written once a period's set has been fully built."""
+    return f"{key}:ready"
+
+
+def building_key(key: str) -> str:
+    """Present while a period's set is being rebuilt."""
+    return f"{key}:building"
+
+
+def staging_key(key: str) -> str:
+    """Awards recorded while a period's set is being rebuilt."""
+    return f"{key}:rebuild"
+
+
+def _window_expiry(period: str, now: datetime) -> int:
+    start = window_start(period, now)
+    if period == "weekly":
+        end = start + timedelta(weeks=1)
+    else:
+        end = (start + timedelta(days=32)).replace(day=1)
+    return int((end - now + WINDOW_RETENTION[period]).total_seconds())
+
+
+async def record_xp(user_id, xp_amount: int, new_total_xp: int) -> None:
+    """
+    Apply an XP award to every period's sorted set that has been built, and
+    to the staging set of any being rebuilt (no-op without Redis). Sets
+    without either marker are left for rebuild_leaderboard, which reads the
+    award from Postgres.
+    """
+    redis = get_redis()
+    if redis is None:
+        return
+    now = datetime.utcnow()
+    member = str(user_id)
+    keys = {period: period_key(period, now) for period in PERIODS}
+    markers = [ready_key(key) for key in keys.values()] + [building_key(key) for key in keys.values()]
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            while True:
+                # Retried if a rebuild starts or finishes in between
+                try:
+                    await pipe.watch(*markers)
+                    found = await pipe.mget(markers)
+                    ready = dict(zip(PERIODS, found[:len(PERIODS)]))
+                    building = dict(zip(PERIODS, found[len(PERIODS):]))
+                    pipe.multi()
+                    if ready["all"]:
+                        pipe.zadd(keys["all"], {member: new_total_xp})
+                    if building["all"]:
+                        pipe.zadd(staging_key(keys["all"]), {member: new_total_xp}, gt=True)
+                    for period in ("weekly", "monthly"):
+                        targets = [key for key, on in (
+                            (keys[period], ready[period]), (staging_key(keys[period]), building[period])
+                        ) if on]
+                        for key in targets:
+                            pipe.zincrby(key, xp_amount, member)
+                            pipe.expire(key, _window_expiry(period, now))
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+    except Exception as e:
+        logger.warning(f"Leaderboard update failed for {member}: {e}")
+
+
+def _period_scores(period: str, now: Optional[datetime] = None):
+    """Select of (user_id, score) for a period, derived from Postgres."""
+    start = window_start(period, now)
+    if start is None:
+        return select(
+            UserProfile.user_id.label("user_id"),
+            UserProfile.xp.label("score"),
+        )
+
+    # XP earned in the window: completed lessons plus approved boss battles
+    lesson_xp = select(
+        UserProgress.user_id.label("user_id"),
+        Lesson.xp_value.label("xp"),
+    ).join(
+        Lesson, Lesson.id == UserProgress.lesson_id
+    ).where(
+        UserProgress.is_completed.is_(True),
+        UserProgress.completed_at >= start,
+    )
+    boss_xp = select(
+        BossSubmission.user_id.label("user_id"),
+        literal(BOSS_BATTLE_XP).label("xp"),
+    ).where(
+        BossSubmission.status == SubmissionStatus.APPROVED,
+        BossSubmission.reviewed_at >= start,
+    )
+    earned = union_all(lesson_xp, boss_xp).subquery()
+    return select(
+        earned.c.user_id,
+        func.sum(earned.c.xp).label("score"),
+    ).group_by(earned.c.user_id)
+
+
+async def _db_ranked(
+    db: AsyncSession, period: str, first_rank: int, last_rank: int
+) -> List[LeaderboardRow]:
+    scores = _period_scores(period).subquery()
+    ranked = select(
+        scores.c.user_id,
+        scores.c.score,
+        func.row_number().over(
+            order_by=(scores.c.score.desc(), scores.c.user_id.desc())
+        ).label("rank"),
+    ).where(scores.c.score > 0).subquery()
+
+    rows = (await db.execute(
+        select(
+            ranked.c.user_id, ranked.c.score, ranked.c.rank,
+            UserProfile.first_name, UserProfile.last_name, UserProfile.avatar_url,
+        ).join(
+            UserProfile, UserProfile.user_id == ranked.c.user_id
+        ).where(
+            and_(ranked.c.rank >= first_rank, ranked.c.rank <= last_rank)
+        ).order_by(ranked.c.rank)
+    )).all()
+    return [
+        LeaderboardRow(
+            str(row.user_id), f"{row.first_name} {row.last_name}",
+            row.avatar_url, int(row.score), row.rank,
+        )
+        for row in rows
+    ]
+
+
+async def _db_rank_of(db: AsyncSession, period: str, user_id) -> Optional[int]:
+    scores = _period_scores(period).subquery()
+    mine = select(scores.c.score).where(scores.c.user_id == user_id).scalar_subquery()
+    row = (await db.execute(
+        select(mine.label("score"), func.count().label("ahead")).select_from(scores).where(
+            scores.c.score > 0,
+            (scores.c.score > mine) | (
+                (scores.c.score == mine) & (scores.c.user_id > user_id)
+            ),
+        )
+    )).first()
+    if row is None or not row.score:
+        return None
+    return row.ahead + 1
+
+
+async def _with_profiles(
+    db: AsyncSession, entries: List[Tuple[str, float]], first_rank: int
+) -> List[LeaderboardRow]:
+    """Attach names/avatars to (user_id, score) pairs in one query."""
+    if not entries:
+        return []
+    ids = [uuid.UUID(member) for member, _ in entries]
+    profiles: Dict[uuid.UUID, tuple] = {
+        row.user_id: row
+        for row in (await db.execute(
+            select(
+                UserProfile.user_id, UserProfile.first_name,
+                UserProfile.last_name, UserProfile.avatar_url,
+            ).where(UserProfile.user_id.in_(ids))
+        )).all()
+    }
+    results = []
+    for offset, (user_id, (_, score)) in enumerate(zip(ids, entries)):
+        profile = profiles.get(user_id)
+        if profile is None:
+            continue
+        results.append(LeaderboardRow(
+            str(user_id), f"{profile.first_name} {profile.last_name}",
+            profile.avatar_url, int(score), first_rank + offset,
+        ))
+    return results
+
+
+async def _rebuild_in_background(session_factory) -> None:
+    redis = get_redis()
+    try:
+        if not await redis.set(REBUILD_LOCK_KEY, "1", nx=True, ex=REBUILD_LOCK_SECONDS):
+            return  # another worker is rebuilding
+        try:
+            async with session_factory() as db:
+                counts = await rebuild_leaderboard(db)
+            logger.info(f"Leaderboard rebuilt: {counts}")
+        finally:
+            await redis.delete(REBUILD_LOCK_KEY)
+    except Exception:
+        logger.exception("Leaderboard rebuild failed")
+
+
+def _schedule_rebuild(db: AsyncSession) -> None:
+    """Rebuild the sets in a background task, on the engine of the request's session."""
+    global _rebuild_task
+    if _rebuild_task is None or _rebuild_task.done():
+        _rebuild_task = asyncio.create_task(_rebuild_in_background(async_sessionmaker(bind=db.bind)))
+
+
+async def _redis_key(db: AsyncSession, period: str) -> Optional[str]:
+    """The period's key when its set is complete in Redis, else None (scheduling a rebuild)."""
+    redis = get_redis()
+    if redis is None:
+        return None
+    key = period_key(period)
+    try:
+        if await redis.exists(ready_key(key)):
+            return key
+    except Exception as e:
+        logger.warning(f"Leaderboard Redis read failed: {e}")
+        return None
+    _schedule_rebuild(db)
+    return None
+
+
+async def get_top(db: AsyncSession, period: str = "all", limit: int = 10) -> List[LeaderboardRow]:
+    """Top `limit` users for a period."""
+    key = await _redis_key(db, period)
+    if key is not None:
+        entries = await get_redis().zrevrange(key, 0, limit - 1, withscores=True)
+        return await _with_profiles(db, [(m, s) for m, s in entries if s > 0], 1)
+    return await _db_ranked(db, period, 1, limit)
+
+
+async def get_around(
+    db: AsyncSession, user_id, period: str = "all", radius: int = 2
+) -> Tuple[Optional[int], List[LeaderboardRow]]:
+    """
+    The user's rank and the `radius` users either side of them.
+    Returns (None, []) when the user has no XP in the period.
+    """
+    key = await _redis_key(db, period)
+    if key is not None:
+        redis = get_redis()
+        index = await redis.zrevrank(key, str(user_id))
+        if index is None:
+            return None, []
+        first = max(0, index - radius)
+        entries = await redis.zrevrange(key, first, index + radius, withscores=True)
+        return index + 1, await _with_profiles(db, entries, first + 1)
+
+    rank = await _db_rank_of(db, period, user_id)
+    if rank is None:
+        return None, []
+    return rank, await _db_ranked(db, period, max(1, rank - radius), rank + radius)
+
+
+async def rebuild_leaderboard(db: AsyncSession) -> Dict[str, int]:
+    """
+    Repopulate every period's current sorted set from Postgres and mark it
+    ready. Each set is built under temporary keys and stored over the live
+    one in a single transaction, so readers never see a partial leaderboard.
+    Awards recorded during the SELECT are merged in from the staging set:
+    totals keep the higher value, window XP is added. Returns member counts
+    per key (from Postgres).
+    """
+    redis = get_redis()
+    if redis is None:
+        raise RuntimeError("Redis is not enabled (set REDIS_ENABLED=true)")
+
+    now = datetime.utcnow()
+    counts = {}
+    for period in PERIODS:
+        key = period_key(period, now)
+        staging, snapshot = staging_key(key), f"{key}:snapshot"
+        # From here on record_xp also writes its awards to the staging set
+        pipe = redis.pipeline(transaction=True)
+        pipe.delete(staging)
+        pipe.set(building_key(key), now.isoformat(), ex=REBUILD_STAGING_SECONDS)
+        await pipe.execute()
+
+        scores = _period_scores(period, now).subquery()
+        rows = (await db.execute(select(scores).where(scores.c.score > 0))).all()
+        mapping = {str(row.user_id): int(row.score) for row in rows}
+
+        pipe = redis.pipeline(transaction=True)
+        pipe.delete(snapshot)
+        if mapping:
+            pipe.zadd(snapshot, mapping)
+        pipe.zunionstore(key, [snapshot, staging], aggregate="MAX" if period == "all" else "SUM")
+        pipe.delete(snapshot, staging, building_key(key))
+        pipe.set(ready_key(key), now.isoformat())
+        if period != "all":
+            pipe.expire(key, _window_expiry(period, now))
+            pipe.expire(ready_key(key), _window_expiry(period, now))
+        await pipe.execute()
+        counts[key] = len(mapping)
+    return counts
@@ -0,0 +1,93 @@
+from typing import Dict, List, Optional, Tuple
+import uuid
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.course import Level, Lesson
+from models.progress import UserProgress
+
+
+class LessonGraph:
+    """
+    Lessons of a world (or a single level) together with one user's progress.
+
+    Loads everything in two queries (lessons, then the user's progress rows)
+    and answers completion, lock and prev/next questions in memory. A lesson
+    is locked when the lesson before it in the same level (order_index - 1)
+    exists and is not completed.
+    """
+
+    def __init__(self, lessons: List, progress: List[UserProgress]):
+        self.lessons = lessons
+        self._by_position: Dict[Tuple[uuid.UUID, int], Lesson] = {
+            (lesson.level_id, lesson.order_index): lesson for lesson in lessons
+        }
+        self._by_id: Dict[uuid.UUID, Lesson] = {lesson.id: lesson for lesson in lessons}
+        self._progress: Dict[uuid.UUID, UserProgress] = {p.lesson_id: p for p in progress}
+
+    @classmethod
+    async def for_world(cls, db: AsyncSession, world_id, user_id) -> "LessonGraph":
+        lessons = (await db.execute(
+            select(Lesson).join(
+                Level, Lesson.level_id == Level.id
+            ).where(
+                Level.world_id == world_id
+            ).order_by(
+                Level.order_index, Lesson.order_index
+            )
+        )).scalars().all()
+        return await cls.from_lessons(db, lessons, user_id)
+
+    @classmethod
+    async def for_level(cls, db: AsyncSession, level_id, user_id) -> "LessonGraph":
+        lessons = (await db.execute(
+            select(Lesson).where(
+                Lesson.level_id == level_id
+            ).order_by(Lesson.order_index)
+        )).scalars().all()
+        return await cls.from_lessons(db, lessons, user_id)
+
+    @classmethod
+    async def from_lessons(cls, db: AsyncSession, lessons, user_id) -> "LessonGraph":
+        """
+        Build a graph from already loaded lessons (ORM rows or course cache
+        records), loading only the user's progress.
+        """
+        lessons = list(lessons)
+        return cls(lessons, await cls._load_progress(db, user_id, [l.id for l in lessons]))
+
+    @staticmethod
+    async def _load_progress(db: AsyncSession, user_id, lesson_ids) -> List[UserProgress]:
+        if not lesson_ids:
+            return []
+        return (await db.execute(
+            select(UserProgress).where(
+                UserProgress.user_id == user_id,
+                UserProgress.lesson_id.in_(lesson_ids)
+            )
+        )).scalars().all()
+
+    def get_progress(self, lesson_id) -> Optional[UserProgress]:
+        return self._progress.get(self._key(lesson_id))
+
+    def is_completed(self, lesson_id) -> bool:
+        progress = self.get_progress(lesson_id)
+        return progress.is_completed if progress else False
+
+    def prev_lesson(self, lesson_id) -> Optional[Lesson]:
+        lesson = self._by_id[self._key(lesson_id)]
+        return self._by_position.get((lesson.level_id, lesson.order_index - 1))
+
+    def next_lesson(self, lesson_id) -> Optional[Lesson]:
+        lesson = self._by_id[self._key(lesson_id)]
+        return self._by_position.get((lesson.level_id, lesson.order_index + 1))
+
+    def is_locked(self, lesson_id) -> bool:
+        lesson = self._by_id[self._key(lesson_id)]
+        if lesson.order_index <= 1:
+            return False
+        prev_lesson = self.prev_lesson(lesson.id)
+        return prev_lesson is not None and not self.is_completed(prev_lesson.id)
+
+    @staticmethod
+    def _key(lesson_id) -> uuid.UUID:
+        return lesson_id if isinstance(lesson_id, uuid.UUID) else uuid.UUID(str(lesson_id))
@@ -0,0 +1,217 @@
+"""
+Short-lived cache of authenticated principals.
+
+get_current_user needs a user's role, subscription status/tier and profile
+id on every request. Those change rarely, so they are cached per user id in
+two layers:
+
+- an in-process LRU with a short TTL (PRINCIPAL_CACHE_TTL_SECONDS), and
+- optionally Redis (REDIS_ENABLED), shared by all workers, with a longer TTL.
+
+Writers must call invalidate_principal() after committing changes to a
+user's role, subscription or profile. Invalidation clears Redis and this
+worker's LRU; other workers' LRU entries expire within the local TTL.
+
+A request that loaded the user before an invalidation must not cache what
+it read afterwards. Invalidation therefore bumps a generation, both per
+process and per user in Redis (principal:gen:<id>). A loaded principal is
+only cached if the generation is unchanged since before the load; the
+Redis write is a WATCH/MULTI on the generation key.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from redis.exceptions import WatchError
+
+from config import settings
+from models.user import User, UserProfile, Subscription, UserRole, SubscriptionStatus, SubscriptionTier
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "principal:"
+GENERATION_KEY_PREFIX = "principal:gen:"
+
+
+class Principal:
+    """The authenticated user as seen by route handlers."""
+    __slots__ = ("id", "email", "role", "subscription_status", "subscription_tier", "profile_id")
+
+    def __init__(self, id, email, role, subscription_status=None, subscription_tier=None, profile_id=None):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.subscription_status = subscription_status
+        self.subscription_tier = subscription_tier
+        self.profile_id = profile_id
+
+    @property
+    def is_subscribed(self) -> bool:
+        return self.subscription_status == SubscriptionStatus.ACTIVE
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "id": str(self.id),
+            "email": self.email,
+            "role": self.role.value,
+            "subscription_status": self.subscription_status.value if self.subscription_status else None,
+            "subscription_tier": self.subscription_tier.value if self.subscription_tier else None,
+            "profile_id": str(self.profile_id) if self.profile_id else None,
+        })
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Principal":
+        data = json.loads(raw)
+        return cls(
+            id=uuid.UUID(data["id"]),
+            email=data["email"],
+            role=UserRole(data["role"]),
+            subscription_status=SubscriptionStatus(data["subscription_status"]) if data["subscription_status"] else None,
+            subscription_tier=SubscriptionTier(data["subscription_tier"]) if data["subscription_tier"] else None,
+            profile_id=uuid.UUID(data["profile_id"]) if data["profile_id"] else None,
+        )
+
+
+class _LRUCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[uuid.UUID, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Principal]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value: Principal):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_local = _LRUCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+# Invalidations in this process; a load that overlaps one is not cached locally
+_local_generation = 0
+
+
+async def load_principal(db: AsyncSession, user_id: uuid.UUID) -> Optional[Principal]:
+    """Load a principal from Postgres in one query."""
+    row = (await db.execute(
+        select(
+            User.id, User.email, User.role,
+            Subscription.status, Subscription.tier, UserProfile.id,
+        ).outerjoin(
+            Subscription, Subscription.user_id == User.id
+        ).outerjoin(
+            UserProfile, UserProfile.user_id == User.id
+        ).where(User.id == user_id)
+    )).first()
+    if row is None:
+        return None
+    return Principal(*row)
+
+
+async def get_principal(db: AsyncSession, user_id: uuid.UUID) -> Optional[Principal]:
+    """Return the cached principal for user_id, loading it on a miss."""
+    principal = _local.get(user_id)
+    if principal is not None:
+        return principal
+
+    local_generation = _local_generation
+    redis = get_redis()
+    generation = None
+    if redis is not None:
+        try:
+            raw, generation = await redis.pipeline(transaction=False).get(
+                REDIS_KEY_PREFIX + str(user_id)
+            ).get(GENERATION_KEY_PREFIX + str(user_id)).execute()
+            if raw is not None:
+                principal = Principal.from_json(raw)
+                _local.set(user_id, principal)
+                return principal
+        except Exception as e:
+            logger.warning(f"Principal cache Redis read failed: {e}")
+            redis = None
+
+    principal = await load_principal(db, user_id)
+    if principal is None:
+        return None
+    if local_generation == _local_generation:
+        _local.set(user_id, principal)
+    if redis is not None:
+        await _store(redis, principal, generation)
+    return principal
+
+
+async def _store(redis, principal: Principal, generation: Optional[str]) -> None:
+    """Cache a loaded principal in Redis unless it was invalidated since `generation` was read."""
+    generation_key = GENERATION_KEY_PREFIX + str(principal.id)
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            await pipe.watch(generation_key)
+            if await pipe.get(generation_key) != generation:
+                return
+            pipe.multi()
+            pipe.set(
+                REDIS_KEY_PREFIX + str(principal.id),
+                principal.to_json(),
+                ex=settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS,
+            )
+            await pipe.execute()
+    except WatchError:
+        pass  # invalidated while writing
+    except Exception as e:
+        logger.warning(f"Principal cache Redis write failed: {e}")
+
+
+async def invalidate_principal(user_id) -> None:
+    """Drop a user's cached principal after their role/subscription/profile changed."""
+    global _local_generation
+    user_id = user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+    _local_generation += 1
+    _local.delete(user_id)
+    redis = get_redis()
+    if redis is not None:
+        generation_key = GENERATION_KEY_PREFIX + str(user_id)
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.incr(generation_key)
+                # Outlives any load that started before this invalidation
+                pipe.expire(generation_key, settings.PRINCIPAL_CACHE_REDIS_TTL_SECONDS)
+                pipe.delete(REDIS_KEY_PREFIX + str(user_id))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Principal cache Redis invalidation failed: {e}")
+
+
+def clear_principal_cache() -> None:
+    _local.clear()
+
+
+def principal_cache_stats() -> dict:
+    return {"size": len(_local), "hits": _local.hits, "misses": _local.misses}
@@ -0,0 +1,26 @@
+import logging
+from typing import Optional
+
+import redis.asyncio as redis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis: Optional[redis.Redis] = None
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Get the shared asyncio Redis client, or None when Redis is disabled."""
+    global _redis
+    if not settings.REDIS_ENABLED:
+        return None
+    if _redis is None:
+        _redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def set_redis(client: Optional[redis.Redis]) -> None:
+    """Replace the shared client (used by tests to install a fake Redis)."""
+    global _redis
+    _redis = client
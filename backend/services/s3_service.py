@@ -1,29 +1,82 @@
-import logging
-from typing import Dict
+"""
+S3 presigning for lesson and boss battle videos.
+
+The boto3 client is created on first use (get_s3_client) and shared by the
+process; boto3 clients are thread-safe and reuse their HTTP connection
+pool. Presigning itself is a local HMAC computation, so the batch helpers
+sign every part or object of a request with the one client and no network
+round trips.
+
+Download URLs for lesson videos are cached per object until shortly before
+they expire (S3_DOWNLOAD_URL_REFRESH_SECONDS), so listing a world's lessons
+does not re-sign every video on every request.
+
+The multipart upload calls that do reach S3 are async and run the boto3
+call on a worker thread.
 
-import boto3
-from botocore.exceptions import ClientError
+Set AWS_S3_ENDPOINT_URL to use an S3-compatible server such as MinIO.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
 
-from output.backend.config import settings
+from config import settings
 
 logger = logging.getLogger(__name__)
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_REGION
-)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """The shared boto3 S3 client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import boto3
+                from botocore.config import Config
+
+                _client = boto3.client(
+                    's3',
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+                    region_name=settings.AWS_REGION,
+                    endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+                    config=Config(
+                        signature_version="s3v4",
+                        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    ),
+                )
+    return _client
+
+
+def set_s3_client(client) -> None:
+    """Replace the shared client (used by tests; None recreates it lazily)."""
+    global _client
+    _client = client
+    clear_download_url_cache()
+
+
+def is_object_key(video_url: str) -> bool:
+    """Whether a stored video reference is an S3 key rather than a full URL."""
+    return not video_url.startswith(("http://", "https://"))
+
 
 def generate_presigned_url(object_name: str, expiration: int = 3600) -> Dict[str, str]:
     """Generate a presigned URL to upload an S3 object
 
     :param object_name: S3 object name
     :param expiration: Time in seconds for the presigned URL to remain valid
-    :return: Dictionary with 'url' and 'fields' for POST upload, or None if error.
+    :return: Dictionary with 'url' and 'fields' for POST upload, or {} if error.
     """
+    from botocore.exceptions import ClientError
+
     try:
-        response = s3_client.generate_presigned_post(
+        response = get_s3_client().generate_presigned_post(
             Bucket=settings.AWS_S3_BUCKET_NAME,
             Key=object_name,
             Fields=None, # Can specify conditions here, e.g., {'acl': 'public-read'}
@@ -33,5 +86,177 @@ def generate_presigned_url(object_name: str, expiration: int = 3600) -> Dict[str
     except ClientError as e:
         logger.error(f"Error generating presigned URL: {e}")
         return {}
-    
-    return response
\ No newline at end of file
+
+    return response
+
+
+def presign_put_urls(object_names: Iterable[str], expiration: int = 3600) -> Dict[str, str]:
+    """Presigned PUT URLs for several objects, keyed by object name."""
+    client = get_s3_client()
+    return {
+        name: client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": settings.AWS_S3_BUCKET_NAME, "Key": name},
+            ExpiresIn=expiration,
+        )
+        for name in object_names
+    }
+
+
+def presign_upload_parts(
+    object_name: str, upload_id: str, part_numbers: Iterable[int], expiration: int = 3600
+) -> Dict[int, str]:
+    """Presigned UploadPart URLs for the given parts of a multipart upload."""
+    client = get_s3_client()
+    return {
+        number: client.generate_presigned_url(
+            "upload_part",
+            Params={
+                "Bucket": settings.AWS_S3_BUCKET_NAME,
+                "Key": object_name,
+                "UploadId": upload_id,
+                "PartNumber": number,
+            },
+            ExpiresIn=expiration,
+        )
+        for number in part_numbers
+    }
+
+
+async def create_multipart_upload(object_name: str, content_type: str) -> str:
+    """Start a multipart upload; returns its UploadId."""
+    response = await asyncio.to_thread(
+        get_s3_client().create_multipart_upload,
+        Bucket=settings.AWS_S3_BUCKET_NAME, Key=object_name, ContentType=content_type,
+    )
+    return response["UploadId"]
+
+
+async def complete_multipart_upload(object_name: str, upload_id: str, parts: Dict[int, str]) -> None:
+    """Assemble the uploaded parts ({part number: ETag}) into the object."""
+    await asyncio.to_thread(
+        get_s3_client().complete_multipart_upload,
+        Bucket=settings.AWS_S3_BUCKET_NAME,
+        Key=object_name,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": [
+            {"PartNumber": number, "ETag": etag} for number, etag in sorted(parts.items())
+        ]},
+    )
+
+
+async def abort_multipart_upload(object_name: str, upload_id: str) -> None:
+    """Discard a multipart upload and its parts; a missing upload is ignored."""
+    from botocore.exceptions import ClientError
+
+    try:
+        await asyncio.to_thread(
+            get_s3_client().abort_multipart_upload,
+            Bucket=settings.AWS_S3_BUCKET_NAME, Key=object_name, UploadId=upload_id,
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+            raise
+
+
+async def object_size(object_name: str) -> Optional[int]:
+    """Size of a stored object in bytes; None if it does not exist."""
+    from botocore.exceptions import ClientError
+
+    try:
+        response = await asyncio.to_thread(
+            get_s3_client().head_object, Bucket=settings.AWS_S3_BUCKET_NAME, Key=object_name
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+    return response["ContentLength"]
+
+
+async def delete_object(object_name: str) -> None:
+    await asyncio.to_thread(get_s3_client().delete_object, Bucket=settings.AWS_S3_BUCKET_NAME, Key=object_name)
+
+
+class _DownloadUrlCache:
+    """LRU of object name -> (presigned GET URL, monotonic time it must be replaced)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, name: str, url: str, replace_at: float) -> None:
+        with self._lock:
+            self._entries[name] = (url, replace_at)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_download_urls = _DownloadUrlCache(settings.S3_DOWNLOAD_URL_CACHE_SIZE)
+
+
+def get_download_url(object_name: str) -> str:
+    """Presigned GET URL for an object, reused until shortly before it expires."""
+    url = _download_urls.get(object_name)
+    if url is not None:
+        return url
+    expiration = settings.S3_DOWNLOAD_URL_EXPIRY_SECONDS
+    signed_at = time.monotonic()
+    url = get_s3_client().generate_presigned_url(
+        "get_object",
+        Params={"Bucket": settings.AWS_S3_BUCKET_NAME, "Key": object_name},
+        ExpiresIn=expiration,
+    )
+    _download_urls.set(
+        object_name, url, signed_at + max(0, expiration - settings.S3_DOWNLOAD_URL_REFRESH_SECONDS)
+    )
+    return url
+
+
+def playback_url(video_url: str) -> str:
+    """The URL a client should play: full URLs as stored, S3 keys presigned."""
+    return get_download_url(video_url) if is_object_key(video_url) else video_url
+
+
+def hls_playback_url(hls_url: Optional[str]) -> Optional[str]:
+    """
+    A stored HLS master playlist URL if clients can play it, else None.
+    Playlists refer to their segments by relative path, so only absolute
+    (CDN) URLs work; bare S3 keys from before HLS_BASE_URL was required are
+    left out until the video is packaged again.
+    """
+    if not hls_url or is_object_key(hls_url):
+        return None
+    return hls_url
+
+
+def download_url_cache_stats() -> dict:
+    return {
+        "size": len(_download_urls._entries),
+        "hits": _download_urls.hits,
+        "misses": _download_urls.misses,
+    }
+
+
+def clear_download_url_cache() -> None:
+    _download_urls.clear()
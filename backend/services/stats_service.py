@@ -0,0 +1,208 @@
+"""
+Materialized admin statistics.
+
+Counters live in stat_counters as (metric, bucket) -> value rows:
+
+- users / total                              registered users
+- submissions / <status>                     boss submissions per status
+- world_submissions:<status> / <world id>    boss submissions per world and status
+- world_completions / <world id>             completed lessons per world
+- signups_daily / <YYYY-MM-DD>               registrations per day (UTC)
+- completions_daily / <YYYY-MM-DD>           lesson completions per day
+- approvals_daily / <YYYY-MM-DD>             approved boss submissions per day
+- lesson_comments / <lesson id>              comments (threads and replies) per lesson
+
+The record_* helpers add their deltas with one upsert inside the caller's
+transaction, so a counter changes exactly when the rows it counts do.
+reconcile() recomputes every counter from the source tables; run it
+periodically (reconcile_stats.py) to repair drift from manual edits.
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func, cast, literal, Date, String, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.stats import StatCounter
+from models.user import User
+from models.course import Level, Lesson
+from models.progress import UserProgress, BossSubmission, SubmissionStatus, Comment
+
+USERS = "users"
+SUBMISSIONS = "submissions"
+WORLD_SUBMISSIONS = "world_submissions:"
+WORLD_COMPLETIONS = "world_completions"
+SIGNUPS_DAILY = "signups_daily"
+COMPLETIONS_DAILY = "completions_daily"
+APPROVALS_DAILY = "approvals_daily"
+LESSON_COMMENTS = "lesson_comments"
+DAILY_METRICS = (SIGNUPS_DAILY, COMPLETIONS_DAILY, APPROVALS_DAILY)
+
+Change = Tuple[str, str, int]
+
+
+def _day(when: Optional[datetime] = None) -> str:
+    return (when or datetime.utcnow()).strftime("%Y-%m-%d")
+
+
+def _status(status) -> str:
+    return status.value if isinstance(status, SubmissionStatus) else str(status)
+
+
+async def bump(db: AsyncSession, changes: Iterable[Change]) -> None:
+    """Apply (metric, bucket, delta) changes in one upsert. Does not commit."""
+    merged: Dict[Tuple[str, str], int] = {}
+    for metric, bucket, delta in changes:
+        merged[(metric, bucket)] = merged.get((metric, bucket), 0) + delta
+    # Sorted so concurrent transactions lock counter rows in the same order
+    rows = [
+        {"metric": metric, "bucket": bucket, "value": delta}
+        for (metric, bucket), delta in sorted(merged.items())
+        if delta
+    ]
+    if not rows:
+        return
+    stmt = insert(StatCounter).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[StatCounter.metric, StatCounter.bucket],
+        set_={
+            "value": StatCounter.value + stmt.excluded.value,
+            "updated_at": func.now(),
+        },
+    ))
+
+
+async def record_signup(db: AsyncSession, when: Optional[datetime] = None) -> None:
+    await bump(db, [(USERS, "total", 1), (SIGNUPS_DAILY, _day(when), 1)])
+
+
+async def record_submission(db: AsyncSession, world_id) -> None:
+    status = _status(SubmissionStatus.PENDING)
+    await bump(db, [(SUBMISSIONS, status, 1), (WORLD_SUBMISSIONS + status, str(world_id), 1)])
+
+
+async def record_grading(db: AsyncSession, world_id, old_status, new_status, when: Optional[datetime] = None) -> None:
+    old_status, new_status = _status(old_status), _status(new_status)
+    changes: List[Change] = []
+    if old_status != new_status:
+        changes += [
+            (SUBMISSIONS, old_status, -1),
+            (SUBMISSIONS, new_status, 1),
+            (WORLD_SUBMISSIONS + old_status, str(world_id), -1),
+            (WORLD_SUBMISSIONS + new_status, str(world_id), 1),
+        ]
+    if new_status == SubmissionStatus.APPROVED.value and old_status != new_status:
+        changes.append((APPROVALS_DAILY, _day(when), 1))
+    await bump(db, changes)
+
+
+async def record_completion(db: AsyncSession, world_id, when: Optional[datetime] = None) -> None:
+    await bump(db, [(WORLD_COMPLETIONS, str(world_id), 1), (COMPLETIONS_DAILY, _day(when), 1)])
+
+
+async def record_comment(db: AsyncSession, lesson_id) -> None:
+    await bump(db, [(LESSON_COMMENTS, str(lesson_id), 1)])
+
+
+async def read_buckets(db: AsyncSession, metric: str, buckets: Iterable[str]) -> Dict[str, int]:
+    """{bucket: value} for some buckets of one metric, zero-filled."""
+    buckets = list(buckets)
+    rows = (await db.execute(
+        select(StatCounter.bucket, StatCounter.value).where(
+            StatCounter.metric == metric,
+            StatCounter.bucket.in_(buckets),
+        )
+    )).all()
+    values = dict.fromkeys(buckets, 0)
+    values.update(rows)
+    return values
+
+
+async def read_counters(db: AsyncSession, *metrics: str) -> Dict[str, Dict[str, int]]:
+    """{metric: {bucket: value}} for the given metrics."""
+    rows = (await db.execute(
+        select(StatCounter.metric, StatCounter.bucket, StatCounter.value).where(
+            StatCounter.metric.in_(metrics)
+        )
+    )).all()
+    counters: Dict[str, Dict[str, int]] = {metric: {} for metric in metrics}
+    for metric, bucket, value in rows:
+        counters[metric][bucket] = value
+    return counters
+
+
+async def read_daily(db: AsyncSession, days: int, today: Optional[date] = None) -> Dict[str, list]:
+    """Daily series for the last `days` days (oldest first), zero-filled."""
+    today = today or datetime.utcnow().date()
+    dates = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+    rows = (await db.execute(
+        select(StatCounter.metric, StatCounter.bucket, StatCounter.value).where(
+            StatCounter.metric.in_(DAILY_METRICS),
+            StatCounter.bucket >= dates[0],
+            StatCounter.bucket <= dates[-1],
+        )
+    )).all()
+    values = {(metric, bucket): value for metric, bucket, value in rows}
+    series = {"days": dates}
+    for metric in DAILY_METRICS:
+        series[metric.replace("_daily", "")] = [values.get((metric, day), 0) for day in dates]
+    return series
+
+
+def _source_counts():
+    """INSERT ... SELECT sources recomputing every counter."""
+    # date::text is YYYY-MM-DD (ISO DateStyle); unlike to_char it carries no
+    # bound format parameter, so the expression matches its GROUP BY
+    day = lambda column: cast(cast(column, Date), String)
+    world_id = cast(Level.world_id, String)
+    status = cast(BossSubmission.status, String)
+    completed = UserProgress.is_completed.is_(True)
+
+    return [
+        select(literal(USERS), literal("total"), func.count(User.id)),
+        select(literal(SIGNUPS_DAILY), day(User.created_at), func.count())
+        .group_by(day(User.created_at)),
+        select(literal(SUBMISSIONS), func.lower(status), func.count())
+        .group_by(status),
+        select(literal(WORLD_SUBMISSIONS) + func.lower(status), world_id, func.count())
+        .select_from(BossSubmission)
+        .join(Lesson, Lesson.id == BossSubmission.lesson_id)
+        .join(Level, Level.id == Lesson.level_id)
+        .group_by(status, world_id),
+        select(literal(APPROVALS_DAILY), day(BossSubmission.reviewed_at), func.count())
+        .where(BossSubmission.status == SubmissionStatus.APPROVED, BossSubmission.reviewed_at.isnot(None))
+        .group_by(day(BossSubmission.reviewed_at)),
+        select(literal(WORLD_COMPLETIONS), world_id, func.count())
+        .select_from(UserProgress)
+        .join(Lesson, Lesson.id == UserProgress.lesson_id)
+        .join(Level, Level.id == Lesson.level_id)
+        .where(completed)
+        .group_by(world_id),
+        select(literal(COMPLETIONS_DAILY), day(UserProgress.completed_at), func.count())
+        .where(completed, UserProgress.completed_at.isnot(None))
+        .group_by(day(UserProgress.completed_at)),
+        select(literal(LESSON_COMMENTS), cast(Comment.lesson_id, String), func.count())
+        .group_by(Comment.lesson_id),
+    ]
+
+
+async def reconcile(db: AsyncSession) -> int:
+    """
+    Recompute all counters from the source tables and commit. Returns the
+    number of counter rows written.
+
+    The table lock waits for in-flight transactions holding counter updates
+    and blocks new ones until the rebuild commits, so no increment is
+    counted twice or lost.
+    """
+    await db.execute(text(f"LOCK TABLE {StatCounter.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+    await db.execute(StatCounter.__table__.delete())
+    written = 0
+    for source in _source_counts():
+        result = await db.execute(
+            insert(StatCounter).from_select(["metric", "bucket", "value"], source)
+        )
+        written += result.rowcount
+    await db.commit()
+    return written
@@ -1,22 +1,94 @@
-import stripe
-from typing import Dict, Any
+"""
+Stripe API calls and webhook signature checks.
 
-from output.backend.config import settings
+The stripe SDK takes about half a second to import, so it is loaded and
+configured on first use (get_stripe) rather than when the API starts; the
+async helpers do that first import on a worker thread. The helpers the
+payments router calls raise ValueError or InvalidSignature instead of
+stripe's exception types, so the router never imports the SDK itself.
+"""
+import asyncio
+import json
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from config import settings
 
-def create_checkout_session(
-    user_id: str,
+if TYPE_CHECKING:
+    import stripe
+
+_stripe = None
+_stripe_lock = threading.Lock()
+
+# Stripe's recommended tolerance between the signature timestamp and now
+WEBHOOK_TOLERANCE_SECONDS = 300
+
+
+class InvalidSignature(Exception):
+    """A webhook's Stripe-Signature header does not match its payload."""
+
+
+def get_stripe():
+    """The stripe module with the API key set, imported on first use."""
+    global _stripe
+    if _stripe is None:
+        with _stripe_lock:
+            if _stripe is None:
+                import stripe
+
+                stripe.api_key = settings.STRIPE_SECRET_KEY
+                _stripe = stripe
+    return _stripe
+
+
+async def _sdk():
+    """get_stripe() without blocking the event loop on the first import."""
+    return _stripe or await asyncio.to_thread(get_stripe)
+
+
+def verify_webhook(payload: bytes, sig_header: str) -> Dict[str, Any]:
+    """
+    Check a webhook's Stripe-Signature header and return the event as a dict.
+    Raises ValueError for a malformed payload and InvalidSignature for a
+    bad signature.
+    """
+    stripe = get_stripe()
+    try:
+        stripe.WebhookSignature.verify_header(
+            payload.decode("utf-8"), sig_header, settings.STRIPE_WEBHOOK_SECRET, WEBHOOK_TOLERANCE_SECONDS
+        )
+    except stripe.error.SignatureVerificationError as e:
+        raise InvalidSignature(str(e)) from e
+    event = json.loads(payload)
+    if not isinstance(event, dict) or "id" not in event or "type" not in event:
+        raise ValueError("Not a Stripe event")
+    return event
+
+
+async def create_customer(email: str, metadata: Dict[str, str]) -> "stripe.Customer":
+    """Create a Stripe customer (the SDK call runs on a worker thread)."""
+    stripe = await _sdk()
+    try:
+        return await asyncio.to_thread(stripe.Customer.create, email=email, metadata=metadata)
+    except stripe.error.StripeError as e:
+        raise ValueError(f"Stripe error creating customer: {e}") from e
+
+
+async def create_checkout_session(
+    customer_id: str,
     price_id: str,
     success_url: str,
-    cancel_url: str
-) -> stripe.checkout.Session:
+    cancel_url: str,
+    metadata: Optional[Dict[str, str]] = None,
+) -> "stripe.checkout.Session":
     """
     Creates a Stripe Checkout Session for a new subscription.
     """
+    stripe = await _sdk()
     try:
-        checkout_session = stripe.checkout.Session.create(
-            customer_email=None, # Can be pre-filled if user email is known
+        return await asyncio.to_thread(
+            stripe.checkout.Session.create,
+            customer=customer_id,
             line_items=[
                 {
                     'price': price_id,
@@ -26,37 +98,18 @@ def create_checkout_session(
             mode='subscription',
             success_url=success_url,
             cancel_url=cancel_url,
-            metadata={
-                'user_id': str(user_id), # Store user_id for webhook processing
-            },
-            # Allow Stripe to create a customer if one doesn't exist
-            # or attach to an existing one if customer_email is provided and matches.
-            # If we already have stripe_customer_id, we can pass it here:
-            # customer=stripe_customer_id,
+            # Store user_id for webhook processing, on the session and on
+            # the subscription it creates
+            metadata=metadata or {},
+            subscription_data={'metadata': metadata or {}},
         )
-        return checkout_session
     except stripe.error.StripeError as e:
         # Handle Stripe API errors
         raise ValueError(f"Stripe error creating checkout session: {e}") from e
-    except Exception as e:
-        # Handle other potential errors
-        raise RuntimeError(f"An unexpected error occurred: {e}") from e
 
-def construct_event(payload: bytes, sig_header: str, secret: str) -> stripe.Event:
-    """
-    Constructs a Stripe event from a webhook payload.
-    """
-    try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, secret
-        )
-        return event
-    except ValueError as e:
-        # Invalid payload
-        raise ValueError(f"Invalid payload: {e}") from e
-    except stripe.error.SignatureVerificationError as e:
-        # Invalid signature
-        raise ValueError(f"Invalid signature: {e}") from e
-    except Exception as e:
-        # Handle other potential errors
-        raise RuntimeError(f"An unexpected error occurred: {e}") from e
\ No newline at end of file
+
+async def retrieve_subscription(subscription_id: str) -> Dict[str, Any]:
+    """Fetch a subscription from the Stripe API as a plain dict."""
+    stripe = await _sdk()
+    subscription = await asyncio.to_thread(stripe.Subscription.retrieve, subscription_id)
+    return subscription.to_dict_recursive()
@@ -0,0 +1,260 @@
+"""
+Stripe webhook inbox.
+
+The webhook endpoint only verifies the signature, stores the event in
+stripe_events (keyed by Stripe's event id, so Stripe's retries are no-ops)
+and enqueues a "stripe_customer_events" job, all in one transaction,
+then acks.
+
+The job applies the customer's pending events oldest first under a
+per-customer advisory lock, so events of one customer are applied in
+order even with several workers. Events that arrive late or are replayed
+are checked against the subscription instead:
+
+- an event older than the last one applied (stripe_event_created_at) is
+  skipped;
+- subscription and invoice events only apply to the stored
+  stripe_subscription_id, so events of an earlier subscription cannot
+  cancel or overwrite the current one. A new subscription replaces the
+  stored one once that is canceled (or through checkout.session.completed).
+
+Subscription state is read from the event payload; the Stripe API is only
+called when an invoice event lacks the price or period. Applying an event
+is idempotent: it sets subscription fields rather than incrementing
+anything, so replay() can re-drive stored events safely.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.stripe_event import StripeEvent, StripeEventStatus
+from models.user import Subscription, SubscriptionStatus, SubscriptionTier
+from services import stripe_service
+from services.jobs import enqueue, after_commit
+from services.principal_cache import invalidate_principal
+
+logger = logging.getLogger(__name__)
+
+JOB_KIND = "stripe_customer_events"
+
+# Stripe subscription statuses without an exact local equivalent
+STATUS_MAP = {
+    "unpaid": SubscriptionStatus.PAST_DUE,
+    "incomplete_expired": SubscriptionStatus.CANCELED,
+    "paused": SubscriptionStatus.CANCELED,
+}
+
+
+def _customer_of(event: Dict[str, Any]) -> Optional[str]:
+    obj = event.get("data", {}).get("object", {})
+    if obj.get("object") == "customer":
+        return obj.get("id")
+    customer = obj.get("customer")
+    if isinstance(customer, dict):
+        return customer.get("id")
+    return customer
+
+
+async def ingest_event(db: AsyncSession, event: Dict[str, Any]) -> bool:
+    """
+    Store a verified event and enqueue its processing. Does not commit.
+    Returns False when the event was already received.
+    """
+    customer_id = _customer_of(event)
+    inserted = (await db.execute(
+        insert(StripeEvent).values(
+            id=event["id"],
+            type=event["type"],
+            customer_id=customer_id,
+            payload=event,
+            stripe_created_at=datetime.utcfromtimestamp(event.get("created") or 0),
+            status=StripeEventStatus.PENDING,
+        ).on_conflict_do_nothing(index_elements=[StripeEvent.id]).returning(StripeEvent.id)
+    )).scalar_one_or_none()
+    if inserted is None:
+        return False
+    await enqueue(db, JOB_KIND, {"customer_id": customer_id, "event_id": event["id"]})
+    return True
+
+
+def _status(value: Optional[str]) -> Optional[SubscriptionStatus]:
+    if value is None:
+        return None
+    try:
+        return SubscriptionStatus(value)
+    except ValueError:
+        return STATUS_MAP.get(value)
+
+
+def _tier(lookup_key: Optional[str]) -> Optional[SubscriptionTier]:
+    try:
+        return SubscriptionTier[lookup_key.upper()] if lookup_key else None
+    except KeyError:
+        return None
+
+
+def _timestamp(value) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(value) if value else None
+
+
+async def _find_subscription(db: AsyncSession, customer_id: Optional[str], metadata: Dict[str, Any]) -> Optional[Subscription]:
+    """The local subscription row for a Stripe customer, linking it by metadata.user_id if needed."""
+    subscription = None
+    if customer_id:
+        subscription = (await db.execute(
+            select(Subscription).where(Subscription.stripe_customer_id == customer_id)
+        )).scalars().first()
+    if subscription is None and metadata.get("user_id"):
+        subscription = (await db.execute(
+            select(Subscription).where(Subscription.user_id == metadata["user_id"])
+        )).scalars().first()
+        if subscription is not None and customer_id:
+            subscription.stripe_customer_id = customer_id
+            await db.flush()
+    return subscription
+
+
+def _subscription_fields(sub: Dict[str, Any]) -> Dict[str, Any]:
+    items = (sub.get("items") or {}).get("data") or [{}]
+    return {
+        "stripe_subscription_id": sub.get("id"),
+        "status": _status(sub.get("status")),
+        "tier": _tier((items[0].get("price") or {}).get("lookup_key")),
+        "current_period_end": _timestamp(sub.get("current_period_end")),
+    }
+
+
+async def _invoice_fields(invoice: Dict[str, Any]) -> Dict[str, Any]:
+    lines = (invoice.get("lines") or {}).get("data") or [{}]
+    line = lines[0]
+    fields = {
+        "stripe_subscription_id": invoice.get("subscription"),
+        "status": SubscriptionStatus.ACTIVE,
+        "tier": _tier((line.get("price") or {}).get("lookup_key")),
+        "current_period_end": _timestamp((line.get("period") or {}).get("end")),
+    }
+    if (fields["tier"] is None or fields["current_period_end"] is None) and invoice.get("subscription"):
+        # Only when the invoice does not carry the subscription's price/period
+        sub = await stripe_service.retrieve_subscription(invoice["subscription"])
+        fallback = _subscription_fields(sub)
+        fields["tier"] = fields["tier"] or fallback["tier"]
+        fields["current_period_end"] = fields["current_period_end"] or fallback["current_period_end"]
+    return fields
+
+
+def _applies_to(subscription: Subscription, stripe_subscription_id: Optional[str], status: Optional[SubscriptionStatus]) -> bool:
+    """Whether an event about stripe_subscription_id may change this subscription row."""
+    stored = subscription.stripe_subscription_id
+    if stored is None or stripe_subscription_id is None or stripe_subscription_id == stored:
+        return True
+    # A live new subscription replaces one that has ended
+    return subscription.status == SubscriptionStatus.CANCELED and status != SubscriptionStatus.CANCELED
+
+
+async def apply_event(db: AsyncSession, event: Dict[str, Any]) -> bool:
+    """Apply one event to the local subscription; returns False for event types we ignore."""
+    event_type = event["type"]
+    obj = event.get("data", {}).get("object", {})
+    customer_id = _customer_of(event)
+
+    if event_type in ("customer.subscription.created", "customer.subscription.updated", "customer.subscription.deleted"):
+        fields = _subscription_fields(obj)
+        if event_type == "customer.subscription.deleted":
+            fields["status"] = SubscriptionStatus.CANCELED
+        metadata = obj.get("metadata") or {}
+    elif event_type in ("invoice.payment_succeeded", "invoice.paid"):
+        fields = await _invoice_fields(obj)
+        metadata = (obj.get("subscription_details") or {}).get("metadata") or obj.get("metadata") or {}
+    elif event_type == "checkout.session.completed":
+        fields = {"stripe_subscription_id": obj.get("subscription")}
+        metadata = obj.get("metadata") or {}
+    else:
+        return False
+
+    subscription = await _find_subscription(db, customer_id, metadata)
+    if subscription is None:
+        logger.warning(f"Stripe event {event['id']} ({event_type}): no subscription for customer {customer_id}")
+        return True
+
+    created = _timestamp(event.get("created"))
+    last_applied = subscription.stripe_event_created_at
+    if created is not None and last_applied is not None and created < last_applied:
+        logger.info(f"Stripe event {event['id']} ({event_type}) is older than the subscription state, skipped")
+        return True
+    event_subscription_id = fields.get("stripe_subscription_id")
+    if event_type != "checkout.session.completed" and not _applies_to(subscription, event_subscription_id, fields["status"]):
+        logger.info(f"Stripe event {event['id']} ({event_type}) is for subscription {event_subscription_id}, skipped")
+        return True
+
+    if created is not None:
+        subscription.stripe_event_created_at = created
+    for field, value in fields.items():
+        if value is not None:
+            setattr(subscription, field, value)
+    user_id = subscription.user_id
+    after_commit(db, lambda: invalidate_principal(user_id))
+    return True
+
+
+async def process_customer_events(db: AsyncSession, customer_id: Optional[str], event_id: Optional[str] = None) -> int:
+    """
+    Apply a customer's pending events in Stripe creation order. Events with
+    no customer are processed on their own. Does not commit.
+    """
+    if customer_id is not None:
+        # Serialises workers handling the same customer until commit
+        await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(customer_id))))
+        condition = StripeEvent.customer_id == customer_id
+    else:
+        condition = StripeEvent.id == event_id
+
+    events = (await db.execute(
+        select(StripeEvent).where(
+            condition, StripeEvent.status == StripeEventStatus.PENDING
+        ).order_by(
+            StripeEvent.stripe_created_at, StripeEvent.received_at, StripeEvent.id
+        ).with_for_update()
+    )).scalars().all()
+
+    for event in events:
+        handled = await apply_event(db, event.payload)
+        event.status = StripeEventStatus.PROCESSED if handled else StripeEventStatus.IGNORED
+        event.processed_at = datetime.utcnow()
+    await db.flush()
+    return len(events)
+
+
+async def replay(
+    db: AsyncSession,
+    event_ids: Iterable[str] = (),
+    customer_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+) -> int:
+    """
+    Mark stored events pending again and enqueue their processing, then
+    commit. Returns the number of events re-driven.
+    """
+    stmt = update(StripeEvent).values(status=StripeEventStatus.PENDING, processed_at=None)
+    event_ids = list(event_ids)
+    if event_ids:
+        stmt = stmt.where(StripeEvent.id.in_(event_ids))
+    if customer_id is not None:
+        stmt = stmt.where(StripeEvent.customer_id == customer_id)
+    if since is not None:
+        stmt = stmt.where(StripeEvent.stripe_created_at >= since)
+
+    rows = (await db.execute(
+        stmt.returning(StripeEvent.id, StripeEvent.customer_id).execution_options(synchronize_session=False)
+    )).all()
+    # One job per customer drains all of its pending events
+    jobs = {}
+    for event_id, event_customer in rows:
+        jobs.setdefault(event_customer or event_id, {"customer_id": event_customer, "event_id": event_id})
+    for payload in jobs.values():
+        await enqueue(db, JOB_KIND, payload)
+    await db.commit()
+    return len(rows)
@@ -0,0 +1,359 @@
+"""
+HLS packaging of lesson and boss battle videos with ffmpeg.
+
+transcode_to_hls decodes a source once and encodes every rendition of the
+ladder at or below the source height in the same ffmpeg process (split
+filter + -var_stream_map), writing a master playlist, one VOD playlist
+with ~HLS_SEGMENT_SECONDS segments per rendition, and a poster frame.
+
+process_video is the unit of work run in a process pool: it fetches the
+source, transcodes it in a temporary directory, uploads the output to S3
+under hls/<kind>/<id>/ and returns the URLs, duration and frame count.
+transcode_all (used by transcode_videos.py) fans the videos out to the
+pool and writes each result back to its Lesson or BossSubmission as it
+arrives; only the parent process touches the database.
+
+Packaged files are served from HLS_BASE_URL (a public or CDN origin for the
+hls/ keys), which must be set before packaging: a master playlist refers to
+its renditions by relative path, so it cannot be played from a presigned S3
+URL or a bare key.
+
+Sources are only ever object keys in our bucket, downloaded before ffmpeg
+sees them: a boss battle's video_url is set by the student, so it must be a
+key under boss-battles/<user_id>/, and ffmpeg may read local files in the
+container formats phones record (SOURCE_INPUT_OPTIONS) and nothing else.
+
+The ffmpeg binary is FFMPEG_PATH, else ffmpeg on PATH, else the one
+bundled with the imageio-ffmpeg package.
+"""
+import asyncio
+import logging
+import math
+import mimetypes
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import Executor
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import String, cast, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.course import Lesson
+from models.progress import BossSubmission
+from services import s3_service
+
+logger = logging.getLogger(__name__)
+
+MODELS = {"lessons": Lesson, "submissions": BossSubmission}
+
+# (name, height, video bitrate); renditions taller than the source are skipped
+LADDER = (
+    ("1080p", 1080, "5000k"),
+    ("720p", 720, "2800k"),
+    ("480p", 480, "1400k"),
+    ("360p", 360, "800k"),
+)
+AUDIO_BITRATE = "128k"
+POSTER_NAME = "poster.jpg"
+MASTER_NAME = "master.m3u8"
+SUBMISSION_KEY_PREFIX = "boss-battles"
+# No network protocols, and no playlist or concat demuxers that could pull in other files
+SOURCE_INPUT_OPTIONS = ["-protocol_whitelist", "file", "-format_whitelist", "mov,matroska"]
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO = re.compile(r"Stream #.*Video: .*?, (\d{2,5})x(\d{2,5})")
+_FPS = re.compile(r"(\d+(?:\.\d+)?) fps")
+
+
+class TranscodeError(Exception):
+    pass
+
+
+class SourceInfo(NamedTuple):
+    duration_seconds: float
+    width: int
+    height: int
+    fps: Optional[float]
+    has_audio: bool
+
+
+def ffmpeg_path() -> str:
+    if settings.FFMPEG_PATH:
+        return settings.FFMPEG_PATH
+    found = shutil.which("ffmpeg")
+    if found:
+        return found
+    try:
+        import imageio_ffmpeg
+    except ImportError:
+        raise TranscodeError("ffmpeg not found: install it, set FFMPEG_PATH, or pip install imageio-ffmpeg")
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def probe(source: str) -> SourceInfo:
+    """Duration, frame size, frame rate and audio presence of a video (from ffmpeg's banner)."""
+    # ffmpeg exits non-zero without an output file; the stream info is on stderr
+    result = subprocess.run(
+        [ffmpeg_path(), "-hide_banner", *SOURCE_INPUT_OPTIONS, "-i", source], capture_output=True, text=True
+    )
+    duration = _DURATION.search(result.stderr)
+    video = _VIDEO.search(result.stderr)
+    if duration is None or video is None:
+        raise TranscodeError(f"Not a readable video: {source}")
+    hours, minutes, seconds = duration.groups()
+    video_line = result.stderr[video.start():].splitlines()[0]
+    fps = _FPS.search(video_line)
+    return SourceInfo(
+        duration_seconds=int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+        width=int(video.group(1)),
+        height=int(video.group(2)),
+        fps=float(fps.group(1)) if fps else None,
+        has_audio="Audio:" in result.stderr,
+    )
+
+
+def renditions_for(height: int) -> List[tuple]:
+    ladder = [rendition for rendition in LADDER if rendition[1] <= height]
+    # Sources smaller than the lowest rung keep their own height
+    return ladder or [(f"{height}p", height, LADDER[-1][2])]
+
+
+class TranscodeResult(NamedTuple):
+    duration_seconds: float
+    frames: int
+    elapsed_seconds: float
+    renditions: List[str]
+
+
+def transcode_to_hls(source: str, out_dir: str, threads: int = 0) -> TranscodeResult:
+    """Write master.m3u8, <rendition>/index.m3u8 + segments and poster.jpg into out_dir."""
+    info = probe(source)
+    ladder = renditions_for(info.height)
+    count = len(ladder)
+    segment = settings.HLS_SEGMENT_SECONDS
+
+    split = f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count))
+    scales = [f"[v{i}]scale=-2:{height}[o{i}]" for i, (_, height, _) in enumerate(ladder)]
+    command = [
+        ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1", "-y",
+        *SOURCE_INPUT_OPTIONS, "-i", source,
+        "-filter_complex", ";".join([split] + scales),
+    ]
+    stream_map = []
+    for i, (name, _, bitrate) in enumerate(ladder):
+        command += ["-map", f"[o{i}]", f"-b:v:{i}", bitrate, f"-maxrate:v:{i}", bitrate, f"-bufsize:v:{i}", bitrate]
+        if info.has_audio:
+            command += ["-map", "0:a:0"]
+            stream_map.append(f"v:{i},a:{i},name:{name}")
+        else:
+            stream_map.append(f"v:{i},name:{name}")
+    command += [
+        "-c:v", "libx264", "-preset", settings.FFMPEG_PRESET, "-profile:v", "main", "-pix_fmt", "yuv420p",
+        # Keyframes on segment boundaries so every rendition cuts at the same times
+        "-sc_threshold", "0", "-force_key_frames", f"expr:gte(t,n_forced*{segment})",
+        "-threads", str(threads),
+    ]
+    if info.has_audio:
+        command += ["-c:a", "aac", "-b:a", AUDIO_BITRATE, "-ac", "2"]
+    command += [
+        "-f", "hls", "-hls_time", str(segment), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(out_dir, "%v", "seg_%04d.ts"),
+        "-master_pl_name", MASTER_NAME,
+        "-var_stream_map", " ".join(stream_map),
+        os.path.join(out_dir, "%v", "index.m3u8"),
+    ]
+
+    started = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise TranscodeError(f"ffmpeg failed for {source}: {result.stderr.strip()[-500:]}")
+    elapsed = time.perf_counter() - started
+    frames = [int(value) for value in re.findall(r"^frame=(\d+)$", result.stdout, re.MULTILINE)]
+
+    poster_at = min(settings.HLS_POSTER_SECONDS, info.duration_seconds / 2)
+    poster = subprocess.run(
+        [
+            ffmpeg_path(), "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", f"{poster_at:.2f}", *SOURCE_INPUT_OPTIONS, "-i", source,
+            "-frames:v", "1", "-vf", f"scale=-2:{min(info.height, 720)}", "-q:v", "3",
+            os.path.join(out_dir, POSTER_NAME),
+        ],
+        capture_output=True, text=True,
+    )
+    if poster.returncode != 0:
+        raise TranscodeError(f"Poster extraction failed for {source}: {poster.stderr.strip()[-500:]}")
+
+    return TranscodeResult(
+        duration_seconds=info.duration_seconds,
+        frames=frames[-1] if frames else 0,
+        elapsed_seconds=elapsed,
+        renditions=[name for name, _, _ in ladder],
+    )
+
+
+def require_hls_base_url() -> str:
+    if not settings.HLS_BASE_URL:
+        raise TranscodeError("HLS_BASE_URL is not set: packaged videos need a public or CDN origin to play from")
+    return settings.HLS_BASE_URL.rstrip("/")
+
+
+def media_url(object_name: str) -> str:
+    """Public URL of a packaged file under HLS_BASE_URL."""
+    return f"{require_hls_base_url()}/{object_name}"
+
+
+def is_source_key(video_url: str) -> bool:
+    """Whether a stored video reference is a plain object key (not a URL or a path)."""
+    return (
+        s3_service.is_object_key(video_url)
+        and ":" not in video_url
+        and not video_url.startswith("/")
+        and ".." not in video_url.split("/")
+    )
+
+
+def _fetch_source(video_url: str, work_dir: str) -> str:
+    """Download a stored video from the bucket into work_dir; refuses anything but an object key."""
+    if not is_source_key(video_url):
+        raise TranscodeError(f"Not a stored video key: {video_url!r}")
+    path = os.path.join(work_dir, "source")
+    s3_service.get_s3_client().download_file(settings.AWS_S3_BUCKET_NAME, video_url, path)
+    return path
+
+
+def _upload_dir(local_dir: str, prefix: str) -> None:
+    client = s3_service.get_s3_client()
+    for root, _, files in os.walk(local_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            key = f"{prefix}/{os.path.relpath(path, local_dir)}"
+            if name.endswith(".m3u8"):
+                content_type = "application/vnd.apple.mpegurl"
+            else:
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            client.upload_file(path, settings.AWS_S3_BUCKET_NAME, key, ExtraArgs={"ContentType": content_type})
+
+
+def process_video(kind: str, item_id: str, video_url: str, threads: int = 0) -> Dict:
+    """
+    Transcode one stored video and upload its HLS package. Runs in a worker
+    process; returns plain data for the parent to write to the database.
+    """
+    require_hls_base_url()
+    with tempfile.TemporaryDirectory(prefix="hls-") as work_dir:
+        source = _fetch_source(video_url, work_dir)
+        out_dir = os.path.join(work_dir, "out")
+        os.makedirs(out_dir)
+        result = transcode_to_hls(source, out_dir, threads)
+        prefix = f"hls/{kind}/{item_id}"
+        _upload_dir(out_dir, prefix)
+
+    return {
+        "kind": kind,
+        "id": item_id,
+        "hls_url": media_url(f"{prefix}/{MASTER_NAME}"),
+        "poster_url": media_url(f"{prefix}/{POSTER_NAME}"),
+        "renditions": {name: media_url(f"{prefix}/{name}/index.m3u8") for name in result.renditions},
+        "duration_seconds": result.duration_seconds,
+        "frames": result.frames,
+        "elapsed_seconds": result.elapsed_seconds,
+    }
+
+
+def default_workers() -> int:
+    return settings.TRANSCODE_WORKERS or os.cpu_count() or 1
+
+
+async def pending_videos(db: AsyncSession, kind: str, ids: Optional[List[str]] = None, limit: Optional[int] = None) -> List[tuple]:
+    """
+    (kind, id, video_url) for the given ids, or for every video without an HLS
+    package. Boss battle submissions are only included when their video is a
+    key in the submitting student's own upload prefix.
+    """
+    model = MODELS[kind]
+    query = select(model.id, model.video_url)
+    if ids:
+        query = query.where(model.id.in_(ids))
+    else:
+        query = query.where(model.hls_url.is_(None))
+    if model is BossSubmission:
+        owner_prefix = f"{SUBMISSION_KEY_PREFIX}/" + cast(model.user_id, String) + "/"
+        query = query.where(model.video_url.startswith(owner_prefix))
+    rows = (await db.execute(query.order_by(model.id).limit(limit))).all()
+
+    videos = []
+    for item_id, video_url in rows:
+        if is_source_key(video_url):
+            videos.append((kind, str(item_id), video_url))
+        else:
+            logger.warning(f"Skipping {kind} {item_id}: not a stored video key: {video_url!r}")
+    return videos
+
+
+async def apply_result(db: AsyncSession, result: Dict) -> None:
+    """Store a packaged video's URLs (and a lesson's duration) and commit."""
+    item = await db.get(MODELS[result["kind"]], result["id"])
+    if item is None:
+        return
+    item.hls_url = result["hls_url"]
+    item.poster_url = result["poster_url"]
+    item.video_renditions = result["renditions"]
+    if isinstance(item, Lesson):
+        item.duration_minutes = max(1, math.ceil(result["duration_seconds"] / 60))
+    await db.commit()
+
+
+class TranscodeStats:
+    def __init__(self):
+        self.videos = 0
+        self.failed = 0
+        self.frames = 0
+        self.video_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    @property
+    def fps(self) -> float:
+        """Aggregate throughput: frames encoded per wall-clock second."""
+        return self.frames / self.wall_seconds if self.wall_seconds else 0.0
+
+
+async def transcode_all(session_factory, videos: List[tuple], executor: Executor, workers: int) -> TranscodeStats:
+    """
+    Run process_video for each (kind, id, video_url) on the executor, at most
+    `workers` at a time, writing results back as they finish.
+    """
+    require_hls_base_url()
+    loop = asyncio.get_running_loop()
+    # Split the cores between concurrent ffmpeg processes
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    stats = TranscodeStats()
+    started = time.perf_counter()
+
+    futures = [
+        loop.run_in_executor(executor, process_video, kind, item_id, video_url, threads)
+        for kind, item_id, video_url in videos
+    ]
+    for future in asyncio.as_completed(futures):
+        try:
+            result = await future
+        except Exception as e:
+            stats.failed += 1
+            logger.error(f"Transcode failed: {e}")
+            continue
+        async with session_factory() as db:
+            await apply_result(db, result)
+        stats.videos += 1
+        stats.frames += result["frames"]
+        stats.video_seconds += result["duration_seconds"]
+        fps = result["frames"] / result["elapsed_seconds"] if result["elapsed_seconds"] else 0.0
+        logger.info(
+            f"{result['kind']} {result['id']}: {result['duration_seconds']:.1f}s of video, "
+            f"{result['frames']} frames in {result['elapsed_seconds']:.1f}s ({fps:.1f} fps)"
+        )
+    stats.wall_seconds = time.perf_counter() - started
+    return stats
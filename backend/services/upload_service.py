@@ -0,0 +1,282 @@
+"""
+Resumable boss battle video uploads.
+
+Videos go from the client straight to S3 as a multipart upload; API
+workers only hand out presigned part URLs and record the parts' ETags:
+
+1. initiate_upload starts (or resumes) the user's session for a lesson.
+2. The client asks for presigned URLs for the parts it still needs
+   (presign_parts) and PUTs each part to S3.
+3. After each part it reports the ETag (record_parts); reports are merged
+   into the session's JSONB parts map atomically, so parallel part uploads
+   never lose each other's state.
+4. complete_upload assembles the object in S3, checks it has the size the
+   client announced and, in one transaction, closes the session and creates
+   the BossSubmission.
+
+An interrupted client calls initiate_upload (or GET the session) again and
+continues from the parts that are missing. S3 is never called while a
+database transaction is open.
+"""
+import math
+import os
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update, cast, text
+from sqlalchemy.dialects.postgresql import insert, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models.course import Level, Lesson
+from models.progress import BossSubmission, SubmissionStatus
+from models.upload import UploadSession, UploadSessionStatus
+from services import s3_service, stats_service
+
+# S3 allows at most 10,000 parts per upload
+MAX_PARTS = 10000
+MAX_URLS_PER_REQUEST = 100
+
+
+class UploadError(Exception):
+    """An upload step was refused; carries the HTTP status and detail to return."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def missing_parts(session: UploadSession) -> List[int]:
+    return [number for number in range(1, session.part_count + 1) if str(number) not in session.parts]
+
+
+def _part_size(size_bytes: int) -> int:
+    # Grow parts for very large files so they fit in MAX_PARTS
+    return max(settings.UPLOAD_PART_SIZE_BYTES, math.ceil(size_bytes / MAX_PARTS))
+
+
+async def _check_can_submit(db: AsyncSession, user_id, lesson_id) -> None:
+    row = (await db.execute(
+        select(Lesson.is_boss_battle, BossSubmission.id).outerjoin(
+            BossSubmission,
+            (BossSubmission.lesson_id == Lesson.id) & (BossSubmission.user_id == user_id),
+        ).where(Lesson.id == lesson_id)
+    )).first()
+    if row is None:
+        raise UploadError(404, "Lesson not found")
+    if not row.is_boss_battle:
+        raise UploadError(400, "This lesson is not a boss battle")
+    if row.id is not None:
+        raise UploadError(400, "Submission already exists for this lesson")
+
+
+async def _active_session(db: AsyncSession, user_id, lesson_id) -> Optional[UploadSession]:
+    return (await db.execute(
+        select(UploadSession).where(
+            UploadSession.user_id == user_id,
+            UploadSession.lesson_id == lesson_id,
+            UploadSession.status == UploadSessionStatus.ACTIVE,
+        )
+    )).scalar_one_or_none()
+
+
+async def get_session(db: AsyncSession, session_id, user_id) -> UploadSession:
+    try:
+        session_id = uuid.UUID(str(session_id))
+    except ValueError:
+        raise UploadError(404, "Upload not found")
+    session = await db.get(UploadSession, session_id, populate_existing=True)
+    if session is None or session.user_id != user_id:
+        raise UploadError(404, "Upload not found")
+    return session
+
+
+async def initiate_upload(
+    db: AsyncSession, user_id, lesson_id, filename: str, content_type: str, size_bytes: int
+) -> UploadSession:
+    """Start an upload for a boss battle, or return the one already in progress."""
+    try:
+        lesson_id = uuid.UUID(str(lesson_id))
+    except ValueError:
+        raise UploadError(404, "Lesson not found")
+    if not content_type.startswith("video/"):
+        raise UploadError(400, "Only video uploads are accepted")
+    if size_bytes <= 0 or size_bytes > settings.UPLOAD_MAX_BYTES:
+        raise UploadError(400, f"Video must be at most {settings.UPLOAD_MAX_BYTES} bytes")
+
+    await _check_can_submit(db, user_id, lesson_id)
+    existing = await _active_session(db, user_id, lesson_id)
+    if existing is not None and existing.size_bytes == size_bytes:
+        return existing
+    if existing is not None:
+        # A different file: start over
+        await abort_upload(db, existing.id, user_id)
+    else:
+        await db.commit()
+
+    session_id = uuid.uuid4()
+    extension = os.path.splitext(filename)[1].lower()[:10]
+    object_key = f"boss-battles/{user_id}/{lesson_id}/{session_id}{extension}"
+    upload_id = await s3_service.create_multipart_upload(object_key, content_type)
+
+    part_size = _part_size(size_bytes)
+    now = datetime.utcnow()
+    inserted = (await db.execute(
+        insert(UploadSession).values(
+            id=session_id,
+            user_id=user_id,
+            lesson_id=lesson_id,
+            object_key=object_key,
+            s3_upload_id=upload_id,
+            content_type=content_type,
+            size_bytes=size_bytes,
+            part_size=part_size,
+            part_count=math.ceil(size_bytes / part_size),
+            parts={},
+            status=UploadSessionStatus.ACTIVE,
+            created_at=now,
+            updated_at=now,
+        ).on_conflict_do_nothing(
+            index_elements=[UploadSession.user_id, UploadSession.lesson_id],
+            index_where=text("status = 'ACTIVE'"),
+        ).returning(UploadSession.id)
+    )).scalar_one_or_none()
+    await db.commit()
+
+    if inserted is None:
+        # A concurrent request from the same user won; use its session
+        await s3_service.abort_multipart_upload(object_key, upload_id)
+        return await _active_session(db, user_id, lesson_id)
+    return await db.get(UploadSession, session_id)
+
+
+def presign_parts(session: UploadSession, part_numbers: Optional[Iterable[int]] = None) -> Dict[int, str]:
+    """Presigned PUT URLs for the given parts (default: the missing ones, up to a batch)."""
+    if session.status != UploadSessionStatus.ACTIVE:
+        raise UploadError(400, "Upload is no longer active")
+    numbers = sorted(set(part_numbers)) if part_numbers else missing_parts(session)[:MAX_URLS_PER_REQUEST]
+    if len(numbers) > MAX_URLS_PER_REQUEST:
+        raise UploadError(400, f"At most {MAX_URLS_PER_REQUEST} parts per request")
+    if any(number < 1 or number > session.part_count for number in numbers):
+        raise UploadError(400, "Invalid part number")
+    return s3_service.presign_upload_parts(
+        session.object_key, session.s3_upload_id, numbers, settings.UPLOAD_PART_URL_EXPIRY_SECONDS
+    )
+
+
+async def record_parts(db: AsyncSession, session_id, user_id, parts: Dict[int, str]) -> UploadSession:
+    """Merge reported part ETags into the session and commit."""
+    session = await get_session(db, session_id, user_id)
+    if any(number < 1 or number > session.part_count for number in parts):
+        raise UploadError(400, "Invalid part number")
+    reported = {str(number): etag for number, etag in parts.items()}
+    updated = (await db.execute(
+        update(UploadSession).where(
+            UploadSession.id == session.id,
+            UploadSession.status == UploadSessionStatus.ACTIVE,
+        ).values(
+            parts=UploadSession.parts.op("||")(cast(reported, JSONB)),
+            updated_at=datetime.utcnow(),
+        ).returning(UploadSession.id).execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    if updated is None:
+        raise UploadError(400, "Upload is no longer active")
+    await db.commit()
+    return await get_session(db, session.id, user_id)
+
+
+async def _discard(db: AsyncSession, session_id, object_key: str) -> None:
+    """Abort a session whose assembled object was refused, and delete the object."""
+    await db.execute(
+        update(UploadSession).where(
+            UploadSession.id == session_id,
+            UploadSession.status == UploadSessionStatus.ACTIVE,
+        ).values(
+            status=UploadSessionStatus.ABORTED,
+            updated_at=datetime.utcnow(),
+        ).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    await s3_service.delete_object(object_key)
+
+
+async def complete_upload(db: AsyncSession, session_id, user_id) -> BossSubmission:
+    """
+    Assemble the video in S3, then close the session and create the
+    submission in one transaction that holds the session's row lock.
+    Completing twice, even in parallel, returns the same submission.
+    """
+    session = await get_session(db, session_id, user_id)
+    if session.status == UploadSessionStatus.COMPLETED:
+        return await db.get(BossSubmission, session.submission_id)
+    if session.status != UploadSessionStatus.ACTIVE:
+        raise UploadError(400, "Upload is no longer active")
+    if missing_parts(session):
+        raise UploadError(400, f"Parts not uploaded yet: {missing_parts(session)[:20]}")
+    object_key, upload_id = session.object_key, session.s3_upload_id
+    parts = {int(number): etag for number, etag in session.parts.items()}
+    world_id = (await db.execute(
+        select(Level.world_id).join(Lesson, Lesson.level_id == Level.id).where(Lesson.id == session.lesson_id)
+    )).scalar_one()
+    await db.commit()
+
+    from botocore.exceptions import ClientError
+    try:
+        await s3_service.complete_multipart_upload(object_key, upload_id, parts)
+    except ClientError as e:
+        # A retried completion finds the upload already assembled
+        if await s3_service.object_size(object_key) is None:
+            raise UploadError(400, f"Could not assemble upload: {e.response.get('Error', {}).get('Message', e)}")
+    # Parts are sized by the client: the assembled object must be the file it announced
+    size = await s3_service.object_size(object_key)
+    if size != session.size_bytes:
+        await _discard(db, session.id, object_key)
+        raise UploadError(400, f"Uploaded {size} bytes, expected {session.size_bytes}")
+
+    # Completions of one session queue up here; the losers find it COMPLETED
+    locked = (await db.execute(
+        select(UploadSession).where(UploadSession.id == session.id)
+        .with_for_update().execution_options(populate_existing=True)
+    )).scalar_one()
+    if locked.status == UploadSessionStatus.COMPLETED:
+        submission_id = locked.submission_id
+        await db.commit()
+        return await db.get(BossSubmission, submission_id)
+    if locked.status != UploadSessionStatus.ACTIVE:
+        await db.rollback()
+        raise UploadError(400, "Upload is no longer active")
+
+    now = datetime.utcnow()
+    await _check_can_submit(db, user_id, session.lesson_id)
+    submission = BossSubmission(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        lesson_id=session.lesson_id,
+        video_url=object_key,
+        status=SubmissionStatus.PENDING,
+        submitted_at=now,
+    )
+    db.add(submission)
+    await db.flush()
+    locked.status = UploadSessionStatus.COMPLETED
+    locked.submission_id = submission.id
+    locked.completed_at = now
+    locked.updated_at = now
+
+    await stats_service.record_submission(db, world_id)
+    await db.commit()
+    return submission
+
+
+async def abort_upload(db: AsyncSession, session_id, user_id) -> None:
+    """Abandon an active upload, commit, and discard its parts in S3."""
+    session = await get_session(db, session_id, user_id)
+    if session.status != UploadSessionStatus.ACTIVE:
+        return
+    session.status = UploadSessionStatus.ABORTED
+    session.updated_at = datetime.utcnow()
+    object_key, upload_id = session.object_key, session.s3_upload_id
+    await db.commit()
+    await s3_service.abort_multipart_upload(object_key, upload_id)
@@ -0,0 +1,132 @@
+"""
+Tests for the materialized admin counters (services.stats_service).
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from models.course import Lesson, Level
+from models.job import Job
+from models.progress import BossSubmission, SubmissionStatus
+from models.stats import StatCounter
+from models.user import UserRole
+from services import stats_service
+
+
+def _counters(db):
+    db.expire_all()
+    return {(c.metric, c.bucket): c.value for c in db.query(StatCounter).all()}
+
+
+@pytest.fixture
+def activity(client, db, make_user, make_world):
+    """Two signups, a completion, and a boss submission that gets approved."""
+    _, admin_token = make_user(role=UserRole.ADMIN)
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    world = make_world(lessons_per_level=2)
+    first, boss = db.query(Lesson).join(Level).filter(
+        Level.world_id == world.id
+    ).order_by(Lesson.order_index).all()
+    boss.is_boss_battle = True
+    db.commit()
+
+    tokens = []
+    for i in range(2):
+        response = client.post("/api/auth/register", json={
+            "email": f"stats{i}@example.com", "password": "pw", "first_name": "S",
+            "last_name": str(i), "current_level_tag": "Beginner",
+        })
+        tokens.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+
+    assert client.post(f"/api/progress/lessons/{first.id}/complete", headers=tokens[0]).status_code == 200
+    submission = client.post("/api/submissions/submit", json={
+        "lesson_id": str(boss.id), "video_url": "https://example.com/boss.mp4",
+    }, headers=tokens[0]).json()
+    client.post("/api/submissions/submit", json={
+        "lesson_id": str(boss.id), "video_url": "https://example.com/boss2.mp4",
+    }, headers=tokens[1])
+    response = client.post(
+        f"/api/admin/submissions/{submission['id']}/grade",
+        json={"status": "approved"}, headers=admin_headers,
+    )
+    assert response.status_code == 200
+    return world, admin_headers
+
+
+def test_counters_follow_writes(client, db, activity, query_counter):
+    world, admin_headers = activity
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+
+    client.get("/api/admin/stats", headers=admin_headers)
+    query_counter.reset()
+    stats = client.get("/api/admin/stats", headers=admin_headers).json()
+    assert query_counter.count == 1
+    # make_user's admin is not a registration, so only the two signups count
+    assert stats["total_users"] == 2
+    assert stats["total_submissions"] == 2
+    assert stats["pending_submissions"] == 1
+    assert stats["submissions_by_status"]["approved"] == 1
+
+    series = client.get("/api/admin/stats/timeseries", params={"days": 7}, headers=admin_headers).json()
+    assert series["days"][-1] == today
+    assert (series["signups"][-1], series["completions"][-1], series["approvals"][-1]) == (2, 1, 1)
+    assert sum(series["signups"]) == 2
+
+    worlds = client.get("/api/admin/stats/worlds", headers=admin_headers).json()
+    assert worlds == [{
+        "world_id": str(world.id),
+        "title": world.title,
+        "completions": 1,
+        "submissions_by_status": {"pending": 1, "approved": 1, "rejected": 0},
+    }]
+
+
+@pytest.mark.anyio
+async def test_reconcile_recomputes_counters(db, activity, async_session_factory):
+    incremental = _counters(db)
+    with db.bind.begin() as conn:
+        conn.execute(text("UPDATE stat_counters SET value = value + 100"))
+        conn.execute(text("INSERT INTO stat_counters (metric, bucket, value) VALUES ('submissions', 'bogus', 5)"))
+
+    async with async_session_factory() as session:
+        await stats_service.reconcile(session)
+
+    reconciled = _counters(db)
+    # make_user writes users directly, so only the signup counters differ
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    for key, recomputed in ((("users", "total"), 3), (("signups_daily", today), 3)):
+        assert reconciled.pop(key) == recomputed
+        assert incremental.pop(key) == 2
+    assert {k: v for k, v in reconciled.items() if v} == {k: v for k, v in incremental.items() if v}
+
+
+@pytest.mark.anyio
+async def test_concurrent_gradings_count_one_approval(db, make_user, make_world, async_session_factory):
+    import asyncio
+    from routers.admin import grade_submission
+    from schemas.submissions import GradeSubmissionRequest
+    from services.principal_cache import Principal
+
+    admin, _ = make_user(role=UserRole.ADMIN)
+    student, _ = make_user()
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == make_world().id).first()
+    submission = BossSubmission(id=uuid.uuid4(), user_id=student.id, lesson_id=lesson.id, video_url="boss.mp4")
+    db.add(submission)
+    db.commit()
+
+    async def grade():
+        async with async_session_factory() as session:
+            await grade_submission(
+                str(submission.id), GradeSubmissionRequest(status="approved"),
+                admin_user=Principal(admin.id, admin.email, UserRole.ADMIN), db=session,
+            )
+
+    await asyncio.gather(grade(), grade())
+
+    counters = _counters(db)
+    assert counters[(stats_service.SUBMISSIONS, "approved")] == 1
+    assert counters[(stats_service.APPROVALS_DAILY, datetime.utcnow().strftime("%Y-%m-%d"))] == 1
+    assert db.query(Job).filter(Job.kind == "award_xp").count() == 1
+    assert db.get(BossSubmission, submission.id).status == SubmissionStatus.APPROVED
@@ -0,0 +1,62 @@
+"""
+Tests for registration/login and the bcrypt thread pool (services.auth_service).
+"""
+import asyncio
+import threading
+
+import pytest
+
+from services import auth_service
+from services.auth_service import (
+    get_password_hash_async, verify_password_async, hash_pool_stats,
+)
+
+
+def test_register_login_and_profile(client, drain_jobs):
+    response = client.post("/api/auth/register", json={
+        "email": "dancer@example.com",
+        "password": "mambo-on-2",
+        "first_name": "Eddie",
+        "last_name": "Torres",
+        "current_level_tag": "Beginner",
+    })
+    assert response.status_code == 200
+
+    bad_login = client.post("/api/auth/token", json={"email": "dancer@example.com", "password": "wrong"})
+    assert bad_login.status_code == 401
+
+    login = client.post("/api/auth/token", json={"email": "dancer@example.com", "password": "mambo-on-2"})
+    assert login.status_code == 200
+    token = login.json()["access_token"]
+    # The streak update runs as a background job
+    assert drain_jobs() == 1
+
+    profile = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"}).json()
+    assert profile["first_name"] == "Eddie"
+    assert profile["streak_count"] == 1
+
+
+@pytest.mark.anyio
+async def test_hashing_runs_off_the_event_loop(monkeypatch):
+    loop_thread = threading.current_thread()
+    hash_threads = []
+    original_hash = auth_service.get_password_hash
+
+    def recording_hash(password):
+        hash_threads.append(threading.current_thread())
+        return original_hash(password)
+
+    monkeypatch.setattr(auth_service, "get_password_hash", recording_hash)
+    hash_pool_stats.reset()
+
+    hashes = await asyncio.gather(*(get_password_hash_async(f"pw-{i}") for i in range(3)))
+
+    assert all(thread is not loop_thread for thread in hash_threads)
+    assert await verify_password_async("pw-0", hashes[0])
+    assert not await verify_password_async("pw-1", hashes[0])
+
+    stats = hash_pool_stats.snapshot()
+    assert stats["completed"] == 5
+    assert stats["queue_depth"] == 0
+    assert stats["running"] == 0
+    assert stats["avg_hash_ms"] > 0
@@ -0,0 +1,76 @@
+"""
+Tests for the pre-serialized anonymous catalog (services.catalog_cache).
+"""
+import asyncio
+import json
+
+from services import catalog_cache
+
+
+def test_anonymous_catalog_is_served_from_bytes(client, make_world):
+    free_world = make_world(order_index=1, is_free=True)
+    make_world(order_index=2, is_free=False)
+
+    response = client.get("/api/courses/worlds")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == catalog_cache._entry.body
+    worlds = response.json()
+    assert worlds[0]["id"] == str(free_world.id)
+    assert [w["is_locked"] for w in worlds] == [False, True]
+
+    response = client.get("/api/courses/worlds", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+
+def test_concurrent_misses_build_once(db, make_world, async_session_factory, monkeypatch):
+    make_world()
+    builds = []
+    serialize = catalog_cache.serialize
+    monkeypatch.setattr(catalog_cache, "serialize", lambda snapshot: builds.append(1) or serialize(snapshot))
+
+    async def fetch():
+        async with async_session_factory() as session:
+            return await catalog_cache.get_anonymous_catalog(session)
+
+    async def main():
+        return await asyncio.gather(*(fetch() for _ in range(10)))
+
+    entries = asyncio.run(main())
+    assert len(builds) == 1
+    assert len({id(entry) for entry in entries}) == 1
+
+
+def test_refresher_follows_content_changes_without_request_queries(
+    db, make_world, async_session_factory, query_counter, fake_redis
+):
+    make_world(order_index=1)
+
+    async def wait_for(count):
+        for _ in range(200):
+            entry = catalog_cache._entry
+            if entry is not None and len(json.loads(entry.body)) == count:
+                return entry
+            await asyncio.sleep(0.01)
+        raise AssertionError("catalog was not refreshed")
+
+    async def main():
+        catalog_cache.start_refresher(async_session_factory, interval=0.02)
+        try:
+            await wait_for(1)
+            make_world(order_index=2)
+            refreshed = await wait_for(2)
+
+            async with async_session_factory() as session:
+                query_counter.reset()
+                entry = await catalog_cache.get_anonymous_catalog(session)
+                assert query_counter.count == 0
+            # Published for other workers
+            return refreshed, entry, await fake_redis.hgetall(catalog_cache.REDIS_KEY)
+        finally:
+            await catalog_cache.stop_refresher()
+
+    refreshed, entry, cached = asyncio.run(main())
+    assert entry is refreshed
+    assert int(cached["version"]) == entry.version
+    assert cached["body"].encode() == entry.body
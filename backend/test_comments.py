@@ -0,0 +1,97 @@
+"""
+Tests for lesson comment threads (services.comment_service).
+"""
+from models.course import Lesson, Level
+from services import comment_service
+
+
+def _first_lesson(db, world):
+    return db.query(Lesson).join(Level).filter(Level.world_id == world.id).order_by(Lesson.order_index).first()
+
+
+def _post(client, headers, lesson, content, parent=None):
+    response = client.post(
+        f"/api/courses/lessons/{lesson.id}/comments",
+        json={"content": content, "parent_id": parent},
+        headers=headers,
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def test_threads_page_with_nested_replies(client, db, make_user, make_world, monkeypatch):
+    monkeypatch.setattr(comment_service, "REPLIES_PER_THREAD", 2)
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = _first_lesson(db, make_world())
+
+    first = _post(client, headers, lesson, "first")
+    reply = _post(client, headers, lesson, "reply", first)
+    nested = _post(client, headers, lesson, "nested", reply)
+    late = _post(client, headers, lesson, "late reply", first)
+    second = _post(client, headers, lesson, "second")
+    third = _post(client, headers, lesson, "third")
+
+    page = client.get(f"/api/courses/lessons/{lesson.id}/comments?limit=2", headers=headers).json()
+    assert [t["id"] for t in page["items"]] == [third, second]
+    assert page["total_comments"] == 6
+    page = client.get(
+        f"/api/courses/lessons/{lesson.id}/comments?limit=2&cursor={page['next_cursor']}", headers=headers
+    ).json()
+    assert page["next_cursor"] is None
+    (thread,) = page["items"]
+    assert thread["id"] == first
+    assert thread["reply_count"] == 3
+    assert [(r["id"], r["parent_id"], r["depth"]) for r in thread["replies"]] == [(reply, first, 1), (nested, reply, 2)]
+
+    replies = client.get(f"/api/courses/comments/{first}/replies?limit=2", headers=headers).json()
+    rest = client.get(
+        f"/api/courses/comments/{first}/replies?cursor={replies['next_cursor']}", headers=headers
+    ).json()
+    assert [r["id"] for r in replies["items"] + rest["items"]] == [reply, nested, late]
+
+    counts = client.get(f"/api/courses/comment-counts?lesson_id={lesson.id}&lesson_id={_first_lesson(db, make_world(order_index=2)).id}", headers=headers).json()
+    assert sorted(counts.values()) == [0, 6]
+
+
+def test_thread_page_query_count_is_constant(client, db, make_user, make_world, query_counter):
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = _first_lesson(db, make_world())
+    url = f"/api/courses/lessons/{lesson.id}/comments"
+
+    thread = _post(client, headers, lesson, "thread")
+    _post(client, headers, lesson, "reply", thread)
+    client.get(url, headers=headers)
+    query_counter.reset()
+    client.get(url, headers=headers)
+    few_comments_queries = query_counter.count
+    # Threads, replies (one recursive CTE) and the lesson's comment count
+    assert few_comments_queries == 3
+
+    for index in range(10):
+        parent = _post(client, headers, lesson, f"thread {index}")
+        for depth in range(3):
+            parent = _post(client, headers, lesson, f"reply {depth}", parent)
+    query_counter.reset()
+    page = client.get(url, headers=headers).json()
+    assert len(page["items"]) == 11
+    assert query_counter.count == few_comments_queries
+
+
+def test_comment_rules(client, db, make_user, make_world):
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = _first_lesson(db, make_world(order_index=1))
+    other = _first_lesson(db, make_world(order_index=2))
+    paid = _first_lesson(db, make_world(order_index=3, is_free=False))
+
+    comment = _post(client, headers, lesson, "hello")
+    response = client.post(
+        f"/api/courses/lessons/{other.id}/comments", json={"content": "hi", "parent_id": comment}, headers=headers
+    )
+    assert response.status_code == 400
+    response = client.get(f"/api/courses/lessons/{paid.id}/comments", headers=headers)
+    assert response.status_code == 403
+    response = client.get(f"/api/courses/lessons/{lesson.id}/comments?cursor=bogus", headers=headers)
+    assert response.status_code == 400
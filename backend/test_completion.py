@@ -0,0 +1,64 @@
+"""
+Tests for the lesson completion pipeline (services.completion_service).
+"""
+import asyncio
+
+import pytest
+
+from models.progress import UserProgress
+from models.user import UserProfile
+from services.completion_service import complete_lesson, CompletionError
+
+
+@pytest.mark.anyio
+async def test_parallel_duplicate_completions_award_once(db, make_user, make_world, world_lessons, async_session_factory):
+    user, _ = make_user()
+    lesson = world_lessons(make_world())[0]
+
+    async def attempt():
+        async with async_session_factory() as session:
+            try:
+                return await complete_lesson(session, user.id, lesson.id)
+            except CompletionError as e:
+                return e.status_code
+
+    results = await asyncio.gather(*(attempt() for _ in range(8)))
+
+    awarded = [r for r in results if isinstance(r, dict)]
+    assert len(awarded) == 1
+    assert awarded[0]["new_total_xp"] == 50
+    assert sorted(r for r in results if not isinstance(r, dict)) == [400] * 7
+
+    db.expire_all()
+    assert db.query(UserProfile).filter(UserProfile.user_id == user.id).one().xp == 50
+    assert db.query(UserProgress).filter(UserProgress.user_id == user.id).count() == 1
+
+
+@pytest.mark.anyio
+async def test_completion_upserts_existing_progress_row(db, make_user, make_world, world_lessons, async_session_factory):
+    user, _ = make_user()
+    lesson = world_lessons(make_world())[0]
+    db.add(UserProgress(user_id=user.id, lesson_id=lesson.id, is_completed=False))
+    db.commit()
+
+    async with async_session_factory() as session:
+        result = await complete_lesson(session, user.id, lesson.id)
+    assert result["xp_gained"] == 50
+
+    db.expire_all()
+    progress = db.query(UserProgress).filter(UserProgress.user_id == user.id).one()
+    assert progress.is_completed and progress.completed_at is not None
+
+
+def test_complete_lesson_query_count(client, db, make_user, make_world, world_lessons, query_counter):
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    first, second = world_lessons(make_world(lessons_per_level=2))
+    client.post(f"/api/progress/lessons/{first.id}/complete", headers=headers)
+
+    query_counter.reset()
+    response = client.post(f"/api/progress/lessons/{second.id}/complete", headers=headers)
+    assert response.status_code == 200
+    # State join, progress upsert, XP update, streak update, stats counters
+    assert query_counter.count == 5
+    assert client.post("/api/progress/lessons/not-a-uuid/complete", headers=headers).status_code == 404
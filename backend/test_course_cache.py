@@ -0,0 +1,74 @@
+"""
+Tests for the in-process course structure cache (services.course_cache).
+"""
+import pytest
+
+from services.course_cache import get_course_snapshot, get_content_version
+
+
+@pytest.mark.anyio
+async def test_snapshot_records(db, async_session_factory, make_world, world_lessons):
+    free_world = make_world(order_index=1, levels=2, lessons_per_level=2)
+    paid_world = make_world(order_index=2, is_free=False)
+    make_world(order_index=3, is_published=False)
+    first, second, third, fourth = world_lessons(free_world)
+
+    async with async_session_factory() as session:
+        snapshot = await get_course_snapshot(session)
+    assert [w.id for w in snapshot.worlds] == [free_world.id, paid_world.id]
+
+    record = snapshot.get_lesson(second.id)
+    assert record.world_id == free_world.id
+    assert record.prev_id == first.id
+    assert record.next_id is None
+    assert record.is_free is True
+    assert record.xp_value == 50
+    # Levels are independent chains
+    assert snapshot.get_lesson(third.id).prev_id is None
+    assert snapshot.get_lesson(third.id).next_id == fourth.id
+    assert snapshot.get_lesson(world_lessons(paid_world)[0].id).is_free is False
+
+    with pytest.raises(AttributeError):
+        record.xp_value = 100
+
+
+@pytest.mark.anyio
+async def test_course_edit_bumps_version_and_reloads(db, async_session_factory, make_world, world_lessons):
+    world = make_world()
+    async with async_session_factory() as session:
+        snapshot = await get_course_snapshot(session)
+        version = await get_content_version(session)
+        assert snapshot.version == version
+        assert await get_course_snapshot(session) is snapshot
+
+    lesson = world_lessons(world)[0]
+    lesson.xp_value = 75
+    db.commit()
+
+    async with async_session_factory() as session:
+        assert await get_content_version(session) == version + 1
+        reloaded = await get_course_snapshot(session)
+    assert reloaded is not snapshot
+    assert reloaded.get_lesson(lesson.id).xp_value == 75
+
+
+def test_get_lesson_skips_structure_queries(client, db, make_user, make_world, world_lessons, query_counter):
+    user, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = world_lessons(make_world(lessons_per_level=3))[1]
+
+    client.get(f"/api/courses/lessons/{lesson.id}", headers=headers)
+    query_counter.reset()
+    client.get(f"/api/courses/lessons/{lesson.id}", headers=headers)
+    statements = " ".join(query_counter.statements)
+    assert "FROM lessons" not in statements
+    assert "FROM worlds" not in statements
+    assert "FROM levels" not in statements
+
+
+def test_malformed_ids_are_not_found(client, make_user, make_world):
+    make_world()
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/courses/lessons/not-a-uuid", headers=headers).status_code == 404
+    assert client.get("/api/courses/worlds/not-a-uuid/lessons", headers=headers).status_code == 404
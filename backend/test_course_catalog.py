@@ -0,0 +1,75 @@
+"""
+Tests for the world catalog query (GET /api/courses/worlds).
+"""
+import uuid
+from datetime import datetime
+
+from models.course import Lesson, Level
+from models.progress import UserProgress
+
+
+def _complete(db, user, lessons):
+    for lesson in lessons:
+        db.add(UserProgress(
+            id=uuid.uuid4(),
+            user_id=user.id,
+            lesson_id=lesson.id,
+            is_completed=True,
+            completed_at=datetime.utcnow(),
+        ))
+    db.commit()
+
+
+def _world_lessons(db, world):
+    return db.query(Lesson).join(Level).filter(Level.world_id == world.id).order_by(Lesson.order_index).all()
+
+
+def test_worlds_progress_and_lock_status(client, db, make_user, make_world):
+    user, token = make_user()
+    free_world = make_world(order_index=1, levels=2, lessons_per_level=2, is_free=True)
+    paid_world = make_world(order_index=2, is_free=False)
+    make_world(order_index=3, is_published=False)
+    _complete(db, user, _world_lessons(db, free_world)[:1])
+
+    response = client.get("/api/courses/worlds", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    worlds = response.json()
+
+    assert [w["id"] for w in worlds] == [str(free_world.id), str(paid_world.id)]
+    assert worlds[0]["progress_percentage"] == 25
+    assert worlds[0]["is_locked"] is False
+    assert worlds[1]["progress_percentage"] == 0
+    assert worlds[1]["is_locked"] is True
+
+
+def test_worlds_anonymous(client, make_world):
+    make_world(order_index=1, is_free=True)
+    make_world(order_index=2, is_free=False)
+
+    worlds = client.get("/api/courses/worlds").json()
+    assert [w["is_locked"] for w in worlds] == [False, True]
+    assert all(w["progress_percentage"] == 0 for w in worlds)
+
+
+def test_worlds_query_count_is_constant(client, db, make_user, make_world, query_counter):
+    user, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    world = make_world(order_index=1)
+    _complete(db, user, _world_lessons(db, world))
+    # Warm the principal cache
+    client.get("/api/courses/worlds", headers=headers)
+    query_counter.reset()
+    client.get("/api/courses/worlds", headers=headers)
+    few_worlds_queries = query_counter.count
+    # The progress version lookup (ETag) and the catalog query itself
+    assert few_worlds_queries == 2
+
+    for order_index in range(2, 26):
+        make_world(order_index=order_index, levels=2)
+    # Reload the course snapshot after the content change
+    client.get("/api/courses/worlds", headers=headers)
+    query_counter.reset()
+    response = client.get("/api/courses/worlds", headers=headers)
+    assert len(response.json()) == 25
+    assert query_counter.count == few_worlds_queries
@@ -0,0 +1,91 @@
+"""
+Tests for XP awards and streaks (services.gamification_service).
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models.course import Lesson, Level
+from models.user import UserProfile
+from services.gamification_service import award_xp, update_streak, calculate_level, commit_awards
+
+
+def _profile(db, user):
+    db.expire_all()
+    return db.query(UserProfile).filter(UserProfile.user_id == user.id).one()
+
+
+@pytest.mark.anyio
+async def test_concurrent_awards_do_not_lose_updates(db, make_user, async_session_factory):
+    user, _ = make_user(xp=0)
+
+    async def award(amount):
+        async with async_session_factory() as session:
+            result = await award_xp(str(user.id), amount, session)
+            await commit_awards(session)
+            return result
+
+    results = await asyncio.gather(*(award(100) for _ in range(10)))
+
+    profile = _profile(db, user)
+    assert profile.xp == 1000
+    assert profile.level == calculate_level(1000)
+    assert sorted(r["new_total_xp"] for r in results) == list(range(100, 1100, 100))
+    # Level 1 (0 XP) -> 1 (100 XP) is not a level up; 300 XP -> 400 XP is
+    assert sum(r["leveled_up"] for r in results) == 2
+
+
+@pytest.mark.anyio
+async def test_award_does_not_commit(db, make_user, async_session_factory):
+    user, _ = make_user(xp=50)
+    async with async_session_factory() as session:
+        result = await award_xp(str(user.id), 350, session)
+        assert result == {"xp_gained": 350, "new_total_xp": 400, "leveled_up": True, "new_level": 2}
+        await session.rollback()
+    assert _profile(db, user).xp == 50
+
+
+@pytest.mark.anyio
+async def test_streak(db, make_user, async_session_factory):
+    user, _ = make_user()
+    profile = _profile(db, user)
+
+    async def streak():
+        async with async_session_factory() as session:
+            count = await update_streak(str(user.id), session)
+            await session.commit()
+            return count
+
+    assert await streak() == 1
+    assert await streak() == 1
+
+    profile.last_login_date = datetime.utcnow() - timedelta(days=1)
+    db.commit()
+    assert await streak() == 2
+
+    profile = _profile(db, user)
+    profile.last_login_date = datetime.utcnow() - timedelta(days=3)
+    db.commit()
+    assert await streak() == 1
+
+
+def test_complete_lesson_commits_once(client, db, make_user, make_world, async_engine):
+    user, token = make_user()
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == make_world().id).first()
+    # Warm the principal and course caches
+    client.get(f"/api/courses/lessons/{lesson.id}", headers={"Authorization": f"Bearer {token}"})
+
+    commits = []
+    listener = lambda conn: commits.append(conn)
+    event.listen(async_engine.sync_engine, "commit", listener)
+    try:
+        response = client.post(f"/api/progress/lessons/{lesson.id}/complete", headers={"Authorization": f"Bearer {token}"})
+    finally:
+        event.remove(async_engine.sync_engine, "commit", listener)
+
+    assert response.status_code == 200
+    assert len(commits) == 1
+    profile = _profile(db, user)
+    assert (profile.xp, profile.streak_count) == (50, 1)
@@ -0,0 +1,54 @@
+"""
+Tests for ETag / Cache-Control handling of the course endpoints
+(services.http_cache).
+"""
+
+
+def test_anonymous_catalog_revalidates_without_queries(client, db, make_world, query_counter):
+    make_world()
+    response = client.get("/api/courses/worlds")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public, max-age=")
+    assert "s-maxage=" in response.headers["cache-control"]
+    assert "Authorization" in response.headers["vary"]
+
+    query_counter.reset()
+    response = client.get("/api/courses/worlds", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert query_counter.count == 0
+
+    # New content changes the tag
+    make_world(order_index=2)
+    response = client.get("/api/courses/worlds", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()) == 2
+
+
+def test_signed_in_etag_follows_progress(client, db, make_user, make_world, world_lessons, query_counter):
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    world = make_world()
+    first = world_lessons(world)[0]
+
+    response = client.get(f"/api/courses/worlds/{world.id}/lessons", headers=headers)
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    query_counter.reset()
+    response = client.get(f"/api/courses/worlds/{world.id}/lessons", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    # Only the progress version lookup runs
+    assert query_counter.count == 1
+
+    assert client.post(f"/api/progress/lessons/{first.id}/complete", headers=headers).status_code == 200
+    response = client.get(f"/api/courses/worlds/{world.id}/lessons", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["is_completed"] is True
+
+    # Another user's tag differs even at the same versions
+    _, other_token = make_user()
+    other = client.get(f"/api/courses/worlds/{world.id}/lessons", headers={"Authorization": f"Bearer {other_token}"})
+    assert other.headers["etag"] != response.headers["etag"]
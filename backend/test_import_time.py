@@ -0,0 +1,45 @@
+"""
+Import-time budget for the API: every uvicorn worker imports main cold.
+
+Profile a regression with `python -m benchmarks.import_time`.
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+# Cold `import main`, in milliseconds; about 1s without the stripe SDK on a
+# development machine. Override on slow CI runners.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2000"))
+
+# SDKs that are only needed by a few endpoints and load on first use
+LAZY_SDKS = ("stripe", "boto3", "botocore", "imageio_ffmpeg")
+
+COLD_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_SDKS,)
+
+
+def _cold_import():
+    result = subprocess.run(
+        [sys.executable, "-c", COLD_IMPORT], cwd=BACKEND, check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_cold_import_of_main_stays_within_budget():
+    # Best of three, so one slow run on a busy machine does not fail the build
+    runs = []
+    for _ in range(3):
+        runs.append(_cold_import())
+        if runs[-1]["ms"] <= IMPORT_BUDGET_MS:
+            break
+    best = min(runs, key=lambda run: run["ms"])
+    assert best["loaded"] == []
+    assert best["ms"] <= IMPORT_BUDGET_MS, f"import main took {best['ms']:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)"
@@ -0,0 +1,156 @@
+"""
+Tests for the Postgres-backed job queue (services.jobs) and the jobs it runs.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.course import Lesson, Level
+from models.job import Job, JobStatus
+from models.progress import BossSubmission
+from models.user import UserProfile, UserRole
+from services import jobs
+from services.jobs import JobWorker, enqueue, job_handler
+
+
+calls = []
+
+
+@job_handler("test_record")
+async def _record(db, payload):
+    calls.append(payload["n"])
+
+
+@job_handler("test_flaky")
+async def _flaky(db, payload):
+    calls.append(payload["n"])
+    if len(calls) < payload["fail_times"] + 1:
+        raise RuntimeError("transient")
+
+
+@pytest.fixture(autouse=True)
+def _reset_calls():
+    calls.clear()
+
+
+async def _enqueue(session_factory, kind, payloads, **kwargs):
+    async with session_factory() as db:
+        for payload in payloads:
+            await enqueue(db, kind, payload, **kwargs)
+        await db.commit()
+
+
+def _jobs(db):
+    db.expire_all()
+    return db.query(Job).order_by(Job.id).all()
+
+
+def test_boss_xp_is_awarded_once_by_the_worker(client, db, make_user, make_world, drain_jobs):
+    _, admin_token = make_user(role=UserRole.ADMIN)
+    student, _ = make_user()
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == make_world().id).first()
+    submission = BossSubmission(id=uuid.uuid4(), user_id=student.id, lesson_id=lesson.id, video_url="v.mp4")
+    db.add(submission)
+    db.commit()
+
+    for _ in range(2):
+        response = client.post(
+            f"/api/admin/submissions/{submission.id}/grade",
+            json={"status": "approved"},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert response.status_code == 200
+
+    profile = db.query(UserProfile).filter(UserProfile.user_id == student.id).one()
+    assert profile.xp == 0
+    assert drain_jobs() == 1
+    db.refresh(profile)
+    assert profile.xp == 500
+
+
+@pytest.mark.anyio
+async def test_parallel_workers_run_each_job_once(db, async_session_factory):
+    await _enqueue(async_session_factory, "test_record", [{"n": n} for n in range(40)])
+
+    workers = [JobWorker(async_session_factory, concurrency=4, worker_id=f"w{i}") for i in range(3)]
+    await asyncio.gather(*(worker.drain() for worker in workers))
+
+    assert sorted(calls) == list(range(40))
+    assert sum(worker.completed for worker in workers) == 40
+    assert {job.status for job in _jobs(db)} == {JobStatus.DONE}
+
+
+@pytest.mark.anyio
+async def test_failed_job_is_retried_with_backoff(db, async_session_factory):
+    await _enqueue(async_session_factory, "test_flaky", [{"n": 1, "fail_times": 1}])
+    worker = JobWorker(async_session_factory)
+
+    assert await worker.drain() == 1
+    [job] = _jobs(db)
+    assert job.status == JobStatus.QUEUED
+    assert job.attempts == 1
+    assert "transient" in job.last_error
+    # Not due yet: the retry waits out its backoff
+    assert job.run_at > datetime.utcnow()
+    assert await worker.drain() == 0
+
+    job.run_at = datetime.utcnow()
+    db.commit()
+    assert await worker.drain() == 1
+    [job] = _jobs(db)
+    assert (job.status, job.attempts, job.last_error) == (JobStatus.DONE, 2, None)
+
+
+@pytest.mark.anyio
+async def test_job_fails_permanently(db, async_session_factory):
+    await _enqueue(async_session_factory, "test_flaky", [{"n": 1, "fail_times": 5}], max_attempts=1)
+    await _enqueue(async_session_factory, "no_such_kind", [{}])
+
+    await JobWorker(async_session_factory).drain()
+    assert [(job.status, job.attempts) for job in _jobs(db)] == [(JobStatus.FAILED, 1), (JobStatus.FAILED, 1)]
+
+
+@pytest.mark.anyio
+async def test_stale_running_job_is_reclaimed(db, async_session_factory):
+    await _enqueue(async_session_factory, "test_record", [{"n": 7}])
+    [job] = _jobs(db)
+    job.status = JobStatus.RUNNING
+    job.attempts = 1
+    job.locked_by = "dead-worker"
+    job.locked_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    async with async_session_factory() as session:
+        stats = await jobs.queue_stats(session)
+    assert stats["running"] == 1
+
+    assert await JobWorker(async_session_factory).drain() == 1
+    assert calls == [7]
+    [job] = _jobs(db)
+    assert (job.status, job.attempts) == (JobStatus.DONE, 2)
+
+
+@pytest.mark.anyio
+async def test_run_that_lost_its_claim_is_rolled_back(db, async_session_factory, make_user):
+    user, _ = make_user(xp=0)
+    await _enqueue(async_session_factory, "award_xp", [{"user_id": str(user.id), "xp": 500}])
+
+    async with async_session_factory() as session:
+        [slow_claim] = await jobs.claim(session, "slow", 1)
+    # The slow worker's lock times out and another worker takes the job over
+    [job] = _jobs(db)
+    job.locked_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+    async with async_session_factory() as session:
+        [fast_claim] = await jobs.claim(session, "fast", 1)
+
+    assert await jobs.run_job(async_session_factory, fast_claim, "fast") is True
+    # The original run finishes late: its award must not apply a second time
+    assert await jobs.run_job(async_session_factory, slow_claim, "slow") is False
+
+    db.expire_all()
+    assert db.query(UserProfile).filter(UserProfile.user_id == user.id).one().xp == 500
+    [job] = _jobs(db)
+    assert (job.status, job.attempts, job.locked_by) == (JobStatus.DONE, 2, None)
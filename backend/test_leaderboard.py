@@ -0,0 +1,153 @@
+"""
+Tests for the sorted-set leaderboard (services.leaderboard) and /api/users/leaderboard.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.course import Lesson, Level
+from models.progress import UserProgress
+from services import leaderboard
+
+
+def _complete_lessons(client, db, world, token, count):
+    lessons = db.query(Lesson).join(Level).filter(
+        Level.world_id == world.id
+    ).order_by(Level.order_index, Lesson.order_index).all()
+    for lesson in lessons[:count]:
+        response = client.post(
+            f"/api/progress/lessons/{lesson.id}/complete",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+
+
+def _rebuild(async_session_factory):
+    async def run():
+        async with async_session_factory() as session:
+            return await leaderboard.rebuild_leaderboard(session)
+    return asyncio.run(run())
+
+
+def test_leaderboard_tracks_awarded_xp(client, db, fake_redis, make_user, make_world, query_counter, async_session_factory):
+    world = make_world(lessons_per_level=3)
+    users = [make_user() for _ in range(3)]
+    # Provisioned (empty) sets; awards are then applied incrementally
+    _rebuild(async_session_factory)
+    for completed, (_, token) in zip((1, 3, 2), users):
+        _complete_lessons(client, db, world, token, completed)
+
+    query_counter.reset()
+    top = client.get("/api/users/leaderboard").json()
+    # Ranks come from Redis; only the profile names are read from Postgres
+    assert query_counter.count == 1
+    assert [entry["user_id"] for entry in top] == [str(users[i][0].id) for i in (1, 2, 0)]
+    assert [(entry["rank"], entry["xp_total"]) for entry in top] == [(1, 150), (2, 100), (3, 50)]
+
+    weekly = client.get("/api/users/leaderboard", params={"period": "weekly", "limit": 2}).json()
+    assert [entry["xp_total"] for entry in weekly] == [150, 100]
+
+    _, middle_token = users[2]
+    around = client.get(
+        "/api/users/leaderboard/me",
+        params={"period": "monthly", "radius": 1},
+        headers={"Authorization": f"Bearer {middle_token}"},
+    ).json()
+    assert around["rank"] == 2
+    assert [entry["rank"] for entry in around["entries"]] == [1, 2, 3]
+
+
+def test_leaderboard_falls_back_to_postgres(client, db, make_user):
+    low, _ = make_user(xp=100)
+    high, high_token = make_user(xp=900)
+    make_user(xp=0)
+
+    top = client.get("/api/users/leaderboard").json()
+    assert [(entry["user_id"], entry["rank"]) for entry in top] == [(str(high.id), 1), (str(low.id), 2)]
+
+    around = client.get(
+        "/api/users/leaderboard/me",
+        params={"radius": 1},
+        headers={"Authorization": f"Bearer {high_token}"},
+    ).json()
+    assert around["rank"] == 1
+    assert [entry["user_id"] for entry in around["entries"]] == [str(high.id), str(low.id)]
+
+    # Neither user earned XP this week
+    assert client.get("/api/users/leaderboard", params={"period": "weekly"}).json() == []
+
+
+@pytest.mark.anyio
+async def test_rebuild_from_postgres(db, fake_redis, make_user, make_world, async_session_factory):
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == make_world().id).first()
+    recent, _ = make_user(xp=300)
+    old, _ = make_user(xp=1000)
+    for user, completed_at in ((recent, datetime.utcnow()), (old, datetime.utcnow() - timedelta(days=70))):
+        db.add(UserProgress(
+            id=uuid.uuid4(), user_id=user.id, lesson_id=lesson.id,
+            is_completed=True, completed_at=completed_at,
+        ))
+    db.commit()
+
+    async with async_session_factory() as session:
+        counts = await leaderboard.rebuild_leaderboard(session)
+        assert counts[leaderboard.period_key("all")] == 2
+        assert counts[leaderboard.period_key("monthly")] == 1
+
+        top = await leaderboard.get_top(session, "all")
+        assert [row.user_id for row in top] == [str(old.id), str(recent.id)]
+        weekly = await leaderboard.get_top(session, "weekly")
+        assert [(row.user_id, row.xp_total) for row in weekly] == [(str(recent.id), 50)]
+
+    assert await fake_redis.exists(leaderboard.period_key("weekly"))
+
+
+@pytest.mark.anyio
+async def test_flushed_redis_serves_postgres_until_rebuilt(db, fake_redis, make_user, async_session_factory):
+    leaders = [make_user(xp=xp)[0] for xp in (5000, 3000)]
+    async with async_session_factory() as session:
+        await leaderboard.rebuild_leaderboard(session)
+    await fake_redis.flushall()
+
+    # An award after the flush must not start a partial set
+    newcomer, _ = make_user(xp=50)
+    await leaderboard.record_xp(newcomer.id, 50, 50)
+    assert not await fake_redis.exists(leaderboard.period_key("all"))
+
+    async with async_session_factory() as session:
+        top = await leaderboard.get_top(session, "all")
+        assert [row.xp_total for row in top] == [5000, 3000, 50]
+        # The read started a rebuild from Postgres
+        await leaderboard._rebuild_task
+
+        assert await fake_redis.exists(leaderboard.ready_key(leaderboard.period_key("all")))
+        top = await leaderboard.get_top(session, "all")
+        assert [row.user_id for row in top] == [str(leaders[0].id), str(leaders[1].id), str(newcomer.id)]
+
+
+@pytest.mark.anyio
+async def test_award_during_rebuild_is_kept(db, fake_redis, make_user, async_session_factory):
+    leader, _ = make_user(xp=5000)
+    late, _ = make_user(xp=0)
+
+    async with async_session_factory() as session:
+        select_scores = session.execute
+        selects = []
+
+        async def award_after_select(statement, *args, **kwargs):
+            result = await select_scores(statement, *args, **kwargs)
+            selects.append(statement)
+            if len(selects) == leaderboard.PERIODS.index("weekly") + 1:
+                # Commits after the weekly SELECT, before its set is stored
+                await leaderboard.record_xp(late.id, 50, 50)
+            return result
+
+        session.execute = award_after_select
+        await leaderboard.rebuild_leaderboard(session)
+
+    assert await fake_redis.zscore(leaderboard.period_key("weekly"), str(late.id)) == 50
+    assert await fake_redis.zscore(leaderboard.period_key("all"), str(late.id)) == 50
+    assert await fake_redis.zscore(leaderboard.period_key("all"), str(leader.id)) == 5000
+    assert not await fake_redis.exists(leaderboard.staging_key(leaderboard.period_key("weekly")))
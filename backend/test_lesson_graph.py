@@ -0,0 +1,97 @@
+"""
+Tests for lesson lock/completion resolution (services.lesson_graph) and the
+endpoints built on it.
+"""
+import uuid
+from datetime import datetime
+
+from models.progress import UserProgress
+
+
+def _complete(db, user, lesson):
+    db.add(UserProgress(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        lesson_id=lesson.id,
+        is_completed=True,
+        completed_at=datetime.utcnow(),
+    ))
+    db.commit()
+
+
+def test_world_lessons_lock_and_completion(client, db, make_user, make_world, world_lessons):
+    user, token = make_user()
+    world = make_world(levels=2, lessons_per_level=3)
+    lessons = world_lessons(world)
+    _complete(db, user, lessons[0])
+
+    response = client.get(f"/api/courses/worlds/{world.id}/lessons", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    states = [(l["is_completed"], l["is_locked"]) for l in response.json()]
+    assert states == [
+        (True, False), (False, False), (False, True),
+        # First lesson of every level is always open
+        (False, False), (False, True), (False, True),
+    ]
+
+
+def test_world_lessons_query_count_is_constant(client, db, make_user, make_world, world_lessons, query_counter):
+    user, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    small_world = make_world(order_index=1, lessons_per_level=2)
+    big_world = make_world(order_index=2, levels=6, lessons_per_level=10)
+    for lesson in world_lessons(big_world)[:20]:
+        _complete(db, user, lesson)
+
+    # Warm the principal and course caches
+    client.get(f"/api/courses/worlds/{small_world.id}/lessons", headers=headers)
+    query_counter.reset()
+    client.get(f"/api/courses/worlds/{small_world.id}/lessons", headers=headers)
+    small_world_queries = query_counter.count
+
+    query_counter.reset()
+    response = client.get(f"/api/courses/worlds/{big_world.id}/lessons", headers=headers)
+    assert len(response.json()) == 60
+    assert query_counter.count == small_world_queries
+
+
+def test_get_lesson_prerequisites_and_neighbours(client, db, make_user, make_world, world_lessons):
+    user, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    first, second, third = world_lessons(make_world(lessons_per_level=3))
+
+    assert client.get(f"/api/courses/lessons/{second.id}", headers=headers).status_code == 403
+
+    _complete(db, user, first)
+    response = client.get(f"/api/courses/lessons/{second.id}", headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["prev_lesson_id"] == str(first.id)
+    assert body["next_lesson_id"] == str(third.id)
+
+
+def test_get_lesson_requires_subscription_for_paid_world(client, db, make_user, make_world, world_lessons):
+    first = world_lessons(make_world(is_free=False))[0]
+
+    _, token = make_user()
+    response = client.get(f"/api/courses/lessons/{first.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+    _, token = make_user(subscribed=True)
+    response = client.get(f"/api/courses/lessons/{first.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+
+def test_complete_lesson_checks_prerequisites(client, db, make_user, make_world, world_lessons):
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    first, second = world_lessons(make_world(lessons_per_level=2))
+
+    assert client.post(f"/api/progress/lessons/{second.id}/complete", headers=headers).status_code == 403
+
+    response = client.post(f"/api/progress/lessons/{first.id}/complete", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["xp_gained"] == 50
+    assert client.post(f"/api/progress/lessons/{first.id}/complete", headers=headers).status_code == 400
+    assert client.post(f"/api/progress/lessons/{second.id}/complete", headers=headers).status_code == 200
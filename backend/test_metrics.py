@@ -0,0 +1,76 @@
+"""
+Tests for the Prometheus /metrics endpoint (metrics.py).
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+
+
+def _sample_value(text, name, **labels):
+    from prometheus_client.parser import text_string_to_metric_families
+
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == name and sample.labels == labels:
+                return sample.value
+    return None
+
+
+def test_metrics_cover_requests_pool_caches_and_jobs(client, make_world):
+    world = make_world()
+    # Metrics are process-wide, so compare against a scrape taken first
+    before = client.get("/metrics").text
+
+    def added(name, **labels):
+        return _sample_value(text, name, **labels) - (_sample_value(before, name, **labels) or 0)
+
+    client.get("/api/courses/worlds")
+    client.get("/api/courses/worlds")
+    client.get(f"/api/courses/worlds/{world.id}/lessons")
+    client.get("/no-such-page")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    route = {"method": "GET", "route": "/api/courses/worlds"}
+    assert added("http_request_duration_seconds_count", **route) == 2
+    assert added("http_requests_total", status="200", **route) == 2
+    assert added("http_requests_total", method="GET", route="/api/courses/worlds/{world_id}/lessons", status="401") == 1
+    assert added("http_requests_total", method="GET", route="unmatched", status="404") == 1
+    # The scrape itself is in flight
+    assert _sample_value(text, "http_requests_in_flight") == 1
+    assert added("cache_hits_total", cache="anonymous_catalog") >= 1
+    assert added("cache_misses_total", cache="anonymous_catalog") >= 1
+    assert _sample_value(text, "jobs", status="queued") == 0
+    assert _sample_value(text, "job_lag_seconds") == 0
+    for name in ("db_pool_checked_out", "db_pool_checkouts_total", "password_hash_queue_depth"):
+        assert _sample_value(text, name) is not None
+
+
+def test_multiprocess_mode_aggregates_workers(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = textwrap.dedent("""
+        import asyncio
+        import metrics
+        metrics.IN_FLIGHT.inc()
+        metrics.observe_request("GET", "/api/courses/worlds", 200, 0.01, 2)
+        # Lifespan shutdown
+        asyncio.run(metrics.stop_sampler())
+    """)
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=BACKEND, env=env, check=True)
+
+    scrape = "import metrics, sys; sys.stdout.write(metrics.exposition().decode())"
+    text = subprocess.run(
+        [sys.executable, "-c", scrape], cwd=BACKEND, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    route = {"method": "GET", "route": "/api/courses/worlds"}
+    assert _sample_value(text, "http_request_duration_seconds_count", **route) == 2
+    assert _sample_value(text, "http_request_db_queries_sum", **route) == 4
+    # Exited workers do not count as in flight
+    assert not _sample_value(text, "http_requests_in_flight")
@@ -0,0 +1,111 @@
+"""
+Tests for the authenticated principal cache (services.principal_cache).
+"""
+import time
+import uuid
+
+import pytest
+
+from models.user import UserRole
+from services import principal_cache
+from services.principal_cache import Principal, _LRUCache, REDIS_KEY_PREFIX
+
+
+def _principal(role=UserRole.STUDENT):
+    return Principal(id=uuid.uuid4(), email="p@example.com", role=role)
+
+
+def test_me_skips_user_lookup_when_cached(client, make_user, query_counter):
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    client.get("/api/auth/me", headers=headers)
+    query_counter.reset()
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 200
+    # Only the profile lookup; no users/subscriptions queries
+    assert query_counter.count == 1
+    assert not any("FROM users" in s or "FROM subscriptions" in s for s in query_counter.statements)
+
+
+def test_role_change_is_visible_on_next_request(client, make_user):
+    _, admin_token = make_user(role=UserRole.ADMIN)
+    student, student_token = make_user()
+    student_headers = {"Authorization": f"Bearer {student_token}"}
+
+    assert client.get("/api/admin/stats", headers=student_headers).status_code == 403
+
+    response = client.put(
+        f"/api/admin/users/{student.id}/role",
+        json={"role": "admin"},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    assert client.get("/api/admin/stats", headers=student_headers).status_code == 200
+
+    malformed = client.put(
+        "/api/admin/users/not-a-uuid/role",
+        json={"role": "admin"},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert malformed.status_code == 422
+
+
+def test_lru_expires_and_evicts(monkeypatch):
+    cache = _LRUCache(max_size=2, ttl=10)
+    first, second, third = _principal(), _principal(), _principal()
+    cache.set(first.id, first)
+    cache.set(second.id, second)
+    assert cache.get(first.id) is first
+    cache.set(third.id, third)
+    # second was least recently used
+    assert cache.get(second.id) is None
+    assert len(cache) == 2
+
+    now = time.monotonic()
+    monkeypatch.setattr(principal_cache.time, "monotonic", lambda: now + 11)
+    assert cache.get(first.id) is None
+
+
+@pytest.mark.anyio
+async def test_redis_layer_round_trip(fake_redis):
+    principal = Principal(id=uuid.uuid4(), email="r@example.com", role=UserRole.ADMIN, profile_id=uuid.uuid4())
+    await fake_redis.set(REDIS_KEY_PREFIX + str(principal.id), principal.to_json())
+
+    try:
+        # Served from Redis without touching the database
+        cached = await principal_cache.get_principal(None, principal.id)
+        assert cached.role == UserRole.ADMIN
+        assert cached.profile_id == principal.profile_id
+
+        await principal_cache.invalidate_principal(principal.id)
+        assert await fake_redis.get(REDIS_KEY_PREFIX + str(principal.id)) is None
+    finally:
+        principal_cache.clear_principal_cache()
+
+
+@pytest.mark.anyio
+async def test_load_racing_an_invalidation_is_not_cached(fake_redis, monkeypatch):
+    user_id = uuid.uuid4()
+    stale = Principal(id=user_id, email="x@example.com", role=UserRole.ADMIN)
+
+    async def load_then_invalidated(db, uid):
+        # The role changes and is invalidated after this request read it
+        await principal_cache.invalidate_principal(uid)
+        return stale
+
+    monkeypatch.setattr(principal_cache, "load_principal", load_then_invalidated)
+    try:
+        assert await principal_cache.get_principal(None, user_id) is stale
+        assert await fake_redis.get(REDIS_KEY_PREFIX + str(user_id)) is None
+        assert principal_cache._local.get(user_id) is None
+
+        # Without a concurrent invalidation the next load is cached again
+        async def load(db, uid):
+            return stale
+
+        monkeypatch.setattr(principal_cache, "load_principal", load)
+        await principal_cache.get_principal(None, user_id)
+        assert await fake_redis.get(REDIS_KEY_PREFIX + str(user_id)) is not None
+    finally:
+        principal_cache.clear_principal_cache()
@@ -0,0 +1,90 @@
+"""
+Tests for the keyset-paginated admin review queue (GET /api/admin/submissions).
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text
+
+from database import ensure_indexes
+from models.course import Lesson, Level
+from models.progress import BossSubmission, SubmissionStatus
+from models.user import UserRole
+
+
+def _submit(db, user, lesson, minutes_ago, status=SubmissionStatus.PENDING, reviewer=None):
+    submission = BossSubmission(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        lesson_id=lesson.id,
+        video_url="https://example.com/boss.mp4",
+        status=status,
+        submitted_at=datetime.utcnow() - timedelta(minutes=minutes_ago),
+        reviewed_by=reviewer.id if reviewer else None,
+    )
+    db.add(submission)
+    db.commit()
+    return submission
+
+
+def _first_lesson(db, world):
+    return db.query(Lesson).join(Level).filter(Level.world_id == world.id).first()
+
+
+def test_queue_pages_oldest_first(client, db, make_user, make_world, query_counter):
+    _, admin_token = make_user(role=UserRole.ADMIN)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    student, _ = make_user()
+    lesson = _first_lesson(db, make_world())
+    submissions = [_submit(db, student, lesson, minutes_ago) for minutes_ago in (50, 40, 30, 20, 10)]
+    _submit(db, student, lesson, 60, status=SubmissionStatus.APPROVED)
+
+    # Warm the principal cache
+    client.get("/api/admin/submissions", headers=headers)
+    seen, cursor = [], None
+    while True:
+        query_counter.reset()
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/admin/submissions", params=params, headers=headers).json()
+        # Students and lesson titles come from the same query
+        assert query_counter.count == 1
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [str(s.id) for s in submissions]
+    first = client.get("/api/admin/submissions", params={"limit": 1}, headers=headers).json()["items"][0]
+    assert first["lesson_title"] == lesson.title
+    assert first["student_name"] == "Test Dancer"
+
+
+def test_queue_filters(client, db, make_user, make_world):
+    admin, admin_token = make_user(role=UserRole.ADMIN)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    student, _ = make_user()
+    lesson_a = _first_lesson(db, make_world(order_index=1))
+    world_b = make_world(order_index=2)
+    lesson_b = _first_lesson(db, world_b)
+    in_a = _submit(db, student, lesson_a, 5)
+    in_b = _submit(db, student, lesson_b, 4)
+    graded = _submit(db, student, lesson_b, 3, status=SubmissionStatus.REJECTED, reviewer=admin)
+
+    def ids(**params):
+        page = client.get("/api/admin/submissions", params=params, headers=headers).json()
+        return [item["id"] for item in page["items"]]
+
+    assert ids(lesson_id=str(lesson_a.id)) == [str(in_a.id)]
+    assert ids(world_id=str(world_b.id)) == [str(in_b.id)]
+    assert ids(status="rejected", reviewer_id=str(admin.id)) == [str(graded.id)]
+    assert client.get("/api/admin/submissions", params={"cursor": "bogus"}, headers=headers).status_code == 400
+
+
+def test_ensure_indexes_creates_missing_queue_index(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_boss_submissions_status_submitted_at"))
+
+    assert "ix_boss_submissions_status_submitted_at" in ensure_indexes(engine)
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("boss_submissions")}
+    assert "ix_boss_submissions_status_submitted_at" in indexes
+    assert ensure_indexes(engine) == []
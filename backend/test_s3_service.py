@@ -0,0 +1,71 @@
+"""
+Tests for S3 presigning (services.s3_service) against moto's in-memory S3.
+"""
+import os
+import subprocess
+import sys
+
+import requests
+
+from config import settings
+from models.course import Lesson, Level
+from services import s3_service
+
+
+def test_import_does_not_load_boto3():
+    # The client is built on first use, so importing needs no AWS settings
+    code = "import sys, services.s3_service as s; assert s._client is None and 'boto3' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, env={"PATH": ""}, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_multipart_parts_are_presigned_in_one_batch(s3_bucket):
+    bucket = settings.AWS_S3_BUCKET_NAME
+    upload_id = s3_bucket.create_multipart_upload(Bucket=bucket, Key="boss/video.mp4")["UploadId"]
+
+    urls = s3_service.presign_upload_parts("boss/video.mp4", upload_id, [1, 2])
+    assert sorted(urls) == [1, 2]
+
+    chunks = {1: b"a" * 5 * 1024 * 1024, 2: b"b" * 10}
+    parts = []
+    for number, url in urls.items():
+        response = requests.put(url, data=chunks[number])
+        assert response.status_code == 200
+        parts.append({"PartNumber": number, "ETag": response.headers["ETag"]})
+    s3_bucket.complete_multipart_upload(
+        Bucket=bucket, Key="boss/video.mp4", UploadId=upload_id, MultipartUpload={"Parts": parts}
+    )
+
+    body = s3_bucket.get_object(Bucket=bucket, Key="boss/video.mp4")["Body"].read()
+    assert body == chunks[1] + chunks[2]
+
+
+def test_download_urls_are_reused_until_shortly_before_expiry(s3_bucket, monkeypatch):
+    s3_bucket.put_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key="lessons/intro.mp4", Body=b"video")
+    monkeypatch.setattr(settings, "S3_DOWNLOAD_URL_EXPIRY_SECONDS", 3600)
+    monkeypatch.setattr(settings, "S3_DOWNLOAD_URL_REFRESH_SECONDS", 300)
+    now = [1000.0]
+    monkeypatch.setattr(s3_service.time, "monotonic", lambda: now[0])
+
+    url = s3_service.get_download_url("lessons/intro.mp4")
+    assert requests.get(url).content == b"video"
+
+    now[0] += 3299
+    assert s3_service.get_download_url("lessons/intro.mp4") == url
+    assert s3_service.download_url_cache_stats()["hits"] == 1
+
+    now[0] += 1
+    s3_service.get_download_url("lessons/intro.mp4")
+    assert s3_service.download_url_cache_stats()["misses"] == 2
+
+
+def test_lesson_video_keys_are_presigned(client, db, make_user, make_world, s3_bucket):
+    _, token = make_user()
+    world = make_world(lessons_per_level=2)
+    first, second = db.query(Lesson).join(Level).filter(Level.world_id == world.id).order_by(Lesson.order_index).all()
+    first.video_url = "lessons/intro.mp4"
+    db.commit()
+
+    response = client.get(f"/api/courses/worlds/{world.id}/lessons", headers={"Authorization": f"Bearer {token}"})
+    urls = [lesson["video_url"] for lesson in response.json()]
+    assert "lessons/intro.mp4?" in urls[0] and "X-Amz-Signature=" in urls[0]
+    assert urls[1] == second.video_url
@@ -0,0 +1,197 @@
+"""
+Tests for the Stripe webhook inbox (services.stripe_webhooks) and the
+/api/payments/webhook endpoint.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from config import settings
+from models.job import Job
+from models.stripe_event import StripeEvent, StripeEventStatus
+from models.user import Subscription, SubscriptionStatus, SubscriptionTier
+from services import stripe_service, stripe_webhooks
+
+SECRET = "whsec_test"
+
+
+@pytest.fixture(autouse=True)
+def webhook_secret(monkeypatch):
+    monkeypatch.setattr(settings, "STRIPE_WEBHOOK_SECRET", SECRET)
+
+
+@pytest.fixture
+def stripe_calls(monkeypatch):
+    """Records Stripe API subscription lookups instead of making them."""
+    calls = []
+
+    async def retrieve_subscription(subscription_id):
+        calls.append(subscription_id)
+        return {
+            "id": subscription_id,
+            "status": "active",
+            "current_period_end": 1900000000,
+            "items": {"data": [{"price": {"lookup_key": "performer"}}]},
+        }
+
+    monkeypatch.setattr(stripe_service, "retrieve_subscription", retrieve_subscription)
+    return calls
+
+
+def _post(client, event, secret=SECRET):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return client.post(
+        "/api/payments/webhook",
+        content=payload,
+        headers={"stripe-signature": f"t={timestamp},v1={signature}", "content-type": "application/json"},
+    )
+
+
+def _subscription_event(event_id, created, status, customer="cus_1", lookup_key="social_dancer", user_id=None,
+                        subscription_id="sub_1", event_type="customer.subscription.updated"):
+    return {
+        "id": event_id,
+        "type": event_type,
+        "created": created,
+        "data": {"object": {
+            "object": "subscription",
+            "id": subscription_id,
+            "customer": customer,
+            "status": status,
+            "current_period_end": 1900000000,
+            "items": {"data": [{"price": {"lookup_key": lookup_key}}]},
+            "metadata": {"user_id": str(user_id)} if user_id else {},
+        }},
+    }
+
+
+def _subscription(db, user):
+    db.expire_all()
+    return db.query(Subscription).filter(Subscription.user_id == user.id).one()
+
+
+def test_duplicate_deliveries_are_stored_and_queued_once(client, db, make_user, drain_jobs, stripe_calls):
+    user, _ = make_user()
+    event = _subscription_event("evt_1", 1000, "active", user_id=user.id)
+
+    for _ in range(3):
+        response = _post(client, event)
+        assert response.status_code == 200
+        assert response.json() == {"status": "success"}
+
+    assert db.query(StripeEvent).count() == 1
+    assert db.query(Job).filter(Job.kind == "stripe_customer_events").count() == 1
+
+    # Nothing is applied until the worker runs
+    assert _subscription(db, user).status == SubscriptionStatus.INCOMPLETE
+    drain_jobs()
+
+    subscription = _subscription(db, user)
+    assert subscription.status == SubscriptionStatus.ACTIVE
+    assert subscription.tier == SubscriptionTier.SOCIAL_DANCER
+    assert subscription.stripe_customer_id == "cus_1"
+    assert stripe_calls == []
+
+
+def test_customer_events_apply_in_stripe_order(client, db, make_user, drain_jobs, stripe_calls):
+    user, _ = make_user()
+    # Delivered out of order: the later cancellation arrives first
+    _post(client, _subscription_event("evt_2", 2000, "canceled", user_id=user.id))
+    _post(client, _subscription_event("evt_1", 1000, "active", user_id=user.id))
+    drain_jobs()
+
+    assert _subscription(db, user).status == SubscriptionStatus.CANCELED
+    statuses = {event.id: event.status for event in db.query(StripeEvent).all()}
+    assert statuses == {"evt_1": StripeEventStatus.PROCESSED, "evt_2": StripeEventStatus.PROCESSED}
+
+
+def test_invoice_without_price_falls_back_to_stripe(client, db, make_user, drain_jobs, stripe_calls):
+    user, _ = make_user()
+    _post(client, _subscription_event("evt_1", 1000, "incomplete", user_id=user.id))
+    _post(client, {
+        "id": "evt_2",
+        "type": "invoice.payment_succeeded",
+        "created": 2000,
+        "data": {"object": {"object": "invoice", "customer": "cus_1", "subscription": "sub_1", "lines": {"data": []}}},
+    })
+    _post(client, {"id": "evt_3", "type": "customer.created", "created": 3000, "data": {"object": {"object": "customer", "id": "cus_1"}}})
+    drain_jobs()
+
+    subscription = _subscription(db, user)
+    assert subscription.status == SubscriptionStatus.ACTIVE
+    assert subscription.tier == SubscriptionTier.PERFORMER
+    assert stripe_calls == ["sub_1"]
+    assert db.get(StripeEvent, "evt_3").status == StripeEventStatus.IGNORED
+
+
+def test_bad_signature_is_rejected(client, db):
+    response = _post(client, _subscription_event("evt_1", 1000, "active"), secret="whsec_wrong")
+    assert response.status_code == 400
+    assert client.post("/api/payments/webhook", content="{}").status_code == 400
+    assert db.query(StripeEvent).count() == 0
+
+
+def test_replay_reapplies_stored_events(client, db, make_user, drain_jobs, async_session_factory, stripe_calls):
+    user, _ = make_user()
+    _post(client, _subscription_event("evt_1", 1000, "active", user_id=user.id))
+    drain_jobs()
+
+    db.query(Subscription).filter(Subscription.user_id == user.id).update({"status": SubscriptionStatus.PAST_DUE})
+    db.commit()
+
+    async def replay():
+        async with async_session_factory() as session:
+            return await stripe_webhooks.replay(session, customer_id="cus_1")
+
+    assert asyncio.run(replay()) == 1
+    db.expire_all()
+    assert db.get(StripeEvent, "evt_1").status == StripeEventStatus.PENDING
+    drain_jobs()
+
+    assert _subscription(db, user).status == SubscriptionStatus.ACTIVE
+
+
+def test_events_of_an_earlier_subscription_are_skipped(client, db, make_user, drain_jobs, stripe_calls):
+    user, _ = make_user()
+    _post(client, _subscription_event("evt_1", 1000, "canceled", user_id=user.id, subscription_id="sub_OLD"))
+    _post(client, _subscription_event("evt_2", 2000, "active", user_id=user.id, subscription_id="sub_NEW",
+                                      event_type="customer.subscription.created"))
+    drain_jobs()
+    assert _subscription(db, user).stripe_subscription_id == "sub_NEW"
+
+    # The old subscription's deletion arrives after the new one is active
+    _post(client, _subscription_event("evt_3", 3000, "canceled", user_id=user.id, subscription_id="sub_OLD",
+                                      event_type="customer.subscription.deleted"))
+    drain_jobs()
+
+    subscription = _subscription(db, user)
+    assert subscription.status == SubscriptionStatus.ACTIVE
+    assert subscription.stripe_subscription_id == "sub_NEW"
+    assert db.get(StripeEvent, "evt_3").status == StripeEventStatus.PROCESSED
+
+
+def test_late_and_replayed_older_events_do_not_roll_back(client, db, make_user, drain_jobs, async_session_factory, stripe_calls):
+    user, _ = make_user()
+    _post(client, _subscription_event("evt_1", 1000, "active", user_id=user.id))
+    _post(client, _subscription_event("evt_2", 2000, "past_due", user_id=user.id))
+    drain_jobs()
+    assert _subscription(db, user).status == SubscriptionStatus.PAST_DUE
+
+    # Delivered after a newer event was already applied
+    _post(client, _subscription_event("evt_0", 500, "incomplete", user_id=user.id))
+    drain_jobs()
+    assert _subscription(db, user).status == SubscriptionStatus.PAST_DUE
+
+    async def replay():
+        async with async_session_factory() as session:
+            return await stripe_webhooks.replay(session, event_ids=["evt_1"])
+
+    assert asyncio.run(replay()) == 1
+    drain_jobs()
+    assert _subscription(db, user).status == SubscriptionStatus.PAST_DUE
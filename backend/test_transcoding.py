@@ -0,0 +1,140 @@
+"""
+Tests for HLS packaging (services.transcoding) with a generated clip and
+moto's in-memory S3.
+"""
+import asyncio
+import subprocess
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config import settings
+from models.course import Lesson, Level
+from models.progress import BossSubmission
+from services import transcoding
+
+CDN = "https://cdn.example.com/media"
+
+
+@pytest.fixture
+def clip(tmp_path):
+    try:
+        ffmpeg = transcoding.ffmpeg_path()
+    except transcoding.TranscodeError:
+        pytest.skip("ffmpeg not available")
+    path = tmp_path / "clip.mp4"
+    subprocess.run([
+        ffmpeg, "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", "testsrc=size=854x480:rate=25",
+        "-f", "lavfi", "-i", "sine=frequency=440",
+        "-t", "3", "-c:v", "libx264", "-c:a", "aac", "-shortest", str(path),
+    ], check=True)
+    return path
+
+
+def test_probe_reads_duration_size_and_audio(clip):
+    info = transcoding.probe(str(clip))
+    assert round(info.duration_seconds) == 3
+    assert (info.width, info.height) == (854, 480)
+    assert info.fps == 25
+    assert info.has_audio
+
+
+def test_lesson_video_is_packaged_and_written_back(client, db, make_world, make_user, s3_bucket, clip, async_session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "HLS_SEGMENT_SECONDS", 1)
+    monkeypatch.setattr(settings, "HLS_BASE_URL", CDN + "/")
+    bucket = settings.AWS_S3_BUCKET_NAME
+    s3_bucket.upload_file(str(clip), bucket, "lessons/clip.mp4")
+    world = make_world()
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == world.id).first()
+    lesson.video_url = "lessons/clip.mp4"
+    db.commit()
+
+    async def run():
+        async with async_session_factory() as session:
+            videos = await transcoding.pending_videos(session, "lessons", [str(lesson.id)])
+        # Threads instead of processes so the workers share the in-memory S3
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return await transcoding.transcode_all(async_session_factory, videos, executor, 2)
+
+    stats = asyncio.run(run())
+    assert (stats.videos, stats.failed) == (1, 0)
+    assert stats.frames == 75 and stats.fps > 0
+
+    db.expire_all()
+    lesson = db.get(Lesson, lesson.id)
+    prefix = f"hls/lessons/{lesson.id}"
+    assert lesson.hls_url == f"{CDN}/{prefix}/master.m3u8"
+    assert lesson.poster_url == f"{CDN}/{prefix}/poster.jpg"
+    assert sorted(lesson.video_renditions) == ["360p", "480p"]
+    assert lesson.duration_minutes == 1
+
+    keys = {obj["Key"] for obj in s3_bucket.list_objects_v2(Bucket=bucket, Prefix=prefix)["Contents"]}
+    assert {f"{prefix}/master.m3u8", f"{prefix}/poster.jpg", f"{prefix}/480p/index.m3u8", f"{prefix}/360p/index.m3u8"} <= keys
+    assert len([key for key in keys if key.startswith(f"{prefix}/480p/seg_")]) == 3
+    master = s3_bucket.get_object(Bucket=bucket, Key=f"{prefix}/master.m3u8")["Body"].read().decode()
+    assert "480p/index.m3u8" in master and "RESOLUTION=854x480" in master
+
+    # The API hands out the CDN URL of the uploaded master playlist
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    detail = client.get(f"/api/courses/lessons/{lesson.id}", headers=headers).json()
+    listed = client.get(f"/api/courses/worlds/{world.id}/lessons", headers=headers).json()
+    [listed] = [entry for entry in listed if entry["id"] == str(lesson.id)]
+    for hls_url in (detail["hls_url"], listed["hls_url"]):
+        assert hls_url.startswith(CDN + "/")
+        assert hls_url[len(CDN) + 1:] in keys
+
+
+def test_packaging_requires_hls_base_url(monkeypatch):
+    monkeypatch.setattr(settings, "HLS_BASE_URL", "")
+    with pytest.raises(transcoding.TranscodeError, match="HLS_BASE_URL"):
+        asyncio.run(transcoding.transcode_all(None, [("lessons", "1", "lessons/clip.mp4")], ThreadPoolExecutor(1), 1))
+
+
+def test_bare_hls_keys_are_not_returned(client, db, make_world, make_user):
+    world = make_world()
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == world.id).first()
+    # Packaged before HLS_BASE_URL was required: not playable by any client
+    lesson.hls_url = f"hls/lessons/{lesson.id}/master.m3u8"
+    db.commit()
+
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get(f"/api/courses/lessons/{lesson.id}", headers=headers).json()["hls_url"] is None
+    listed = client.get(f"/api/courses/worlds/{world.id}/lessons", headers=headers).json()
+    assert [entry["hls_url"] for entry in listed if entry["id"] == str(lesson.id)] == [None]
+
+
+def test_submissions_only_transcode_the_students_own_uploads(db, make_world, make_user, async_session_factory, tmp_path):
+    world = make_world()
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == world.id).first()
+    student, _ = make_user()
+    other, _ = make_user()
+    own = f"boss-battles/{student.id}/{lesson.id}/upload.mp4"
+    refused = [
+        "http://169.254.169.254/latest/meta-data/",
+        "/etc/passwd",
+        f"boss-battles/{other.id}/{lesson.id}/upload.mp4",
+        f"boss-battles/{student.id}/../../lessons/clip.mp4",
+    ]
+    submissions = {}
+    for video_url in [own] + refused:
+        submission = BossSubmission(id=uuid.uuid4(), user_id=student.id, lesson_id=lesson.id, video_url=video_url)
+        db.add(submission)
+        submissions[video_url] = submission
+    db.commit()
+
+    async def run(ids=None):
+        async with async_session_factory() as session:
+            return await transcoding.pending_videos(session, "submissions", ids)
+
+    assert asyncio.run(run()) == [("submissions", str(submissions[own].id), own)]
+    # Not even when asked for by id
+    assert asyncio.run(run([str(submissions[url].id) for url in refused])) == []
+
+    # The worker refuses them too, before ffmpeg or S3 are involved
+    for video_url in refused[:2]:
+        with pytest.raises(transcoding.TranscodeError, match="Not a stored video key"):
+            transcoding._fetch_source(video_url, str(tmp_path))
@@ -0,0 +1,150 @@
+"""
+Tests for resumable boss battle uploads (services.upload_service) against
+moto's in-memory S3.
+"""
+import asyncio
+
+import requests
+
+from config import settings
+from models.course import Lesson, Level
+from models.progress import BossSubmission
+from models.upload import UploadSession, UploadSessionStatus
+from services import s3_service
+from services.upload_service import complete_upload
+
+PART = 5 * 1024 * 1024
+
+
+def _boss_lesson(db, world):
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == world.id).first()
+    lesson.is_boss_battle = True
+    db.commit()
+    return lesson
+
+
+def _upload_parts(client, headers, upload_id, video, numbers=None):
+    response = client.post(f"/api/submissions/uploads/{upload_id}/part-urls", json={"part_numbers": numbers}, headers=headers)
+    assert response.status_code == 200
+    reported = []
+    for number, url in response.json()["urls"].items():
+        number = int(number)
+        put = requests.put(url, data=video[(number - 1) * PART:number * PART])
+        assert put.status_code == 200
+        reported.append({"part_number": number, "etag": put.headers["ETag"]})
+    return client.post(f"/api/submissions/uploads/{upload_id}/parts", json={"parts": reported}, headers=headers)
+
+
+def test_interrupted_upload_resumes_and_completes_once(client, db, make_user, make_world, s3_bucket, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PART_SIZE_BYTES", PART)
+    user, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = _boss_lesson(db, make_world())
+    video = b"a" * PART + b"b" * PART + b"c" * 100
+    request = {"lesson_id": str(lesson.id), "filename": "Battle.MP4", "content_type": "video/mp4", "size_bytes": len(video)}
+
+    session = client.post("/api/submissions/uploads", json=request, headers=headers).json()
+    assert session["part_count"] == 3
+    assert _upload_parts(client, headers, session["id"], video, [1]).json()["missing_parts"] == [2, 3]
+
+    # The client reconnects: same session, only the missing parts are signed
+    resumed = client.post("/api/submissions/uploads", json=request, headers=headers).json()
+    assert resumed["id"] == session["id"]
+    assert resumed["uploaded_parts"] == [1]
+    assert _upload_parts(client, headers, session["id"], video).json()["missing_parts"] == []
+
+    first = client.post(f"/api/submissions/uploads/{session['id']}/complete", headers=headers)
+    again = client.post(f"/api/submissions/uploads/{session['id']}/complete", headers=headers)
+    assert first.status_code == 200 and again.json()["id"] == first.json()["id"]
+
+    submission = db.query(BossSubmission).filter(BossSubmission.user_id == user.id).one()
+    assert submission.video_url.endswith(".mp4")
+    assert s3_bucket.get_object(Bucket=settings.AWS_S3_BUCKET_NAME, Key=submission.video_url)["Body"].read() == video
+    upload = db.query(UploadSession).one()
+    assert upload.status == UploadSessionStatus.COMPLETED
+    assert upload.submission_id == submission.id
+
+
+def test_parallel_completions_create_one_submission(client, db, make_user, make_world, s3_bucket, async_session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PART_SIZE_BYTES", PART)
+    user, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = _boss_lesson(db, make_world())
+    video = b"a" * PART + b"b" * 100
+    session = client.post("/api/submissions/uploads", json={
+        "lesson_id": str(lesson.id), "filename": "v.mp4", "content_type": "video/mp4", "size_bytes": len(video),
+    }, headers=headers).json()
+    _upload_parts(client, headers, session["id"], video)
+
+    # moto's multipart uploads are not thread-safe (S3's are): let only the database race
+    s3_lock = asyncio.Lock()
+    assemble = s3_service.complete_multipart_upload
+
+    async def serialized_assemble(*args):
+        async with s3_lock:
+            await assemble(*args)
+
+    monkeypatch.setattr(s3_service, "complete_multipart_upload", serialized_assemble)
+
+    async def attempt():
+        async with async_session_factory() as db_session:
+            return (await complete_upload(db_session, session["id"], user.id)).id
+
+    async def run():
+        return await asyncio.gather(*(attempt() for _ in range(6)))
+
+    submission_ids = asyncio.run(run())
+    assert len(set(submission_ids)) == 1
+    db.expire_all()
+    assert db.query(BossSubmission).filter(BossSubmission.user_id == user.id).one().id == submission_ids[0]
+    assert db.query(UploadSession).one().submission_id == submission_ids[0]
+
+
+def test_complete_requires_every_part(client, db, make_user, make_world, s3_bucket, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PART_SIZE_BYTES", PART)
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = _boss_lesson(db, make_world())
+    video = b"a" * PART + b"b"
+    session = client.post("/api/submissions/uploads", json={
+        "lesson_id": str(lesson.id), "filename": "v.mp4", "content_type": "video/mp4", "size_bytes": len(video),
+    }, headers=headers).json()
+    _upload_parts(client, headers, session["id"], video, [1])
+
+    response = client.post(f"/api/submissions/uploads/{session['id']}/complete", headers=headers)
+    assert response.status_code == 400
+    assert db.query(BossSubmission).count() == 0
+
+    # Other users cannot see or touch the upload
+    _, other_token = make_user()
+    response = client.get(f"/api/submissions/uploads/{session['id']}", headers={"Authorization": f"Bearer {other_token}"})
+    assert response.status_code == 404
+
+
+def test_complete_refuses_a_file_of_another_size(client, db, make_user, make_world, s3_bucket, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PART_SIZE_BYTES", PART)
+    _, token = make_user()
+    headers = {"Authorization": f"Bearer {token}"}
+    lesson = _boss_lesson(db, make_world())
+    video = b"a" * PART + b"b" * 100
+    session = client.post("/api/submissions/uploads", json={
+        "lesson_id": str(lesson.id), "filename": "v.mp4", "content_type": "video/mp4", "size_bytes": len(video),
+    }, headers=headers).json()
+    # The last part is larger than the announced file
+    _upload_parts(client, headers, session["id"], video + b"c" * 1000)
+
+    response = client.post(f"/api/submissions/uploads/{session['id']}/complete", headers=headers)
+    assert response.status_code == 400
+    assert db.query(BossSubmission).count() == 0
+    upload = db.query(UploadSession).one()
+    assert upload.status == UploadSessionStatus.ABORTED
+    assert s3_bucket.list_objects_v2(Bucket=settings.AWS_S3_BUCKET_NAME).get("KeyCount", 0) == 0
+
+
+def test_upload_is_refused_for_regular_lessons(client, db, make_user, make_world, s3_bucket):
+    _, token = make_user()
+    lesson = db.query(Lesson).join(Level).filter(Level.world_id == make_world().id).first()
+    response = client.post("/api/submissions/uploads", json={
+        "lesson_id": str(lesson.id), "filename": "v.mp4", "content_type": "video/mp4", "size_bytes": 10,
+    }, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400
@@ -0,0 +1,56 @@
+"""
+Video transcoding script.
+Packages lesson and boss battle videos as multi-bitrate HLS (renditions,
+segment playlists, master playlist, poster frame) with ffmpeg, uploads the
+package to S3 and stores its URLs; lessons also get duration_minutes.
+Transcodes run in a process pool (one per core by default). HLS_BASE_URL
+must be set to the public or CDN origin the hls/ keys are served from.
+
+Usage:
+    python transcode_videos.py [--kind lessons|submissions|all] [--id ID ...] [--workers N] [--limit N]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from models import get_async_session_local
+from services.transcoding import TranscodeError, pending_videos, transcode_all, default_workers, require_hls_base_url
+
+
+async def main(args):
+    try:
+        require_hls_base_url()
+    except TranscodeError as e:
+        raise SystemExit(str(e))
+    session_factory = get_async_session_local()
+    kinds = ["lessons", "submissions"] if args.kind == "all" else [args.kind]
+    async with session_factory() as db:
+        videos = []
+        for kind in kinds:
+            videos += await pending_videos(db, kind, args.id, args.limit)
+    if not videos:
+        print("Nothing to transcode")
+        return
+
+    workers = min(args.workers or default_workers(), len(videos))
+    print(f"Transcoding {len(videos)} videos with {workers} workers")
+    # spawn: children must not inherit the parent's event loop and DB connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        stats = await transcode_all(session_factory, videos, executor, workers)
+    print(
+        f"Transcoded {stats.videos} videos ({stats.failed} failed): {stats.video_seconds:.0f}s of video, "
+        f"{stats.frames} frames in {stats.wall_seconds:.1f}s = {stats.fps:.1f} fps"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", choices=["lessons", "submissions", "all"], default="all")
+    parser.add_argument("--id", action="append", default=[], help="only this lesson/submission id (repeatable)")
+    parser.add_argument("--workers", type=int, default=0, help="parallel transcodes (TRANSCODE_WORKERS, default one per core)")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(args))
@@ -0,0 +1,33 @@
+"""
+Background job worker.
+Runs separately from the API (main.py) and drains the jobs table; start as
+many as needed, they coordinate through SKIP LOCKED.
+
+Usage:
+    python worker.py [--concurrency N]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from services.jobs import JobWorker
+
+
+async def main(concurrency):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker = JobWorker(concurrency=concurrency)
+    await worker.run_forever(stop)
+    print(f"Worker stopped: {worker.completed} jobs completed, {worker.failed} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=None, help="jobs run at once (JOB_WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(args.concurrency))
@@ -13,9 +13,11 @@ interface Submission {
   status: string;
   feedback: string | null;
   submitted_at: string;
-  user_id?: string;
-  lesson_id?: string;
-  video_url?: string;
+  user_id: string;
+  student_name: string;
+  lesson_id: string;
+  lesson_title: string;
+  video_url: string;
 }
 
 export default function AdminGradingPage() {
@@ -26,6 +28,8 @@ export default function AdminGradingPage() {
   const [loading, setLoading] = useState(true);
   const [grading, setGrading] = useState(false);
   const [feedback, setFeedback] = useState("");
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (!authLoading && (!user || user.role !== "admin")) {
@@ -39,10 +43,11 @@ export default function AdminGradingPage() {
 
   const loadSubmissions = async () => {
     try {
-      const data = await apiClient.getPendingSubmissions();
-      setSubmissions(data);
-      if (data.length > 0 && !selectedSubmission) {
-        setSelectedSubmission(data[0]);
+      const page = await apiClient.getPendingSubmissions();
+      setSubmissions(page.items);
+      setNextCursor(page.next_cursor);
+      if (page.items.length > 0 && !selectedSubmission) {
+        setSelectedSubmission(page.items[0]);
       }
     } catch (err: any) {
       console.error("Failed to load submissions:", err);
@@ -51,6 +56,20 @@ export default function AdminGradingPage() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const page = await apiClient.getPendingSubmissions({ cursor: nextCursor });
+      setSubmissions((current) => [...current, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      console.error("Failed to load submissions:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleGrade = async (status: "approved" | "rejected") => {
     if (!selectedSubmission) return;
 
@@ -101,7 +120,7 @@ export default function AdminGradingPage() {
         <div className="w-80 border-r border-gray-800 bg-black flex flex-col">
           <div className="p-5 border-b border-gray-800">
             <h2 className="font-bold text-mambo-text">
-              Pending Queue ({submissions.length})
+              Pending Queue ({submissions.length}{nextCursor ? "+" : ""})
             </h2>
           </div>
           <div className="overflow-y-auto flex-1">
@@ -129,9 +148,20 @@ export default function AdminGradingPage() {
                     {new Date(submission.submitted_at).toLocaleDateString()}
                   </span>
                 </div>
-                <div className="text-xs text-gray-300">Boss Battle</div>
+                <div className="text-xs text-gray-300">
+                  {submission.student_name} &middot; {submission.lesson_title}
+                </div>
               </div>
             ))}
+            {nextCursor && (
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="w-full p-4 text-sm text-mambo-blue hover:bg-gray-900 transition disabled:opacity-50"
+              >
+                {loadingMore ? "Loading..." : "Load more"}
+              </button>
+            )}
             {submissions.length === 0 && (
               <div className="p-4 text-gray-500 text-sm text-center">
                 No pending submissions
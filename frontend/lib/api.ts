@@ -190,15 +190,32 @@ class ApiClient {
     }>("/api/admin/stats");
   }
 
-  async getPendingSubmissions() {
-    return this.request<
-      Array<{
+  async getPendingSubmissions(params: {
+    cursor?: string;
+    limit?: number;
+    lesson_id?: string;
+    world_id?: string;
+  } = {}) {
+    const query = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined) query.set(key, String(value));
+    });
+    const suffix = query.toString() ? `?${query}` : "";
+    return this.request<{
+      items: Array<{
         id: string;
         status: string;
         feedback: string | null;
         submitted_at: string;
-      }>
-    >("/api/admin/submissions");
+        user_id: string;
+        student_name: string;
+        student_email: string;
+        lesson_id: string;
+        lesson_title: string;
+        video_url: string;
+      }>;
+      next_cursor: string | null;
+    }>(`/api/admin/submissions${suffix}`);
   }
 
   async gradeSubmission(submissionId: string, data: {